@@ -0,0 +1,265 @@
+import os
+import re
+import shutil
+import argparse
+import threading
+from functools import lru_cache
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    from pyarrow import parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from instrumentacao import etapa
+
+"""
+    BACKEND ANALÍTICO EMBARCADO (Parquet + DuckDB)
+    Depois de uma carga, o pipeline pode exportar o star schema (dimensões,
+    fatos, indicadores e controle_carga) para Parquet, numa pasta por geração
+    da carga (o MAX(id_carga) exportado). O arquivo ATUAL aponta a geração
+    publicada e é trocado por rename, depois que a pasta já está completa.
+    O dashboard abre essa pasta num DuckDB em memória: as tabelas viram views
+    sobre os arquivos Parquet, os resumo_* são materializados com os mesmos
+    SELECTs da fn_atualizar_resumos e as views vw_* são as do
+    create_tables.sql. As consultas do dashboard rodam sem nenhum PostgreSQL.
+"""
+
+DIRETORIO_PARQUET_PADRAO = os.environ.get('ESUS_PARQUET_DIR', 'parquet')
+
+ARQUIVO_DDL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_tables.sql')
+
+TABELAS_EXPORTADAS = [
+    'dim_localidades', 'dim_condicoes', 'dim_evolucao_caso', 'dim_raca_cor',
+    'dim_sintomas', 'dim_tipos_testes', 'dim_fabricantes',
+    'fato_notificacoes', 'fato_notificacao_sintoma', 'fato_notificacao_condicao', 'fato_testes_realizados',
+    'indicadores_municipais', 'controle_carga',
+]
+
+ARQUIVO_ATUAL = 'ATUAL'
+
+# Gerações mantidas no disco: a publicada e a anterior, que um processo do
+# dashboard ainda pode estar lendo até conferir a geração nova.
+GERACOES_MANTIDAS = 2
+
+COMPRESSAO_PARQUET = 'zstd'
+
+# Tamanho do bloco lido do COPY; cada bloco vira um row group do Parquet.
+BLOCO_CSV = 1 << 24
+
+TIPOS_ARROW = {
+    'smallint': 'int16',
+    'integer': 'int32',
+    'bigint': 'int64',
+    'boolean': 'bool_',
+    'date': 'date32',
+    'real': 'float32',
+    'double precision': 'float64',
+    'character varying': 'string',
+    'character': 'string',
+    'text': 'string',
+}
+
+def caminho_geracao(diretorio, geracao):
+    return os.path.join(diretorio, f"geracao-{geracao}")
+
+"""
+    Geração publicada na pasta (conteúdo do ATUAL), ou None se ainda não houve
+    exportação.
+"""
+def geracao_exportada(diretorio=DIRETORIO_PARQUET_PADRAO):
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_ATUAL), encoding='utf-8') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+"""
+    Schema Arrow de uma tabela a partir do information_schema (na tabela
+    particionada, as colunas são as da tabela mãe).
+"""
+def esquema_tabela(conn, tabela):
+    colunas = conn.exec_driver_sql(
+        "SELECT column_name, data_type, numeric_precision, numeric_scale "
+        "FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s "
+        "ORDER BY ordinal_position", (tabela,)
+    ).fetchall()
+    if not colunas:
+        raise ValueError(f"Tabela {tabela} não encontrada.")
+    campos = []
+    for nome, tipo, precisao, escala in colunas:
+        if tipo == 'numeric':
+            tipo_arrow = pa.decimal128(precisao, escala) if precisao else pa.float64()
+        elif tipo.startswith('timestamp'):
+            tipo_arrow = pa.timestamp('us', tz='UTC' if 'with time zone' in tipo else None)
+        elif tipo in TIPOS_ARROW:
+            tipo_arrow = getattr(pa, TIPOS_ARROW[tipo])()
+        else:
+            raise ValueError(f"Tipo {tipo} da coluna {tabela}.{nome} não é exportado.")
+        campos.append(pa.field(nome, tipo_arrow))
+    return pa.schema(campos)
+
+"""
+    Copia a tabela para um arquivo Parquet sem passar por objetos Python: o
+    COPY ... TO STDOUT (CSV) é escrito num pipe por uma thread e lido em blocos
+    pelo leitor de CSV do Arrow, já nos tipos do schema. Com FORCE_QUOTE, só o
+    NULL sai sem aspas, então texto vazio e nulo continuam diferentes.
+"""
+def exportar_tabela(conn, tabela, destino):
+    esquema = esquema_tabela(conn, tabela)
+    colunas = ', '.join(esquema.names)
+    consulta = f"COPY (SELECT {colunas} FROM {tabela}) TO STDOUT WITH (FORMAT csv, FORCE_QUOTE *)"
+
+    leitura, escrita = os.pipe()
+    erro = []
+
+    def copiar():
+        try:
+            with os.fdopen(escrita, 'wb') as saida:
+                conn.connection.cursor().copy_expert(consulta, saida)
+        except Exception as e:
+            erro.append(e)
+
+    copia = threading.Thread(target=copiar, daemon=True)
+    copia.start()
+    linhas = 0
+    try:
+        with os.fdopen(leitura, 'rb') as entrada, \
+                pq.ParquetWriter(destino, esquema, compression=COMPRESSAO_PARQUET) as escritor:
+            # O leitor do Arrow não abre um CSV vazio: tabela sem linhas fica só com o schema.
+            if entrada.peek(1):
+                leitor = pa_csv.open_csv(
+                    entrada,
+                    read_options=pa_csv.ReadOptions(column_names=esquema.names, block_size=BLOCO_CSV),
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types=esquema, null_values=[''], strings_can_be_null=True,
+                        quoted_strings_can_be_null=False, true_values=['t'], false_values=['f'],
+                    ),
+                )
+                for lote in leitor:
+                    escritor.write_batch(lote)
+                    linhas += lote.num_rows
+    finally:
+        copia.join()
+    if erro:
+        raise erro[0]
+    return linhas
+
+"""
+    Exporta o star schema para diretorio/geracao-<n>/ numa transação
+    REPEATABLE READ somente leitura, para que todas as tabelas venham do mesmo
+    snapshot (o da última carga commitada). A pasta é montada num temporário,
+    renomeada e só então publicada no ATUAL; as gerações antigas são apagadas.
+    Retorna a geração exportada.
+"""
+def exportar_parquet(engine, diretorio=DIRETORIO_PARQUET_PADRAO):
+    if pa is None:
+        raise RuntimeError("A exportação em Parquet requer o pacote pyarrow.")
+    os.makedirs(diretorio, exist_ok=True)
+    with etapa('exportar_parquet') as medida, engine.connect().execution_options(
+            isolation_level='REPEATABLE READ', postgresql_readonly=True) as conn:
+        conn.exec_driver_sql("SET TIME ZONE 'UTC'")
+        geracao = conn.exec_driver_sql("SELECT COALESCE(MAX(id_carga), 0) FROM controle_carga").scalar()
+        destino = caminho_geracao(diretorio, geracao)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        os.makedirs(temporario)
+        try:
+            linhas = 0
+            for tabela in TABELAS_EXPORTADAS:
+                linhas += exportar_tabela(conn, tabela, os.path.join(temporario, f"{tabela}.parquet"))
+            shutil.rmtree(destino, ignore_errors=True)
+            os.replace(temporario, destino)
+        except BaseException:
+            shutil.rmtree(temporario, ignore_errors=True)
+            raise
+        medida['linhas_saida'] = linhas
+        medida['bytes'] = sum(entrada.stat().st_size for entrada in os.scandir(destino))
+
+    atual = os.path.join(diretorio, ARQUIVO_ATUAL)
+    with open(atual + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(str(geracao))
+    os.replace(atual + '.tmp', atual)
+    podar_geracoes(diretorio, geracao)
+    return geracao
+
+def podar_geracoes(diretorio, geracao, mantidas=GERACOES_MANTIDAS):
+    anteriores = []
+    with os.scandir(diretorio) as entradas:
+        for entrada in entradas:
+            encontrado = re.fullmatch(r'geracao-(\d+)', entrada.name)
+            if encontrado and entrada.is_dir() and int(encontrado.group(1)) < geracao:
+                anteriores.append((int(encontrado.group(1)), entrada.path))
+    for _, caminho in sorted(anteriores, reverse=True)[mantidas - 1:]:
+        shutil.rmtree(caminho, ignore_errors=True)
+
+"""
+    Comandos do create_tables.sql usados no DuckDB: as tabelas resumo_*, os
+    INSERTs da fn_atualizar_resumos (com o filtro de datas trocado por TRUE,
+    já que o resumo é montado inteiro) e as views vw_*. O arquivo continua
+    sendo a única definição dos resumos e das views.
+"""
+@lru_cache(maxsize=1)
+def comandos_analiticos(arquivo=ARQUIVO_DDL):
+    with open(arquivo, encoding='utf-8') as f:
+        ddl = re.sub(r'--[^\n]*', '', f.read())
+    tabelas = re.findall(r'CREATE TABLE resumo_\w+ \(.*?\);', ddl, re.DOTALL)
+    inserts = [
+        comando.replace('p_datas IS NULL OR fn.data_notificacao = ANY(p_datas)', 'TRUE')
+        for comando in re.findall(r'INSERT INTO resumo_\w+\s+SELECT.*?;', ddl, re.DOTALL)
+    ]
+    views = re.findall(r'CREATE OR REPLACE VIEW vw_\w+ AS.*?;', ddl, re.DOTALL)
+    if not (tabelas and len(inserts) == len(tabelas) and views) or any('p_datas' in c for c in inserts):
+        raise ValueError(f"Não foi possível extrair os resumos e as views de {arquivo}.")
+    return tabelas + inserts + views
+
+"""
+    DuckDB em memória sobre a geração exportada (a publicada, se geracao for
+    None). Cada thread deve consultar por um cursor próprio (consultar_duckdb).
+"""
+def abrir_duckdb(diretorio=DIRETORIO_PARQUET_PADRAO, geracao=None):
+    if duckdb is None:
+        raise RuntimeError("O backend duckdb requer o pacote duckdb.")
+    if geracao is None:
+        geracao = geracao_exportada(diretorio)
+    pasta = caminho_geracao(diretorio, geracao)
+    if geracao is None or not os.path.isdir(pasta):
+        raise FileNotFoundError(f"Nenhuma exportação em Parquet em {pasta}.")
+
+    con = duckdb.connect()
+    with etapa('abrir_duckdb', geracao=geracao):
+        for tabela in TABELAS_EXPORTADAS:
+            arquivo = os.path.join(pasta, f"{tabela}.parquet").replace("'", "''")
+            con.execute(f"CREATE VIEW {tabela} AS SELECT * FROM read_parquet('{arquivo}')")
+        for comando in comandos_analiticos():
+            con.execute(comando)
+    return con
+
+"""
+    Executa uma consulta do dashboard no DuckDB. Os parâmetros nomeados do
+    SQLAlchemy (:nome) viram os do DuckDB ($nome); casts (::tipo) ficam como estão.
+"""
+def consultar_duckdb(con, query, params=None):
+    query = re.sub(r'(?<![:\w]):(\w+)', r'$\1', query)
+    return con.cursor().execute(query, params or {}).df()
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+    from pipeline import DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Exporta o star schema do banco para Parquet (backend duckdb do dashboard)")
+    parser.add_argument("diretorio", nargs="?", default=DIRETORIO_PARQUET_PADRAO,
+                        help="Pasta da exportação (padrão: ESUS_PARQUET_DIR ou parquet/)")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    geracao = exportar_parquet(engine, args.diretorio)
+    engine.dispose()
+    print(f"Geração {geracao} exportada em {caminho_geracao(args.diretorio, geracao)}.")
@@ -0,0 +1,102 @@
+"""
+    Benchmark do unpivot de testes (process_testes_realizados).
+    Compara a versão com melt + pivot_table (mantida aqui como referência) com a
+    versão vetorizada do pipeline, numa base sintética com as taxas de
+    preenchimento observadas no relatório de integridade (testes 3 e 4 quase vazios).
+
+    Uso: python benchmarks/bench_testes_realizados.py [--notificacoes 1000000]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import process_testes_realizados
+
+# Fração de notificações com cada slot de teste preenchido.
+TAXA_PREENCHIMENTO_SLOTS = [0.80, 0.10, 0.006, 0.005]
+
+"""
+    Monta um DataFrame no formato largo do e-SUS (16 colunas de teste).
+"""
+def gerar_notificacoes(total, seed=42):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'id_notificacao': np.arange(1, total + 1)})
+    datas = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 365, total), unit='D')
+    for slot, taxa in enumerate(TAXA_PREENCHIMENTO_SLOTS, start=1):
+        preenchido = rng.random(total) < taxa
+        df[f'codigoEstadoTeste{slot}'] = np.where(preenchido, rng.integers(1, 5, total), np.nan).astype('float32')
+        df[f'codigoTipoTeste{slot}'] = np.where(preenchido, rng.integers(1, 8, total), np.nan).astype('float32')
+        fabricante = preenchido & (rng.random(total) < 0.5)
+        df[f'codigoFabricanteTeste{slot}'] = np.where(fabricante, rng.integers(1, 40, total), np.nan).astype('float32')
+        df[f'dataColetaTeste{slot}'] = pd.Series(datas).where(preenchido)
+    return df
+
+"""
+    Versão anterior (melt + pivot_table), usada como referência de resultado e tempo.
+"""
+def process_testes_realizados_pivot(df):
+    test_metrics = ['codigoEstadoTeste', 'codigoTipoTeste', 'codigoFabricanteTeste', 'dataColetaTeste']
+    value_vars = [f'{metric}{i}' for i in range(1, 5) for metric in test_metrics]
+    cols_present = [c for c in value_vars if c in df.columns]
+
+    df_long = pd.melt(
+        df[['id_notificacao'] + cols_present],
+        id_vars=['id_notificacao'],
+        value_vars=cols_present,
+        var_name='test_variable',
+        value_name='test_value'
+    ).dropna(subset=['test_value'])
+
+    df_long['test_number'] = df_long['test_variable'].str[-1].astype(int)
+    df_long['metric_name'] = df_long['test_variable'].str[:-1]
+
+    df_final = df_long.pivot_table(
+        index=['id_notificacao', 'test_number'],
+        columns='metric_name',
+        values='test_value',
+        aggfunc='first'
+    ).reset_index()
+    df_final.columns.name = None
+
+    df_final = df_final.rename(columns={
+        'codigoEstadoTeste': 'codigo_estado_teste',
+        'codigoTipoTeste': 'codigo_tipo_teste',
+        'codigoFabricanteTeste': 'codigo_fabricante_teste',
+        'dataColetaTeste': 'data_coleta'
+    })
+    df_final['id_registro'] = df_final.index + 1
+    return df_final
+
+def cronometrar(funcao, df):
+    inicio = time.perf_counter()
+    resultado = funcao(df)
+    return resultado, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do unpivot de testes")
+    parser.add_argument("--notificacoes", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = gerar_notificacoes(args.notificacoes)
+    print(f"Notificações: {len(df):,}".replace(",", "."))
+
+    df_pivot, tempo_pivot = cronometrar(process_testes_realizados_pivot, df)
+    df_vetorizado, tempo_vetorizado = cronometrar(process_testes_realizados, df)
+
+    colunas = list(df_vetorizado.columns)
+    pd.testing.assert_frame_equal(
+        df_vetorizado,
+        df_pivot[colunas].infer_objects(),
+        check_dtype=False
+    )
+
+    print(f"\nmelt + pivot_table: {tempo_pivot:.2f}s")
+    print(f"vetorizado:         {tempo_vetorizado:.2f}s")
+    total_testes = f"{len(df_vetorizado):,}".replace(",", ".")
+    print(f"Speedup:            {tempo_pivot / tempo_vetorizado:.1f}x ({total_testes} testes, resultados idênticos)")
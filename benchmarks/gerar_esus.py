@@ -0,0 +1,219 @@
+"""
+    Gerador de CSVs sintéticos no layout do e-SUS Notifica.
+    Mesmas colunas e formatos do arquivo real (4 slots de teste, sintomas e
+    condições separados por vírgula, códigos IBGE de 7 dígitos) e taxas de nulos
+    próximas às do relatório de integridade. Gera em blocos, então escalas de
+    10M linhas não precisam caber em memória.
+
+    Uso: python benchmarks/gerar_esus.py 1000000 dados_1m.csv [--seed 0] [--por-uf DIR]
+"""
+import os
+import argparse
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+COLUNAS = [
+    'source_id', 'excluido', 'validado', 'estado', 'estadoIBGE', 'municipio', 'municipioIBGE',
+    'estadoNotificacao', 'estadoNotificacaoIBGE', 'municipioNotificacao', 'municipioNotificacaoIBGE',
+    'dataNotificacao', 'dataInicioSintomas', 'dataEncerramento', 'classificacaoFinal', 'idade', 'sexo',
+    'racaCor', 'evolucaoCaso', 'sintomas', 'condicoes', 'profissionalSaude', 'profissionalSeguranca', 'cbo',
+    'codigoRecebeuVacina', 'codigoDosesVacina', 'codigoLaboratorioPrimeiraDose', 'dataPrimeiraDose',
+    'dataSegundaDose', 'codigoEstrategiaCovid', 'outroBuscaAtivaAssintomatico',
+    'outroTriagemPopulacaoEspecifica', 'outroLocalRealizacaoTestagem',
+] + [
+    f'{metrica}{slot}'
+    for slot in range(1, 5)
+    for metrica in ['codigoEstadoTeste', 'codigoTipoTeste', 'codigoFabricanteTeste',
+                    'codigoResultadoTeste', 'dataColetaTeste']
+]
+
+# Capitais (código IBGE real); os demais municípios de cada UF são sintéticos.
+CAPITAIS = [
+    ('Acre', 'AC', 'Rio Branco', 1200401), ('Alagoas', 'AL', 'Maceió', 2704302),
+    ('Amapá', 'AP', 'Macapá', 1600303), ('Amazonas', 'AM', 'Manaus', 1302603),
+    ('Bahia', 'BA', 'Salvador', 2927408), ('Ceará', 'CE', 'Fortaleza', 2304400),
+    ('Distrito Federal', 'DF', 'Brasília', 5300108), ('Espírito Santo', 'ES', 'Vitória', 3205309),
+    ('Goiás', 'GO', 'Goiânia', 5208707), ('Maranhão', 'MA', 'São Luís', 2111300),
+    ('Mato Grosso', 'MT', 'Cuiabá', 5103403), ('Mato Grosso do Sul', 'MS', 'Campo Grande', 5002704),
+    ('Minas Gerais', 'MG', 'Belo Horizonte', 3106200), ('Pará', 'PA', 'Belém', 1501402),
+    ('Paraíba', 'PB', 'João Pessoa', 2507507), ('Paraná', 'PR', 'Curitiba', 4106902),
+    ('Pernambuco', 'PE', 'Recife', 2611606), ('Piauí', 'PI', 'Teresina', 2211001),
+    ('Rio de Janeiro', 'RJ', 'Rio de Janeiro', 3304557), ('Rio Grande do Norte', 'RN', 'Natal', 2408102),
+    ('Rio Grande do Sul', 'RS', 'Porto Alegre', 4314902), ('Rondônia', 'RO', 'Porto Velho', 1100205),
+    ('Roraima', 'RR', 'Boa Vista', 1400100), ('Santa Catarina', 'SC', 'Florianópolis', 4205407),
+    ('São Paulo', 'SP', 'São Paulo', 3550308), ('Sergipe', 'SE', 'Aracaju', 2800308),
+    ('Tocantins', 'TO', 'Palmas', 1721000),
+]
+MUNICIPIOS_POR_UF = 40
+
+SINTOMAS = ['Febre', 'Tosse', 'Dor de Garganta', 'Dispneia', 'Coriza', 'Dor de Cabeça',
+            'Distúrbios Gustativos', 'Distúrbios Olfativos', 'Assintomático', 'Outros']
+CONDICOES = ['Diabetes', 'Obesidade', 'Doenças cardíacas crônicas', 'Doenças respiratórias crônicas descompensadas',
+             'Imunossupressão', 'Gestante', 'Doenças renais crônicas em estágio avançado (graus 3, 4 ou 5)']
+
+CLASSIFICACOES = ['Confirmado Laboratorial', 'Descartado', 'Síndrome Gripal Não Especificada',
+                  'Confirmado Clínico-Epidemiológico', 'Confirmado por Critério Clínico']
+EVOLUCOES = ['Cura', 'Óbito', 'Em tratamento domiciliar', 'Internado', 'Ignorado', 'Cancelado']
+RACAS = ['Branca', 'Parda', 'Preta', 'Amarela', 'Indigena', 'Ignorado']
+CBOS = ['2235 - Enfermeiros e afins', '2251 - Médicos clínicos', '3222 - Técnicos e auxiliares de enfermagem',
+        '5151 - Agentes comunitários de saúde e afins']
+DOSES = ['1', '1,2', '1,2,3', '1,2,3,4', '2', '3']
+LABORATORIOS = ['PFIZER', 'SINOVAC/BUTANTAN', 'ASTRAZENECA/FIOCRUZ', 'JANSSEN']
+
+# Fração de notificações com cada slot de teste preenchido (testes 3 e 4 > 99,4% vazios).
+TAXA_SLOTS = [0.75, 0.12, 0.006, 0.004]
+TAXA_FABRICANTE = [0.5, 0.001, 0.001, 0.001]
+
+INICIO_PERIODO = pd.Timestamp('2021-01-01')
+DIAS_PERIODO = 730
+
+def montar_municipios():
+    municipios = []
+    for estado, uf, capital, codigo in CAPITAIS:
+        municipios.append((estado, uf, capital, codigo))
+        base = codigo // 100000 * 100000
+        for k in range(1, MUNICIPIOS_POR_UF):
+            municipios.append((estado, uf, f"Município {uf} {k:03d}", base + k * 10))
+    return pd.DataFrame(municipios, columns=['estado', 'uf', 'municipio', 'codigo'])
+
+MUNICIPIOS = montar_municipios()
+# Peso tipo Zipf dentro de cada UF (capital concentra as notificações) e pela ordem das UFs.
+PESOS_MUNICIPIOS = (1.0 / (MUNICIPIOS.groupby('uf').cumcount() + 1)).to_numpy()
+PESOS_MUNICIPIOS /= PESOS_MUNICIPIOS.sum()
+
+def combinacoes(termos, maximo):
+    combos = [', '.join(c) for k in range(1, maximo + 1) for c in combinations(termos, k)]
+    tamanhos = np.array([c.count(', ') + 1 for c in combos])
+    pesos = 1.0 / tamanhos ** 2
+    return np.array(combos, dtype=object), pesos / pesos.sum()
+
+COMBOS_SINTOMAS = combinacoes(SINTOMAS, 4)
+COMBOS_CONDICOES = combinacoes(CONDICOES, 2)
+
+def escolher(rng, valores, n, nulos=0.0, p=None):
+    serie = pd.Series(np.asarray(valores, dtype=object)[rng.choice(len(valores), n, p=p)])
+    return serie.where(rng.random(n) >= nulos) if nulos else serie
+
+# strftime só nas datas distintas (poucas centenas), e não linha a linha.
+def formatar_datas(datas):
+    unicas, codigos = np.unique(pd.DatetimeIndex(datas).to_numpy(), return_inverse=True)
+    return pd.Series(pd.DatetimeIndex(unicas).strftime('%Y-%m-%d').to_numpy(dtype=object)[codigos])
+
+"""
+    Gera um bloco de notificações. primeiro_id garante source_id únicos entre blocos.
+"""
+def gerar_notificacoes(total, seed=0, primeiro_id=1):
+    rng = np.random.default_rng(seed)
+    residencia = MUNICIPIOS.iloc[rng.choice(len(MUNICIPIOS), total, p=PESOS_MUNICIPIOS)].reset_index(drop=True)
+    # 90% notificados no município de residência.
+    notificacao = MUNICIPIOS.iloc[rng.choice(len(MUNICIPIOS), total, p=PESOS_MUNICIPIOS)].reset_index(drop=True)
+    mesmo = rng.random(total) < 0.9
+    notificacao.loc[mesmo] = residencia.loc[mesmo]
+
+    data_notificacao = INICIO_PERIODO + pd.to_timedelta(rng.integers(0, DIAS_PERIODO, total), unit='D')
+    inicio_sintomas = data_notificacao - pd.to_timedelta(rng.integers(0, 10, total), unit='D')
+    # Cronologia inválida (início depois da notificação) em ~0,03% das linhas.
+    invalida = rng.random(total) < 0.0003
+    inicio_sintomas = inicio_sintomas.where(~invalida, data_notificacao + pd.Timedelta(days=2))
+
+    df = pd.DataFrame({
+        'source_id': np.arange(primeiro_id, primeiro_id + total).astype(str),
+        'excluido': False,
+        'validado': True,
+        'estado': residencia['estado'], 'estadoIBGE': residencia['uf'],
+        'municipio': residencia['municipio'], 'municipioIBGE': residencia['codigo'],
+        'estadoNotificacao': notificacao['estado'], 'estadoNotificacaoIBGE': notificacao['uf'],
+        'municipioNotificacao': notificacao['municipio'], 'municipioNotificacaoIBGE': notificacao['codigo'],
+        'dataNotificacao': formatar_datas(data_notificacao).where(rng.random(total) >= 0.00005),
+        'dataInicioSintomas': formatar_datas(inicio_sintomas).where(rng.random(total) >= 0.02),
+        'dataEncerramento': formatar_datas(
+            data_notificacao + pd.to_timedelta(rng.integers(0, 30, total), unit='D')
+        ).where(rng.random(total) >= 0.45),
+        'classificacaoFinal': escolher(rng, CLASSIFICACOES, total, 0.25, p=[0.35, 0.4, 0.1, 0.1, 0.05]),
+        'idade': np.clip(rng.normal(40, 18, total), 0, 110).astype(int),
+        'sexo': escolher(rng, ['Feminino', 'Masculino', 'Indefinido'], total, p=[0.54, 0.455, 0.005]),
+        'racaCor': escolher(rng, RACAS, total, 0.05, p=[0.4, 0.35, 0.08, 0.03, 0.01, 0.13]),
+        'evolucaoCaso': escolher(rng, EVOLUCOES, total, 0.5, p=[0.8, 0.02, 0.12, 0.02, 0.03, 0.01]),
+        'sintomas': escolher(rng, COMBOS_SINTOMAS[0], total, 0.05, p=COMBOS_SINTOMAS[1]),
+        'condicoes': escolher(rng, COMBOS_CONDICOES[0], total, 0.85, p=COMBOS_CONDICOES[1]),
+        'profissionalSaude': escolher(rng, ['Sim', 'Não'], total, 0.1, p=[0.08, 0.92]),
+        'profissionalSeguranca': escolher(rng, ['Sim', 'Não'], total, 0.1, p=[0.03, 0.97]),
+        'cbo': escolher(rng, CBOS, total, 0.93),
+        'codigoRecebeuVacina': rng.choice([1, 2, 3], total, p=[0.7, 0.2, 0.1]).astype(float),
+        'codigoDosesVacina': escolher(rng, DOSES, total, 0.35),
+        'codigoLaboratorioPrimeiraDose': escolher(rng, LABORATORIOS, total, 0.4),
+        'dataPrimeiraDose': formatar_datas(data_notificacao - pd.Timedelta(days=180)).where(rng.random(total) >= 0.4),
+        'dataSegundaDose': formatar_datas(data_notificacao - pd.Timedelta(days=90)).where(rng.random(total) >= 0.55),
+        'codigoEstrategiaCovid': pd.Series(rng.integers(1, 6, total).astype(float)).where(rng.random(total) >= 0.3),
+        'outroBuscaAtivaAssintomatico': None,
+        'outroTriagemPopulacaoEspecifica': None,
+        'outroLocalRealizacaoTestagem': None,
+    })
+
+    for slot, (taxa, taxa_fabricante) in enumerate(zip(TAXA_SLOTS, TAXA_FABRICANTE), start=1):
+        preenchido = rng.random(total) < taxa
+        df[f'codigoEstadoTeste{slot}'] = pd.Series(rng.integers(1, 5, total).astype(float)).where(preenchido)
+        df[f'codigoTipoTeste{slot}'] = pd.Series(rng.integers(1, 8, total).astype(float)).where(preenchido)
+        df[f'codigoFabricanteTeste{slot}'] = pd.Series(rng.integers(1, 40, total).astype(float)).where(
+            preenchido & (rng.random(total) < taxa_fabricante)
+        )
+        df[f'codigoResultadoTeste{slot}'] = pd.Series(rng.integers(1, 4, total).astype(float)).where(
+            preenchido & (rng.random(total) < 0.9)
+        )
+        df[f'dataColetaTeste{slot}'] = formatar_datas(
+            data_notificacao - pd.to_timedelta(rng.integers(0, 3, total), unit='D')
+        ).where(preenchido)
+
+    return df[COLUNAS]
+
+"""
+    Acrescenta um bloco ao CSV. Com pyarrow a escrita é bem mais rápida que
+    DataFrame.to_csv, que domina o tempo de geração.
+"""
+def escrever_bloco(df, destino, cabecalho):
+    if pa is None:
+        df.to_csv(destino, index=False, mode='w' if cabecalho else 'a', header=cabecalho)
+        return
+    with open(destino, 'wb' if cabecalho else 'ab') as f:
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), f,
+                         write_options=pa_csv.WriteOptions(include_header=cabecalho))
+
+"""
+    Escreve `total` notificações em `caminho`, em blocos de `bloco` linhas.
+    Com por_uf, escreve um arquivo por UF de residência no diretório indicado
+    (o formato das extrações estaduais usado pela carga multiarquivo).
+"""
+def gerar_csv(caminho, total, seed=0, bloco=1_000_000, por_uf=None):
+    if por_uf:
+        os.makedirs(por_uf, exist_ok=True)
+    escritos = set()
+    for numero, inicio in enumerate(range(0, total, bloco)):
+        df = gerar_notificacoes(min(bloco, total - inicio), seed=seed + numero, primeiro_id=inicio + 1)
+        if por_uf:
+            for uf, df_uf in df.groupby('estadoIBGE', sort=False):
+                destino = os.path.join(por_uf, f"esus_{uf}.csv")
+                escrever_bloco(df_uf, destino, cabecalho=destino not in escritos)
+                escritos.add(destino)
+        else:
+            escrever_bloco(df, caminho, cabecalho=not numero)
+        print(f"  {min(inicio + bloco, total):,} linhas geradas".replace(",", "."))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerador de CSVs sintéticos do e-SUS Notifica")
+    parser.add_argument("linhas", type=int, help="Quantidade de notificações (ex.: 100000, 1000000, 10000000)")
+    parser.add_argument("saida", nargs="?", default="dataset_sintetico.csv", help="CSV de saída")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bloco", type=int, default=1_000_000, help="Linhas geradas por vez")
+    parser.add_argument("--por-uf", metavar="DIR", help="Escreve um arquivo por UF em DIR")
+    args = parser.parse_args()
+
+    gerar_csv(args.saida, args.linhas, seed=args.seed, bloco=args.bloco, por_uf=args.por_uf)
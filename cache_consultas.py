@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:
+    pa = None
+
+"""
+    CACHE DE CONSULTAS DO DASHBOARD (compartilhado entre processos)
+    O resultado de cada consulta (SQL + parâmetros) fica num arquivo Arrow IPC
+    compactado (lz4) no diretório do cache, visível para todas as réplicas do
+    dashboard na mesma máquina (ou volume). A chave inclui a geração da carga:
+    o MAX(id_carga) de controle_carga, que o pipeline incrementa na mesma
+    transação da carga. Assim os resultados valem até o COMMIT da carga
+    seguinte, sem TTL, e as gerações antigas são apagadas na próxima gravação.
+    O tamanho total é limitado por LRU: cada acerto renova o mtime do arquivo e
+    os menos usados são removidos primeiro.
+"""
+
+DIRETORIO_CACHE_PADRAO = os.environ.get('ESUS_CACHE_DIR', 'cache')
+
+# Tamanho máximo do diretório do cache, em MB.
+TAMANHO_MAXIMO_MB_PADRAO = float(os.environ.get('ESUS_CACHE_MB', 512))
+
+# Intervalo mínimo, em segundos, entre duas consultas da geração ao banco por processo.
+INTERVALO_GERACAO = 5.0
+
+COMPRESSAO = 'lz4'
+
+_geracao = {'valor': None, 'verificada_em': None}
+_trava = threading.Lock()
+
+"""
+    Geração atual da carga, lida do banco no máximo a cada INTERVALO_GERACAO
+    segundos (a consulta usa só o índice da chave primária). Retorna None se o
+    banco não responder; nesse caso o cache fica de fora.
+"""
+def geracao_carga(engine, intervalo=INTERVALO_GERACAO):
+    agora = time.monotonic()
+    with _trava:
+        if _geracao['verificada_em'] is not None and agora - _geracao['verificada_em'] < intervalo:
+            return _geracao['valor']
+    try:
+        with engine.connect() as conn:
+            valor = conn.exec_driver_sql("SELECT COALESCE(MAX(id_carga), 0) FROM controle_carga").scalar()
+    except Exception:
+        return None
+    with _trava:
+        _geracao.update(valor=int(valor), verificada_em=agora)
+    return int(valor)
+
+def chave_consulta(query, params):
+    conteudo = json.dumps([query, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()[:32]
+
+def caminho_cache(query, params, geracao, diretorio=DIRETORIO_CACHE_PADRAO):
+    return os.path.join(diretorio, f"g{geracao}-{chave_consulta(query, params)}.arrow")
+
+"""
+    DataFrame em cache para a consulta na geração, ou None. O arquivo pode ser
+    removido por outro processo entre a checagem e a leitura: conta como falta.
+"""
+def ler_cache(query, params, geracao, diretorio=DIRETORIO_CACHE_PADRAO):
+    if pa is None or geracao is None:
+        return None
+    caminho = caminho_cache(query, params, geracao, diretorio)
+    try:
+        df = feather.read_table(caminho).to_pandas()
+        os.utime(caminho)
+    except (OSError, pa.ArrowException):
+        return None
+    return df
+
+"""
+    Grava o resultado (temporário + rename, como o staging do pipeline) e
+    aplica a retenção. Resultados que o Arrow não consegue representar (colunas
+    object com tipos misturados) simplesmente não entram no cache.
+"""
+def gravar_cache(query, params, geracao, df, diretorio=DIRETORIO_CACHE_PADRAO,
+                 tamanho_maximo_mb=TAMANHO_MAXIMO_MB_PADRAO):
+    if pa is None or geracao is None:
+        return
+    caminho = caminho_cache(query, params, geracao, diretorio)
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(tabela, temporario, compression=COMPRESSAO)
+        os.replace(temporario, caminho)
+    except (OSError, pa.ArrowException):
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        return
+    podar_cache(geracao, diretorio, tamanho_maximo_mb)
+
+"""
+    Remove os arquivos de gerações anteriores e, se o diretório ainda passar do
+    limite, os de mtime mais antigo (menos usados) até caber.
+"""
+def podar_cache(geracao, diretorio=DIRETORIO_CACHE_PADRAO, tamanho_maximo_mb=TAMANHO_MAXIMO_MB_PADRAO):
+    arquivos = []
+    with os.scandir(diretorio) as entradas:
+        for entrada in entradas:
+            if not entrada.name.endswith('.arrow'):
+                continue
+            try:
+                geracao_arquivo = int(entrada.name[1:entrada.name.index('-')])
+                if geracao_arquivo < geracao:
+                    os.remove(entrada.path)
+                    continue
+                info = entrada.stat()
+            except (ValueError, OSError):
+                continue
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+
+    excesso = sum(tamanho for _, tamanho, _ in arquivos) - tamanho_maximo_mb * 2**20
+    for _, tamanho, caminho in sorted(arquivos):
+        if excesso <= 0:
+            break
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+        excesso -= tamanho
@@ -39,18 +39,21 @@ CREATE TABLE Dim_Fabricantes (
 );
 
 
+-- As tabelas fato são particionadas por mês de data_notificacao. Os filhos levam
+-- data_notificacao na FK composta, para que cada mês fique na mesma partição em
+-- todas as fatos e possa ser trocado inteiro (fn_trocar_particao_mes).
 CREATE TABLE Fato_Notificacoes (
-    id_notificacao BIGSERIAL PRIMARY KEY,
+    id_notificacao BIGSERIAL,
     sexo VARCHAR(20),
     idade INT CHECK (idade >= 0),
     profissional_saude BOOLEAN NOT NULL,
     profissional_seguranca BOOLEAN NOT NULL,
     codigo_cbo VARCHAR(255),
     
-    fk_raca_cor SMALLINT REFERENCES Dim_Raca_Cor(id_raca_cor),
-    fk_localidade_residencia INT REFERENCES Dim_Localidades(id_localidade),
-    fk_localidade_notificacao INT REFERENCES Dim_Localidades(id_localidade),
-    fk_evolucao_caso SMALLINT REFERENCES Dim_Evolucao_Caso(id_evolucao),
+    fk_raca_cor SMALLINT REFERENCES Dim_Raca_Cor(id_raca_cor) DEFERRABLE,
+    fk_localidade_residencia INT REFERENCES Dim_Localidades(id_localidade) DEFERRABLE,
+    fk_localidade_notificacao INT REFERENCES Dim_Localidades(id_localidade) DEFERRABLE,
+    fk_evolucao_caso SMALLINT REFERENCES Dim_Evolucao_Caso(id_evolucao) DEFERRABLE,
     
     data_notificacao DATE NOT NULL,
     data_inicio_sintomas DATE NOT NULL,
@@ -64,42 +67,87 @@ CREATE TABLE Fato_Notificacoes (
     nome_fabricante_vacina VARCHAR(255),
     codigo_estrategia_covid INT,
     
-    CHECK (data_inicio_sintomas <= data_notificacao)
-);
+    id_origem VARCHAR(64),
+    hash_origem BIGINT,
+    
+    CHECK (data_inicio_sintomas <= data_notificacao),
+    PRIMARY KEY (id_notificacao, data_notificacao)
+) PARTITION BY RANGE (data_notificacao);
 
 CREATE TABLE Fato_Notificacao_Sintoma (
-    fk_notificacao BIGINT REFERENCES Fato_Notificacoes(id_notificacao) ON DELETE CASCADE,
-    fk_sintoma SMALLINT REFERENCES Dim_Sintomas(id_sintoma),
-    PRIMARY KEY (fk_notificacao, fk_sintoma)
-);
+    fk_notificacao BIGINT,
+    data_notificacao DATE NOT NULL,
+    fk_sintoma SMALLINT REFERENCES Dim_Sintomas(id_sintoma) DEFERRABLE,
+    PRIMARY KEY (fk_notificacao, fk_sintoma, data_notificacao),
+    FOREIGN KEY (fk_notificacao, data_notificacao)
+        REFERENCES Fato_Notificacoes(id_notificacao, data_notificacao) ON DELETE CASCADE DEFERRABLE
+) PARTITION BY RANGE (data_notificacao);
 
 CREATE TABLE Fato_Notificacao_Condicao (
-    fk_notificacao BIGINT REFERENCES Fato_Notificacoes(id_notificacao) ON DELETE CASCADE,
-    fk_condicao SMALLINT REFERENCES Dim_Condicoes(id_condicao),
-    PRIMARY KEY (fk_notificacao, fk_condicao)
-);
+    fk_notificacao BIGINT,
+    data_notificacao DATE NOT NULL,
+    fk_condicao SMALLINT REFERENCES Dim_Condicoes(id_condicao) DEFERRABLE,
+    PRIMARY KEY (fk_notificacao, fk_condicao, data_notificacao),
+    FOREIGN KEY (fk_notificacao, data_notificacao)
+        REFERENCES Fato_Notificacoes(id_notificacao, data_notificacao) ON DELETE CASCADE DEFERRABLE
+) PARTITION BY RANGE (data_notificacao);
 
 CREATE TABLE Fato_Testes_Realizados (
-    id_registro BIGSERIAL PRIMARY KEY,
-    fk_notificacao BIGINT REFERENCES Fato_Notificacoes(id_notificacao) ON DELETE CASCADE,
+    id_registro BIGSERIAL,
+    fk_notificacao BIGINT,
+    data_notificacao DATE NOT NULL,
     data_coleta DATE,
     data_resultado DATE,
     codigo_estado_teste SMALLINT,
     fk_tipo_teste SMALLINT,
     fk_fabricante SMALLINT,
-    fk_resultado_teste SMALLINT
-);
+    fk_resultado_teste SMALLINT,
+    PRIMARY KEY (id_registro, data_notificacao),
+    FOREIGN KEY (fk_notificacao, data_notificacao)
+        REFERENCES Fato_Notificacoes(id_notificacao, data_notificacao) ON DELETE CASCADE DEFERRABLE
+) PARTITION BY RANGE (data_notificacao);
+
+-- BRIN na data (as partições são carregadas ordenadas por data_notificacao) e
+-- B-tree nas FKs de localidade e nas chaves usadas por junções e pela carga incremental.
+CREATE INDEX ix_fato_notificacoes_data ON Fato_Notificacoes USING BRIN (data_notificacao);
+CREATE INDEX ix_fato_notificacoes_residencia ON Fato_Notificacoes (fk_localidade_residencia);
+CREATE INDEX ix_fato_notificacoes_local_notificacao ON Fato_Notificacoes (fk_localidade_notificacao);
+CREATE INDEX ix_fato_notificacoes_origem ON Fato_Notificacoes (id_origem);
+CREATE INDEX ix_fato_testes_notificacao ON Fato_Testes_Realizados (fk_notificacao);
 
+-- Positividade por município de residência e data de notificação, mantida pelo
+-- pipeline (refresh_indicators): o dia e as janelas móveis de 7 e 14 dias. Há linha
+-- sempre que a janela de 14 dias tem teste com resultado; as taxas sem teste no
+-- período ficam nulas. Os totais das janelas permitem somar municípios numa UF.
 CREATE TABLE indicadores_municipais (
     id_indicador SERIAL PRIMARY KEY,
-    fk_localidade INT REFERENCES dim_localidades(id_localidade),
+    fk_localidade INT REFERENCES dim_localidades(id_localidade) DEFERRABLE,
     data_referencia DATE NOT NULL, 
-    taxa_positividade NUMERIC(5, 2) NOT NULL,
+    taxa_positividade NUMERIC(5, 2),
     total_testes INT NOT NULL,
     total_positivos INT NOT NULL,
+    taxa_positividade_7d NUMERIC(5, 2),
+    total_testes_7d INT NOT NULL,
+    total_positivos_7d INT NOT NULL,
+    taxa_positividade_14d NUMERIC(5, 2),
+    total_testes_14d INT NOT NULL,
+    total_positivos_14d INT NOT NULL,
     UNIQUE (fk_localidade, data_referencia)
 );
 
+CREATE INDEX ix_indicadores_data ON indicadores_municipais (data_referencia);
+
+CREATE TABLE controle_carga (
+    id_carga SERIAL PRIMARY KEY,
+    arquivo VARCHAR(255),
+    modo VARCHAR(20) NOT NULL,
+    data_execucao TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    watermark_data_notificacao DATE,
+    total_novos INT NOT NULL,
+    total_alterados INT NOT NULL,
+    total_ignorados INT NOT NULL
+);
+
 CREATE TABLE log_alteracoes (
     id_log BIGSERIAL PRIMARY KEY,
     tabela_afetada VARCHAR(50) NOT NULL,
@@ -112,91 +160,374 @@ CREATE TABLE log_alteracoes (
 );
 
 
+-- Camada de resumos: agregados por data de notificação e município, mantidos pelo
+-- pipeline via fn_atualizar_resumos. As views vw_* leem daqui, então o custo das
+-- consultas do dashboard não depende do tamanho das tabelas fato.
+-- Os nomes de UF/município ficam desnormalizados para filtrar sem JOIN.
+
+CREATE TABLE resumo_casos_municipio (
+    data_notificacao DATE NOT NULL,
+    fk_localidade INT NOT NULL,
+    estado_uf VARCHAR(2),
+    municipio_nome VARCHAR(100),
+    total_notificacoes BIGINT NOT NULL,
+    casos_confirmados BIGINT NOT NULL,
+    casos_descartados BIGINT NOT NULL,
+    obitos BIGINT NOT NULL
+);
+
+CREATE TABLE resumo_perfil_epidemiologico (
+    data_notificacao DATE NOT NULL,
+    fk_localidade INT NOT NULL,
+    estado_uf VARCHAR(2),
+    municipio_nome VARCHAR(100),
+    codigo_ibge_municipio INT,
+    sexo VARCHAR(20),
+    faixa_etaria VARCHAR(20) NOT NULL,
+    descricao_raca_cor VARCHAR(50),
+    classificacao_final VARCHAR(50),
+    total_casos BIGINT NOT NULL,
+    casos_confirmados BIGINT NOT NULL,
+    obitos BIGINT NOT NULL
+);
+
+CREATE TABLE resumo_vacinacao_resultado (
+    data_notificacao DATE NOT NULL,
+    fk_localidade INT NOT NULL,
+    estado_uf VARCHAR(2),
+    municipio_nome VARCHAR(100),
+    classificacao_final VARCHAR(50),
+    status_vacinal VARCHAR(30) NOT NULL,
+    total_casos BIGINT NOT NULL
+);
+
+CREATE TABLE resumo_sintomas (
+    data_notificacao DATE NOT NULL,
+    fk_localidade INT NOT NULL,
+    estado_uf VARCHAR(2),
+    municipio_nome VARCHAR(100),
+    nome_sintoma VARCHAR(100),
+    total_ocorrencias BIGINT NOT NULL
+);
+
+CREATE TABLE resumo_laboratorial (
+    data_notificacao DATE NOT NULL,
+    fk_localidade INT NOT NULL,
+    estado_uf VARCHAR(2),
+    municipio_nome VARCHAR(100),
+    tipo_teste VARCHAR(100),
+    fabricante VARCHAR(100),
+    total_testes BIGINT NOT NULL
+);
+
+CREATE INDEX ix_resumo_casos_data ON resumo_casos_municipio (data_notificacao);
+CREATE INDEX ix_resumo_casos_uf ON resumo_casos_municipio (estado_uf, municipio_nome);
+CREATE INDEX ix_resumo_casos_municipio ON resumo_casos_municipio (municipio_nome);
+
+CREATE INDEX ix_resumo_perfil_data ON resumo_perfil_epidemiologico (data_notificacao);
+CREATE INDEX ix_resumo_perfil_uf ON resumo_perfil_epidemiologico (estado_uf, municipio_nome);
+CREATE INDEX ix_resumo_perfil_municipio ON resumo_perfil_epidemiologico (municipio_nome);
+
+CREATE INDEX ix_resumo_vacinacao_data ON resumo_vacinacao_resultado (data_notificacao);
+CREATE INDEX ix_resumo_vacinacao_uf ON resumo_vacinacao_resultado (estado_uf, municipio_nome);
+CREATE INDEX ix_resumo_vacinacao_municipio ON resumo_vacinacao_resultado (municipio_nome);
+
+CREATE INDEX ix_resumo_sintomas_data ON resumo_sintomas (data_notificacao);
+CREATE INDEX ix_resumo_sintomas_uf ON resumo_sintomas (estado_uf, municipio_nome);
+CREATE INDEX ix_resumo_sintomas_municipio ON resumo_sintomas (municipio_nome);
+
+CREATE INDEX ix_resumo_laboratorial_data ON resumo_laboratorial (data_notificacao);
+CREATE INDEX ix_resumo_laboratorial_uf ON resumo_laboratorial (estado_uf, municipio_nome);
+CREATE INDEX ix_resumo_laboratorial_municipio ON resumo_laboratorial (municipio_nome);
+
+
+-- Recalcula os resumos das datas informadas (NULL = todas).
+-- Usa DELETE + INSERT na transação da carga, sem TRUNCATE: quem lê as views
+-- continua vendo a versão anterior até o COMMIT, sem bloqueio.
+-- As junções com as fatos filhas levam data_notificacao (a chave da partição)
+-- e a função roda com enable_partitionwise_join: cada mês de fato_notificacoes
+-- é juntado só com o mesmo mês da filha, e um recálculo por datas lê só os
+-- meses delas.
+CREATE OR REPLACE FUNCTION fn_atualizar_resumos(p_datas DATE[] DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM resumo_casos_municipio WHERE p_datas IS NULL OR data_notificacao = ANY(p_datas);
+    DELETE FROM resumo_perfil_epidemiologico WHERE p_datas IS NULL OR data_notificacao = ANY(p_datas);
+    DELETE FROM resumo_vacinacao_resultado WHERE p_datas IS NULL OR data_notificacao = ANY(p_datas);
+    DELETE FROM resumo_sintomas WHERE p_datas IS NULL OR data_notificacao = ANY(p_datas);
+    DELETE FROM resumo_laboratorial WHERE p_datas IS NULL OR data_notificacao = ANY(p_datas);
+
+    INSERT INTO resumo_casos_municipio
+    SELECT
+        fn.data_notificacao,
+        dl.id_localidade,
+        dl.estado_uf,
+        dl.municipio_nome,
+        COUNT(fn.id_notificacao),
+        SUM(CASE WHEN fn.classificacao_final = 'Confirmado Laboratorial' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN fn.classificacao_final = 'Descartado' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN de.descricao_evolucao = 'Óbito' THEN 1 ELSE 0 END)
+    FROM fato_notificacoes fn
+    JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
+    LEFT JOIN dim_evolucao_caso de ON fn.fk_evolucao_caso = de.id_evolucao
+    WHERE p_datas IS NULL OR fn.data_notificacao = ANY(p_datas)
+    GROUP BY 1, 2, 3, 4;
+
+    INSERT INTO resumo_perfil_epidemiologico
+    SELECT
+        fn.data_notificacao,
+        dl.id_localidade,
+        dl.estado_uf,
+        dl.municipio_nome,
+        dl.codigo_ibge_municipio,
+        fn.sexo,
+        CASE
+            WHEN fn.idade < 10 THEN '0-9 anos'
+            WHEN fn.idade BETWEEN 10 AND 19 THEN '10-19 anos'
+            WHEN fn.idade BETWEEN 20 AND 39 THEN '20-39 anos'
+            WHEN fn.idade BETWEEN 40 AND 59 THEN '40-59 anos'
+            WHEN fn.idade >= 60 THEN '60+ anos'
+            ELSE 'Não Informado'
+        END,
+        drc.descricao_raca_cor,
+        fn.classificacao_final,
+        COUNT(fn.id_notificacao),
+        SUM(CASE WHEN fn.classificacao_final = 'Confirmado Laboratorial' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN de.descricao_evolucao = 'Óbito' THEN 1 ELSE 0 END)
+    FROM fato_notificacoes fn
+    JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
+    LEFT JOIN dim_raca_cor drc ON fn.fk_raca_cor = drc.id_raca_cor
+    LEFT JOIN dim_evolucao_caso de ON fn.fk_evolucao_caso = de.id_evolucao
+    WHERE p_datas IS NULL OR fn.data_notificacao = ANY(p_datas)
+    GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9;
+
+    INSERT INTO resumo_vacinacao_resultado
+    SELECT
+        fn.data_notificacao,
+        dl.id_localidade,
+        dl.estado_uf,
+        dl.municipio_nome,
+        fn.classificacao_final,
+        CASE
+            WHEN fn.codigo_recebeu_vacina = 2 THEN 'Não Vacinado'
+            WHEN fn.codigo_doses_vacina IS NULL OR fn.codigo_doses_vacina = '' THEN 'Não Informado/Sem Doses'
+            WHEN fn.codigo_doses_vacina LIKE '%,%' THEN '2 ou Mais Doses'
+            ELSE '1 Dose / Outros'
+        END,
+        COUNT(fn.id_notificacao)
+    FROM fato_notificacoes fn
+    JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
+    WHERE fn.classificacao_final IN ('Confirmado Laboratorial', 'Descartado')
+      AND (p_datas IS NULL OR fn.data_notificacao = ANY(p_datas))
+    GROUP BY 1, 2, 3, 4, 5, 6;
+
+    INSERT INTO resumo_sintomas
+    SELECT
+        fn.data_notificacao,
+        dl.id_localidade,
+        dl.estado_uf,
+        dl.municipio_nome,
+        ds.nome_sintoma,
+        COUNT(fns.fk_notificacao)
+    FROM fato_notificacoes fn
+    JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
+    JOIN fato_notificacao_sintoma fns
+      ON fns.fk_notificacao = fn.id_notificacao AND fns.data_notificacao = fn.data_notificacao
+    JOIN dim_sintomas ds ON fns.fk_sintoma = ds.id_sintoma
+    WHERE fn.classificacao_final = 'Confirmado Laboratorial'
+      AND (p_datas IS NULL OR fn.data_notificacao = ANY(p_datas))
+    GROUP BY 1, 2, 3, 4, 5;
+
+    INSERT INTO resumo_laboratorial
+    SELECT
+        fn.data_notificacao,
+        dl.id_localidade,
+        dl.estado_uf,
+        dl.municipio_nome,
+        COALESCE(dt.descricao_tipo_teste, 'Tipo Não Informado'),
+        COALESCE(df.nome_fabricante, 'Fabricante Não Informado'),
+        COUNT(*)
+    FROM Fato_Testes_Realizados ftr
+    JOIN fato_notificacoes fn
+      ON fn.id_notificacao = ftr.fk_notificacao AND fn.data_notificacao = ftr.data_notificacao
+    JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
+    LEFT JOIN dim_tipos_testes dt ON ftr.fk_tipo_teste = dt.id_tipo_teste
+    LEFT JOIN dim_fabricantes df ON ftr.fk_fabricante = df.id_fabricante
+    WHERE p_datas IS NULL OR fn.data_notificacao = ANY(p_datas)
+    GROUP BY 1, 2, 3, 4, 5, 6;
+
+    -- O upsert incremental pode renomear municípios já resumidos em outras datas.
+    IF p_datas IS NOT NULL THEN
+        UPDATE resumo_casos_municipio r SET estado_uf = dl.estado_uf, municipio_nome = dl.municipio_nome
+        FROM dim_localidades dl
+        WHERE r.fk_localidade = dl.id_localidade
+          AND (r.estado_uf, r.municipio_nome) IS DISTINCT FROM (dl.estado_uf, dl.municipio_nome);
+        UPDATE resumo_perfil_epidemiologico r SET estado_uf = dl.estado_uf, municipio_nome = dl.municipio_nome
+        FROM dim_localidades dl
+        WHERE r.fk_localidade = dl.id_localidade
+          AND (r.estado_uf, r.municipio_nome) IS DISTINCT FROM (dl.estado_uf, dl.municipio_nome);
+        UPDATE resumo_vacinacao_resultado r SET estado_uf = dl.estado_uf, municipio_nome = dl.municipio_nome
+        FROM dim_localidades dl
+        WHERE r.fk_localidade = dl.id_localidade
+          AND (r.estado_uf, r.municipio_nome) IS DISTINCT FROM (dl.estado_uf, dl.municipio_nome);
+        UPDATE resumo_sintomas r SET estado_uf = dl.estado_uf, municipio_nome = dl.municipio_nome
+        FROM dim_localidades dl
+        WHERE r.fk_localidade = dl.id_localidade
+          AND (r.estado_uf, r.municipio_nome) IS DISTINCT FROM (dl.estado_uf, dl.municipio_nome);
+        UPDATE resumo_laboratorial r SET estado_uf = dl.estado_uf, municipio_nome = dl.municipio_nome
+        FROM dim_localidades dl
+        WHERE r.fk_localidade = dl.id_localidade
+          AND (r.estado_uf, r.municipio_nome) IS DISTINCT FROM (dl.estado_uf, dl.municipio_nome);
+    END IF;
+END;
+$$ LANGUAGE plpgsql SET enable_partitionwise_join = on;
+
+
+-- Cria (se faltar) a partição do mês em todas as tabelas fato. Usada pela carga
+-- incremental, que insere pelo pai e depende do roteamento por partição.
+CREATE OR REPLACE FUNCTION fn_criar_particao_mes(p_mes DATE)
+RETURNS VOID AS $$
+DECLARE
+    v_inicio DATE := date_trunc('month', p_mes);
+    v_fim DATE := date_trunc('month', p_mes) + INTERVAL '1 month';
+    v_tabela TEXT;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['fato_notificacoes', 'fato_notificacao_sintoma',
+                                    'fato_notificacao_condicao', 'fato_testes_realizados'] LOOP
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       v_tabela || to_char(v_inicio, '_YYYY_MM'), v_tabela, v_inicio, v_fim);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Troca o mês inteiro das tabelas fato pelas tabelas de staging stg_<tabela>_AAAA_MM
+-- (carregadas via COPY pelo pipeline). A partição antiga, se houver, é desanexada e
+-- removida; a nova é anexada. Recarregar um mês vira operação de catálogo, sem
+-- DELETE + INSERT em massa. Quem referencia fato_notificacoes sai primeiro e entra
+-- por último, para que as FKs compostas sejam válidas a cada passo.
+CREATE OR REPLACE FUNCTION fn_trocar_particao_mes(p_mes DATE)
+RETURNS VOID AS $$
+DECLARE
+    v_inicio DATE := date_trunc('month', p_mes);
+    v_fim DATE := date_trunc('month', p_mes) + INTERVAL '1 month';
+    v_sufixo TEXT := to_char(v_inicio, '_YYYY_MM');
+    v_tabela TEXT;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['fato_testes_realizados', 'fato_notificacao_condicao',
+                                    'fato_notificacao_sintoma', 'fato_notificacoes'] LOOP
+        IF to_regclass(v_tabela || v_sufixo) IS NOT NULL THEN
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', v_tabela, v_tabela || v_sufixo);
+            EXECUTE format('DROP TABLE %I', v_tabela || v_sufixo);
+        END IF;
+    END LOOP;
+
+    FOREACH v_tabela IN ARRAY ARRAY['fato_notificacoes', 'fato_notificacao_sintoma',
+                                    'fato_notificacao_condicao', 'fato_testes_realizados'] LOOP
+        IF to_regclass('stg_' || v_tabela || v_sufixo) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                           'stg_' || v_tabela || v_sufixo, v_tabela);
+        END IF;
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', 'stg_' || v_tabela || v_sufixo, v_tabela || v_sufixo);
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       v_tabela, v_tabela || v_sufixo, v_inicio, v_fim);
+    END LOOP;
+
+    -- As linhas anexadas não passam pelo trigger de auditoria: registra a troca.
+    INSERT INTO log_alteracoes (tabela_afetada, operacao, dados_novos)
+    SELECT 'fato_notificacoes', 'ATTACH',
+           jsonb_build_object('mes', to_char(v_inicio, 'YYYY-MM'), 'linhas', COUNT(*),
+                              'id_min', MIN(id_notificacao), 'id_max', MAX(id_notificacao),
+                              'hash_conteudo', md5(string_agg(hash_origem::TEXT, ',' ORDER BY id_notificacao)))
+    FROM fato_notificacoes
+    WHERE data_notificacao >= v_inicio AND data_notificacao < v_fim;
+END;
+$$ LANGUAGE plpgsql;
+
+
 CREATE OR REPLACE VIEW vw_casos_por_municipio AS
 SELECT
-    dl.municipio_nome,
-    dl.estado_uf,
-    fn.data_notificacao,
-    COUNT(fn.id_notificacao) AS total_notificacoes,
-    SUM(CASE WHEN fn.classificacao_final = 'Confirmado Laboratorial' THEN 1 ELSE 0 END) AS casos_confirmados,
-    SUM(CASE WHEN fn.classificacao_final = 'Descartado' THEN 1 ELSE 0 END) AS casos_descartados,
-    SUM(CASE WHEN de.descricao_evolucao = 'Óbito' THEN 1 ELSE 0 END) AS obitos
-FROM fato_notificacoes fn
-JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
-LEFT JOIN dim_evolucao_caso de ON fn.fk_evolucao_caso = de.id_evolucao
+    municipio_nome,
+    estado_uf,
+    data_notificacao,
+    SUM(total_notificacoes)::BIGINT AS total_notificacoes,
+    SUM(casos_confirmados)::BIGINT AS casos_confirmados,
+    SUM(casos_descartados)::BIGINT AS casos_descartados,
+    SUM(obitos)::BIGINT AS obitos
+FROM resumo_casos_municipio
 GROUP BY 1, 2, 3;
 
 CREATE OR REPLACE VIEW vw_vacinacao_por_resultado AS
 SELECT
-    fn.classificacao_final,
-    CASE
-        WHEN fn.codigo_recebeu_vacina = 2 THEN 'Não Vacinado'
-        WHEN fn.codigo_doses_vacina IS NULL OR fn.codigo_doses_vacina = '' THEN 'Não Informado/Sem Doses'
-        WHEN fn.codigo_doses_vacina LIKE '%,%' THEN '2 ou Mais Doses'
-        ELSE '1 Dose / Outros'
-    END AS status_vacinal,
-    dl.estado_uf,
-    dl.municipio_nome,
-    COUNT(fn.id_notificacao) AS total_casos
-FROM fato_notificacoes fn
-JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
-WHERE fn.classificacao_final IN ('Confirmado Laboratorial', 'Descartado')
+    classificacao_final,
+    status_vacinal,
+    estado_uf,
+    municipio_nome,
+    SUM(total_casos)::BIGINT AS total_casos
+FROM resumo_vacinacao_resultado
 GROUP BY 1, 2, 3, 4;
 
 CREATE OR REPLACE VIEW vw_sintomas_frequentes AS
 SELECT
-    dl.estado_uf,
-    dl.municipio_nome,
-    ds.nome_sintoma,
-    COUNT(fns.fk_notificacao) AS total_ocorrencias
-FROM fato_notificacoes fn
-JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
-JOIN fato_notificacao_sintoma fns ON fn.id_notificacao = fns.fk_notificacao
-JOIN dim_sintomas ds ON fns.fk_sintoma = ds.id_sintoma
-WHERE fn.classificacao_final = 'Confirmado Laboratorial'
+    estado_uf,
+    municipio_nome,
+    nome_sintoma,
+    SUM(total_ocorrencias)::BIGINT AS total_ocorrencias
+FROM resumo_sintomas
 GROUP BY 1, 2, 3;
 
 CREATE OR REPLACE VIEW vw_perfil_epidemiologico AS
 SELECT
-    dl.municipio_nome,
-    dl.estado_uf,
-    dl.codigo_ibge_municipio, 
-    fn.sexo,
-    CASE 
-        WHEN fn.idade < 10 THEN '0-9 anos'
-        WHEN fn.idade BETWEEN 10 AND 19 THEN '10-19 anos'
-        WHEN fn.idade BETWEEN 20 AND 39 THEN '20-39 anos'
-        WHEN fn.idade BETWEEN 40 AND 59 THEN '40-59 anos'
-        WHEN fn.idade >= 60 THEN '60+ anos'
-        ELSE 'Não Informado'
-    END AS faixa_etaria,
-    drc.descricao_raca_cor,
-    fn.classificacao_final,
-    COUNT(fn.id_notificacao) AS total_casos,
-    SUM(CASE WHEN fn.classificacao_final = 'Confirmado Laboratorial' THEN 1 ELSE 0 END) AS casos_confirmados,
-    SUM(CASE WHEN de.descricao_evolucao = 'Óbito' THEN 1 ELSE 0 END) AS obitos
-FROM fato_notificacoes fn
-JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
-LEFT JOIN dim_raca_cor drc ON fn.fk_raca_cor = drc.id_raca_cor
-LEFT JOIN dim_evolucao_caso de ON fn.fk_evolucao_caso = de.id_evolucao
+    municipio_nome,
+    estado_uf,
+    codigo_ibge_municipio,
+    sexo,
+    faixa_etaria,
+    descricao_raca_cor,
+    classificacao_final,
+    SUM(total_casos)::BIGINT AS total_casos,
+    SUM(casos_confirmados)::BIGINT AS casos_confirmados,
+    SUM(obitos)::BIGINT AS obitos
+FROM resumo_perfil_epidemiologico
 GROUP BY 1, 2, 3, 4, 5, 6, 7;
 
 CREATE OR REPLACE VIEW vw_analise_laboratorial AS
 SELECT
-    dl.estado_uf,
-    dl.municipio_nome,
-    COALESCE(dt.descricao_tipo_teste, 'Tipo Não Informado') as tipo_teste,
-    COALESCE(df.nome_fabricante, 'Fabricante Não Informado') as fabricante,
+    estado_uf,
+    municipio_nome,
+    tipo_teste,
+    fabricante,
     1 as source_id,
-    COUNT(*) as total_testes
-FROM Fato_Testes_Realizados ftr
-JOIN fato_notificacoes fn ON ftr.fk_notificacao = fn.id_notificacao
-JOIN dim_localidades dl ON fn.fk_localidade_residencia = dl.id_localidade
-LEFT JOIN dim_tipos_testes dt ON ftr.fk_tipo_teste = dt.id_tipo_teste
-LEFT JOIN dim_fabricantes df ON ftr.fk_fabricante = df.id_fabricante
+    SUM(total_testes)::BIGINT as total_testes
+FROM resumo_laboratorial
 GROUP BY 1, 2, 3, 4, 5;
 
+CREATE OR REPLACE VIEW vw_indicadores_municipais AS
+SELECT
+    dl.estado_uf,
+    dl.municipio_nome,
+    dl.codigo_ibge_municipio,
+    im.data_referencia,
+    im.taxa_positividade,
+    im.total_testes,
+    im.total_positivos,
+    im.taxa_positividade_7d,
+    im.total_testes_7d,
+    im.total_positivos_7d,
+    im.taxa_positividade_14d,
+    im.total_testes_14d,
+    im.total_positivos_14d
+FROM indicadores_municipais im
+JOIN dim_localidades dl ON im.fk_localidade = dl.id_localidade;
+
 
+-- Auditoria de fato_notificacoes em dois modos:
+-- * interativo (padrão): um registro por linha com o JSONB completo (antes/depois);
+-- * carga em lote: com auditoria.modo_lote = 'on' na sessão (o pipeline liga via
+--   set_config na transação da carga), os triggers por linha nem disparam e cada
+--   comando (cada lote de COPY ou DELETE) gera um único registro-resumo com a
+--   quantidade de linhas, a faixa de ids e o hash do conteúdo, lido das tabelas
+--   de transição.
+-- tabela_afetada é fixa: em tabela particionada TG_TABLE_NAME seria o da partição.
 CREATE OR REPLACE FUNCTION ft_auditoria_notificacoes()
 RETURNS TRIGGER AS $$
 DECLARE
@@ -206,20 +537,20 @@ BEGIN
     IF (TG_OP = 'INSERT') THEN
         v_new_data := to_jsonb(NEW);
         INSERT INTO log_alteracoes (tabela_afetada, operacao, registro_id, dados_novos)
-        VALUES (TG_TABLE_NAME, TG_OP, NEW.id_notificacao, v_new_data);
+        VALUES ('fato_notificacoes', TG_OP, NEW.id_notificacao, v_new_data);
         RETURN NEW;
     ELSIF (TG_OP = 'UPDATE') THEN
         v_old_data := to_jsonb(OLD);
         v_new_data := to_jsonb(NEW);
         IF v_old_data IS DISTINCT FROM v_new_data THEN
             INSERT INTO log_alteracoes (tabela_afetada, operacao, registro_id, dados_antigos, dados_novos)
-            VALUES (TG_TABLE_NAME, TG_OP, NEW.id_notificacao, v_old_data, v_new_data);
+            VALUES ('fato_notificacoes', TG_OP, NEW.id_notificacao, v_old_data, v_new_data);
         END IF;
         RETURN NEW;
     ELSIF (TG_OP = 'DELETE') THEN
         v_old_data := to_jsonb(OLD);
         INSERT INTO log_alteracoes (tabela_afetada, operacao, registro_id, dados_antigos)
-        VALUES (TG_TABLE_NAME, TG_OP, OLD.id_notificacao, v_old_data);
+        VALUES ('fato_notificacoes', TG_OP, OLD.id_notificacao, v_old_data);
         RETURN OLD;
     END IF;
 END;
@@ -228,4 +559,51 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER tr_auditoria_notificacoes
 AFTER INSERT OR UPDATE OR DELETE ON fato_notificacoes
 FOR EACH ROW
-EXECUTE FUNCTION ft_auditoria_notificacoes();
\ No newline at end of file
+WHEN (current_setting('auditoria.modo_lote', true) IS DISTINCT FROM 'on')
+EXECUTE FUNCTION ft_auditoria_notificacoes();
+
+CREATE OR REPLACE FUNCTION ft_auditoria_notificacoes_lote()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_resumo JSONB;
+BEGIN
+    IF current_setting('auditoria.modo_lote', true) IS DISTINCT FROM 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF (TG_OP = 'INSERT') THEN
+        SELECT jsonb_build_object('lote', true, 'linhas', COUNT(*),
+                                  'id_min', MIN(id_notificacao), 'id_max', MAX(id_notificacao),
+                                  'hash_conteudo', md5(string_agg(hash_origem::TEXT, ',' ORDER BY id_notificacao)))
+        INTO v_resumo FROM novas;
+        IF (v_resumo->>'linhas')::BIGINT > 0 THEN
+            INSERT INTO log_alteracoes (tabela_afetada, operacao, dados_novos)
+            VALUES ('fato_notificacoes', TG_OP, v_resumo);
+        END IF;
+    ELSIF (TG_OP = 'DELETE') THEN
+        SELECT jsonb_build_object('lote', true, 'linhas', COUNT(*),
+                                  'id_min', MIN(id_notificacao), 'id_max', MAX(id_notificacao),
+                                  'hash_conteudo', md5(string_agg(hash_origem::TEXT, ',' ORDER BY id_notificacao)))
+        INTO v_resumo FROM antigas;
+        IF (v_resumo->>'linhas')::BIGINT > 0 THEN
+            INSERT INTO log_alteracoes (tabela_afetada, operacao, dados_antigos)
+            VALUES ('fato_notificacoes', TG_OP, v_resumo);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Um trigger por operação: uma tabela de transição só pode ser declarada
+-- para o evento correspondente.
+CREATE TRIGGER tr_auditoria_notificacoes_lote_insert
+AFTER INSERT ON fato_notificacoes
+REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT
+EXECUTE FUNCTION ft_auditoria_notificacoes_lote();
+
+CREATE TRIGGER tr_auditoria_notificacoes_lote_delete
+AFTER DELETE ON fato_notificacoes
+REFERENCING OLD TABLE AS antigas
+FOR EACH STATEMENT
+EXECUTE FUNCTION ft_auditoria_notificacoes_lote();
@@ -0,0 +1,327 @@
+import numpy as np
+import pandas as pd
+
+from instrumentacao import etapa
+from series_temporais import inicio_periodo
+
+"""
+    CUBO DO DASHBOARD
+    Os resumos do banco são lidos uma vez por geração da carga e guardados em
+    arrays NumPy com as dimensões codificadas como inteiros: localidade, data
+    e as categorias de cada bloco, com as medidas já somadas. Cada bloco é
+    consolidado em três níveis:
+        brasil     (data, categorias)
+        uf         (UF, data, categorias)
+        municipio  (localidade, data, categorias)
+    ordenados pela chave geográfica, com offsets por UF e por localidade: o
+    filtro da sidebar vira uma fatia contígua do nível certo, e cada KPI ou
+    gráfico é um bincount sobre ela. Nenhuma troca de filtro volta ao banco.
+    As localidades seguem a ordem (UF, município), então os municípios de uma
+    UF também são contíguos.
+"""
+
+# Bloco -> (consulta, coluna de data, categorias, medidas). Todas as consultas
+# devolvem fk_localidade, a coluna de data, as categorias e as medidas somadas.
+# Os resumos não cruzam vacinação com sexo e faixa etária, por isso cada
+# resumo vira um bloco; localidades e datas têm a mesma codificação em todos.
+BLOCOS = {
+    'perfil': (
+        "SELECT fk_localidade, data_notificacao, sexo, faixa_etaria, classificacao_final, "
+        "SUM(total_casos)::BIGINT AS total_casos, SUM(casos_confirmados)::BIGINT AS casos_confirmados, "
+        "SUM(obitos)::BIGINT AS obitos "
+        "FROM resumo_perfil_epidemiologico GROUP BY 1, 2, 3, 4, 5",
+        'data_notificacao', ['sexo', 'faixa_etaria', 'classificacao_final'],
+        ['total_casos', 'casos_confirmados', 'obitos'],
+    ),
+    'vacinacao': (
+        "SELECT fk_localidade, data_notificacao, status_vacinal, classificacao_final, "
+        "SUM(total_casos)::BIGINT AS total_casos "
+        "FROM resumo_vacinacao_resultado GROUP BY 1, 2, 3, 4",
+        'data_notificacao', ['status_vacinal', 'classificacao_final'], ['total_casos'],
+    ),
+    'sintomas': (
+        "SELECT fk_localidade, data_notificacao, nome_sintoma, "
+        "SUM(total_ocorrencias)::BIGINT AS total_ocorrencias "
+        "FROM resumo_sintomas GROUP BY 1, 2, 3",
+        'data_notificacao', ['nome_sintoma'], ['total_ocorrencias'],
+    ),
+    # Mesma origem fixa (source_id = 1) da vw_analise_laboratorial.
+    'laboratorio': (
+        "SELECT fk_localidade, data_notificacao, 1 AS source_id, SUM(total_testes)::BIGINT AS total_testes "
+        "FROM resumo_laboratorial GROUP BY 1, 2",
+        'data_notificacao', ['source_id'], ['total_testes'],
+    ),
+    'positividade': (
+        "SELECT fk_localidade, data_referencia, "
+        "total_testes, total_positivos, total_testes_7d, total_positivos_7d, "
+        "total_testes_14d, total_positivos_14d "
+        "FROM indicadores_municipais",
+        'data_referencia', [],
+        ['total_testes', 'total_positivos', 'total_testes_7d', 'total_positivos_7d',
+         'total_testes_14d', 'total_positivos_14d'],
+    ),
+}
+
+CONSULTA_LOCALIDADES = (
+    "SELECT id_localidade, estado_uf, municipio_nome, codigo_ibge_municipio "
+    "FROM dim_localidades ORDER BY estado_uf, municipio_nome, id_localidade"
+)
+
+NIVEIS = ['brasil', 'uf', 'municipio']
+
+# Acima deste número de combinações o agrupamento usa np.unique em vez de um
+# bincount denso sobre todas elas.
+LIMITE_BINCOUNT = 2**20
+
+def _compactar(valores):
+    valores = np.asarray(valores)
+    if valores.size == 0:
+        return valores.astype(np.int32)
+    if valores.dtype.kind == 'f':
+        valores = np.rint(valores).astype(np.int64)
+    menor, maior = valores.min(), valores.max()
+    for tipo in (np.int8, np.int16, np.int32):
+        if np.iinfo(tipo).min <= menor and maior <= np.iinfo(tipo).max:
+            return valores.astype(tipo)
+    return valores.astype(np.int64)
+
+"""
+    Soma as medidas por combinação de chaves (códigos inteiros com os tamanhos
+    dados). Retorna as chaves distintas, em ordem, e as somas.
+"""
+def consolidar(chaves, tamanhos, medidas):
+    combinada = np.ravel_multi_index([np.asarray(c, dtype=np.int64) for c in chaves], tamanhos)
+    unicas, inverso = np.unique(combinada, return_inverse=True)
+    somas = [np.bincount(inverso, weights=m, minlength=len(unicas)) for m in medidas]
+    return [_compactar(c) for c in np.unravel_index(unicas, tamanhos)], [_compactar(s) for s in somas]
+
+def offsets(chave_ordenada, total):
+    return np.searchsorted(chave_ordenada, np.arange(total + 1)).astype(np.int64)
+
+"""
+    Monta o cubo a partir de uma função ler(consulta) -> DataFrame (no
+    dashboard, o get_data com o cache compartilhado).
+"""
+def construir_cubo(ler):
+    localidades = ler(CONSULTA_LOCALIDADES).reset_index(drop=True)
+    codigos_uf, ufs = pd.factorize(localidades['estado_uf'], use_na_sentinel=False)
+    localidades['uf'] = _compactar(codigos_uf)
+    posicoes = pd.Index(localidades['id_localidade'])
+
+    dados = {}
+    for nome, (consulta, coluna_data, _, _) in BLOCOS.items():
+        df = ler(consulta)
+        dados[nome] = df[posicoes.get_indexer(df['fk_localidade']) >= 0] if not df.empty else df
+    datas = np.unique(np.concatenate([
+        df[BLOCOS[nome][1]].to_numpy(dtype='datetime64[D]') for nome, df in dados.items()
+    ] or [np.array([], dtype='datetime64[D]')]))
+
+    cubo = {
+        'localidades': localidades,
+        'ufs': np.asarray(ufs, dtype=object),
+        'datas': datas,
+        'blocos': {},
+    }
+    for nome, df in dados.items():
+        cubo['blocos'][nome] = construir_bloco(cubo, df, *BLOCOS[nome][1:], posicoes=posicoes)
+    return cubo
+
+def construir_bloco(cubo, df, coluna_data, categorias, medidas, posicoes):
+    n_localidades, n_ufs, n_datas = len(cubo['localidades']), len(cubo['ufs']), len(cubo['datas'])
+    posicao = posicoes.get_indexer(df['fk_localidade'])
+    data = np.searchsorted(cubo['datas'], df[coluna_data].to_numpy(dtype='datetime64[D]'))
+    codigos, rotulos = [], {}
+    for categoria in categorias:
+        codigo, rotulos[categoria] = pd.factorize(df[categoria], sort=True, use_na_sentinel=False)
+        codigos.append(codigo)
+    tamanhos = [n_datas] + [max(len(rotulos[c]), 1) for c in categorias]
+    valores = [df[m].fillna(0).to_numpy(dtype=np.float64) for m in medidas]
+
+    uf = cubo['localidades']['uf'].to_numpy()[posicao] if len(df) else np.array([], dtype=np.int64)
+    chaves_nivel = {
+        'brasil': ([], []),
+        'uf': ([uf], [max(n_ufs, 1)]),
+        'municipio': ([posicao], [max(n_localidades, 1)]),
+    }
+    bloco = {
+        'coluna_data': coluna_data,
+        'categorias': {c: np.asarray(r, dtype=object) for c, r in rotulos.items()},
+        'medidas': medidas,
+        'niveis': {},
+    }
+    for nivel, (geografia, tamanho_geografia) in chaves_nivel.items():
+        if len(df):
+            chaves, somas = consolidar(geografia + [data] + codigos, tamanho_geografia + tamanhos, valores)
+        else:
+            chaves = [np.array([], dtype=np.int32)] * (len(geografia) + 1 + len(codigos))
+            somas = [np.array([], dtype=np.int32)] * len(medidas)
+        colunas = dict(zip(['geografia'] * len(geografia) + ['data'] + categorias, chaves))
+        colunas.update(zip(medidas, somas))
+        bloco['niveis'][nivel] = {
+            'colunas': colunas,
+            'linhas': len(chaves[0]),
+            'offsets': offsets(colunas['geografia'], tamanho_geografia[0]) if geografia else None,
+        }
+    return bloco
+
+def tamanho_cubo(cubo):
+    total = int(cubo['localidades'].memory_usage(deep=True).sum()) + cubo['datas'].nbytes
+    for bloco in cubo['blocos'].values():
+        for nivel in bloco['niveis'].values():
+            total += sum(coluna.nbytes for coluna in nivel['colunas'].values())
+    return total
+
+"""
+    Nível a consultar e membros selecionados nele (posições de localidade ou
+    códigos de UF; None = todos). O nível é o mais agregado que ainda atende
+    ao filtro e ao agrupamento pedido.
+"""
+def selecao(cubo, estado, municipio, por=()):
+    localidades = cubo['localidades']
+    if municipio != 'Todos' or 'localidade' in por:
+        if municipio == 'Todos' and estado == 'Todos':
+            return 'municipio', None
+        mascara = np.ones(len(localidades), dtype=bool)
+        if estado != 'Todos':
+            mascara &= localidades['estado_uf'].to_numpy() == estado
+        if municipio != 'Todos':
+            mascara &= localidades['municipio_nome'].to_numpy() == municipio
+        return 'municipio', np.flatnonzero(mascara)
+    if estado != 'Todos' or 'estado_uf' in por:
+        if estado == 'Todos':
+            return 'uf', None
+        return 'uf', np.flatnonzero(cubo['ufs'] == estado)
+    return 'brasil', None
+
+"""
+    Linhas do nível para os membros: uma fatia (view, sem cópia) quando os
+    membros são consecutivos, senão os intervalos concatenados.
+"""
+def linhas_membros(nivel, membros):
+    if membros is None:
+        return slice(0, nivel['linhas'])
+    if len(membros) == 0:
+        return slice(0, 0)
+    inicios, fins = nivel['offsets'][membros], nivel['offsets'][membros + 1]
+    if np.array_equal(membros, np.arange(membros[0], membros[0] + len(membros))):
+        return slice(int(inicios[0]), int(fins[-1]))
+    tamanhos = fins - inicios
+    deslocamento = np.repeat(inicios - np.concatenate([[0], np.cumsum(tamanhos)[:-1]]), tamanhos)
+    return np.arange(tamanhos.sum()) + deslocamento
+
+"""
+    Soma as medidas do bloco para o filtro (estado, município) agrupando por
+    `por`: 'estado_uf', 'localidade' (UF, município e código IBGE), a coluna de
+    data do bloco, 'periodo' (início do período no grão `granularidade`) ou as
+    categorias do bloco. periodo_datas=(inicio, fim) recorta as datas. Sem
+    linhas selecionadas retorna um DataFrame vazio, como a consulta SQL.
+"""
+def agregar(cubo, nome_bloco, estado, municipio, por=(), medidas=None, periodo_datas=None, granularidade='dia'):
+    bloco = cubo['blocos'][nome_bloco]
+    medidas = list(medidas or bloco['medidas'])
+    nome_nivel, membros = selecao(cubo, estado, municipio, por)
+    nivel = bloco['niveis'][nome_nivel]
+    linhas = linhas_membros(nivel, membros)
+    colunas = nivel['colunas']
+
+    with etapa(f"cubo:{nome_bloco}") as medida:
+        data = colunas['data'][linhas]
+        filtro = None
+        if periodo_datas is not None:
+            inicio = np.searchsorted(cubo['datas'], np.datetime64(periodo_datas[0], 'D'), 'left')
+            fim = np.searchsorted(cubo['datas'], np.datetime64(periodo_datas[1], 'D'), 'right')
+            filtro = (data >= inicio) & (data < fim)
+            data = data[filtro]
+        medida['linhas_entrada'] = len(data)
+
+        def coluna(nome):
+            valores = colunas[nome][linhas]
+            return valores[filtro] if filtro is not None else valores
+
+        chaves, tamanhos, rotulos = [], [], []
+        for dimensao in por:
+            if dimensao == 'estado_uf' and nome_nivel == 'uf':
+                codigo, total, rotulo = coluna('geografia'), len(cubo['ufs']), ('ufs', None)
+            elif dimensao == 'estado_uf':
+                codigo = cubo['localidades']['uf'].to_numpy()[coluna('geografia')]
+                total, rotulo = len(cubo['ufs']), ('ufs', None)
+            elif dimensao == 'localidade':
+                codigo, total, rotulo = coluna('geografia'), len(cubo['localidades']), ('localidades', None)
+            elif dimensao in (bloco['coluna_data'], 'periodo'):
+                if dimensao == 'periodo':
+                    periodos, mapa = np.unique(inicio_periodo(cubo['datas'], granularidade), return_inverse=True)
+                    codigo, total, rotulo = mapa[data], len(periodos), ('datas', periodos)
+                else:
+                    codigo, total, rotulo = data, len(cubo['datas']), ('datas', cubo['datas'])
+            else:
+                codigo, total = coluna(dimensao), len(bloco['categorias'][dimensao])
+                rotulo = ('categoria', bloco['categorias'][dimensao])
+            chaves.append(codigo)
+            tamanhos.append(max(total, 1))
+            rotulos.append((dimensao, *rotulo))
+
+        if len(data) == 0:
+            medida['linhas_saida'] = 0
+            return pd.DataFrame(columns=_colunas_saida(rotulos) + medidas)
+
+        valores = [coluna(m) for m in medidas]
+        if not chaves:
+            resultado = pd.DataFrame({m: [int(v.sum(dtype=np.int64))] for m, v in zip(medidas, valores)})
+            medida['linhas_saida'] = 1
+            return resultado
+
+        combinada = np.ravel_multi_index([np.asarray(c, dtype=np.int64) for c in chaves], tamanhos)
+        if np.prod(tamanhos, dtype=np.float64) <= LIMITE_BINCOUNT:
+            presentes = np.flatnonzero(np.bincount(combinada, minlength=int(np.prod(tamanhos))))
+            inverso = np.searchsorted(presentes, combinada)
+        else:
+            presentes, inverso = np.unique(combinada, return_inverse=True)
+        somas = {m: np.bincount(inverso, weights=v, minlength=len(presentes)).round().astype(np.int64)
+                 for m, v in zip(medidas, valores)}
+
+        resultado = {}
+        for (dimensao, tipo, valores_rotulo), codigo in zip(rotulos, np.unravel_index(presentes, tamanhos)):
+            if tipo == 'ufs':
+                resultado['estado_uf'] = cubo['ufs'][codigo]
+            elif tipo == 'localidades':
+                selecionadas = cubo['localidades'].iloc[codigo]
+                for nome in ('estado_uf', 'municipio_nome', 'codigo_ibge_municipio'):
+                    resultado[nome] = selecionadas[nome].to_numpy()
+            elif tipo == 'datas':
+                resultado[dimensao] = pd.to_datetime(valores_rotulo[codigo])
+            else:
+                resultado[dimensao] = valores_rotulo[codigo]
+        resultado.update(somas)
+        medida['linhas_saida'] = len(presentes)
+        return pd.DataFrame(resultado)
+
+def _colunas_saida(rotulos):
+    colunas = []
+    for dimensao, tipo, _ in rotulos:
+        colunas += ['estado_uf', 'municipio_nome', 'codigo_ibge_municipio'] if tipo == 'localidades' else [dimensao]
+    return colunas
+
+"""
+    Listas da sidebar: UFs, municípios (de uma UF ou de todas) e códigos IBGE
+    de um município, a partir das localidades do cubo.
+"""
+def estados(cubo):
+    return [uf for uf in cubo['ufs'] if isinstance(uf, str)]
+
+def municipios(cubo, estado):
+    localidades = cubo['localidades']
+    if estado != 'Todos':
+        localidades = localidades[localidades['estado_uf'] == estado]
+    return sorted(localidades['municipio_nome'].dropna().unique())
+
+def codigos_municipio(cubo, estado, municipio):
+    localidades = cubo['localidades']
+    selecionadas = localidades[(localidades['estado_uf'] == estado) & (localidades['municipio_nome'] == municipio)]
+    return [str(c) for c in selecionadas['codigo_ibge_municipio']]
+
+def periodo_disponivel(cubo, nome_bloco='perfil'):
+    data = cubo['blocos'][nome_bloco]['niveis']['brasil']['colunas']['data']
+    if len(data) == 0:
+        return None
+    datas = cubo['datas'][[data.min(), data.max()]]
+    return pd.Timestamp(datas[0]).date(), pd.Timestamp(datas[1]).date()
@@ -1,10 +1,16 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from datetime import datetime
-import json
-from urllib.request import urlopen
+import os
+import re
+from instrumentacao import etapa, iniciar_execucao
+from cache_consultas import geracao_carga, ler_cache, gravar_cache
+from analitico import DIRETORIO_PARQUET_PADRAO, abrir_duckdb, consultar_duckdb, geracao_exportada
+import cubo as cb
+from geometrias import MALHA_REMOTA, chave_municipio, geometria_mapa, geometria_remota_estados
+from series_temporais import GRANULARIDADES, LIMITE_PONTOS, escolher_granularidade, reduzir_serie
 
 
 st.set_page_config(layout="wide", page_title="Dashboard SRAG - Brasil", page_icon="🇧🇷")
@@ -24,92 +30,147 @@ DB_PORT = "5432"
 DB_NAME = "esus_srag_db"
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-@st.cache_data(ttl=600)
-def get_data(query):
+# Origem das consultas: 'postgres' (o banco acima) ou 'duckdb', que lê a
+# exportação em Parquet do pipeline (--exportar-parquet) sem nenhum banco.
+BACKEND = os.environ.get('ESUS_BACKEND', 'postgres')
+
+@st.cache_resource
+def get_engine():
+    return create_engine(DATABASE_URL, connect_args={'client_encoding': 'utf8'})
+
+# DuckDB da geração exportada, compartilhado pelas sessões do processo; o da
+# geração anterior é descartado quando a nova é publicada.
+@st.cache_resource(max_entries=1)
+def get_duckdb(geracao):
+    return abrir_duckdb(DIRETORIO_PARQUET_PADRAO, geracao)
+
+# Geração da carga visível no backend: o último id_carga do banco ou o da
+# exportação publicada. None se o banco não responde ou não há exportação.
+def geracao_atual():
+    if BACKEND == 'duckdb':
+        return geracao_exportada(DIRETORIO_PARQUET_PADRAO)
+    return geracao_carga(get_engine())
+
+# Uma execução por processo do Streamlit; as consultas ao banco são registradas
+# como etapas "get_data:<view>" no log e nas métricas do Prometheus.
+@st.cache_resource
+def get_instrumentacao():
+    return iniciar_execucao('dashboard')
+
+# Resultados das consultas no cache compartilhado em disco (cache_consultas),
+# por (consulta, parâmetros, geração da carga): valem até o COMMIT da próxima
+# carga e servem a todos os processos do dashboard. Os acertos são registrados
+# como etapas "cache:<view>" e as consultas que chegam ao banco como "get_data:<view>".
+def get_data(query, params=None):
+    # A última cláusula FROM é a da view (a primeira pode vir de um EXTRACT(... FROM ...)).
+    origem = re.findall(r'\bFROM\s+(\w+)', query, re.IGNORECASE)
+    view = origem[-1] if origem else 'consulta'
+    geracao = geracao_atual()
+    with etapa(f"cache:{view}") as medida:
+        df = ler_cache(query, params, geracao)
+        if df is None:
+            medida['registrar'] = False
+        else:
+            medida['linhas_saida'] = len(df)
+            return df
     try:
-        engine = create_engine(DATABASE_URL, connect_args={'client_encoding': 'utf8'})
-        df = pd.read_sql(query, engine)
-        engine.dispose()
-        return df
+        with etapa(f"get_data:{view}", consulta=query, backend=BACKEND) as medida:
+            if BACKEND == 'duckdb':
+                df = consultar_duckdb(get_duckdb(geracao), query, params)
+            else:
+                with get_engine().connect() as conn:
+                    df = pd.read_sql(text(query), conn, params=params)
+            medida['linhas_saida'] = len(df)
+            medida['bytes'] = int(df.memory_usage(deep=True).sum())
     except Exception as e:
-        st.error(f"Erro ao conectar no banco: {e}")
+        if BACKEND == 'duckdb':
+            st.error(f"Erro ao consultar a exportação em Parquet: {e}")
+        else:
+            st.error(f"Erro ao conectar no banco: {e}")
         return pd.DataFrame()
+    gravar_cache(query, params, geracao, df)
+    return df
 
-@st.cache_data
-def get_geojson_brasil():
-    url = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
-    try:
-        with urlopen(url) as r: return json.load(r)
-    except: return None
+# Cubo dos resumos (ver cubo.py), montado uma vez por geração da carga e
+# compartilhado por todas as sessões do processo; o anterior é descartado.
+# Uma leitura com erro interrompe a montagem, para não guardar um cubo incompleto.
+@st.cache_resource(max_entries=1)
+def get_cubo(geracao):
+    def ler(query):
+        df = get_data(query)
+        if df.columns.empty:
+            raise RuntimeError(f"Falha ao ler o cubo: {query}")
+        return df
 
-with st.spinner('Processando dados do Data Warehouse...'):
-    df_perfil = get_data("SELECT * FROM vw_perfil_epidemiologico")
-    df_temporal = get_data("SELECT * FROM vw_casos_por_municipio")
-    df_vacinacao = get_data("SELECT * FROM vw_vacinacao_por_resultado")
-    df_sintomas = get_data("SELECT * FROM vw_sintomas_frequentes")
-    df_laboratorio = get_data("SELECT * FROM vw_analise_laboratorial")
+    with etapa('construir_cubo') as medida:
+        cubo = cb.construir_cubo(ler)
+        medida['bytes'] = cb.tamanho_cubo(cubo)
+    return cubo
 
-    coluna_id_lab = 'source_id' # Nome da coluna que traz o ID
+# Totais do dia e das janelas móveis em indicadores_municipais. A positividade da
+# UF (ou do Brasil) é recalculada a partir da soma dos totais dos municípios.
+JANELAS_POSITIVIDADE = ['', '_7d', '_14d']
+COLUNAS_POSITIVIDADE = [f"{total}{janela}" for janela in JANELAS_POSITIVIDADE
+                        for total in ('total_testes', 'total_positivos')]
 
-    if not df_laboratorio.empty and coluna_id_lab not in df_laboratorio.columns:
-        df_laboratorio[coluna_id_lab] = 1 
+def taxa_positividade(df, janela=''):
+    testes = df[f'total_testes{janela}']
+    return 100 * df[f'total_positivos{janela}'] / testes.where(testes > 0)
 
-    mapa_labs = {
-        1: "Laboratório Central de Saúde Pública (LACEN)",
-        2: "Instituto Adolfo Lutz",
-        3: "Fiocruz",
-    }
+def consultar(bloco, por, medidas=None, **opcoes):
+    return cb.agregar(cubo, bloco, estado_sel, municipio_sel, por, medidas, **opcoes)
 
-    if not df_laboratorio.empty:
-        df_laboratorio['nome_laboratorio'] = df_laboratorio[coluna_id_lab].map(mapa_labs).fillna("Laboratório Externo/Outro")
+get_instrumentacao()
+geracao = geracao_atual()
+if geracao is None:
+    if BACKEND == 'duckdb':
+        st.error(f"Nenhuma exportação em Parquet em '{DIRETORIO_PARQUET_PADRAO}' (rode o pipeline com --exportar-parquet).")
     else:
-        df_laboratorio['nome_laboratorio'] = []
+        st.error("Erro ao conectar no banco.")
+    st.stop()
+try:
+    cubo = get_cubo(geracao)
+except RuntimeError:
+    st.stop()
 
 # --- FILTROS ---
 st.sidebar.header("Filtros")
 
-if not df_perfil.empty and 'estado_uf' in df_perfil.columns:
-    lista_estados = ['Todos'] + sorted(df_perfil['estado_uf'].dropna().unique().tolist())
-else:
-    lista_estados = ['Todos']
+lista_estados = ['Todos'] + cb.estados(cubo)
 estado_sel = st.sidebar.selectbox("Estado (UF):", lista_estados)
 
-lista_municipios = ['Todos']
-if not df_perfil.empty and 'municipio_nome' in df_perfil.columns:
-    if estado_sel != 'Todos':
-        cidades = df_perfil[df_perfil['estado_uf'] == estado_sel]['municipio_nome'].unique()
-        lista_municipios = ['Todos'] + sorted(cidades.tolist())
-    else:
-        lista_municipios = ['Todos'] + sorted(df_perfil['municipio_nome'].dropna().unique().tolist())
-
+lista_municipios = ['Todos'] + cb.municipios(cubo, estado_sel)
 municipio_sel = st.sidebar.selectbox("Município:", lista_municipios)
 
-# Função de filtro universal
-def filtrar(df, estado, municipio):
-    if df.empty: return df
-    out = df.copy()
-    if estado != 'Todos' and 'estado_uf' in out.columns:
-        out = out[out['estado_uf'] == estado]
-    if municipio != 'Todos' and 'municipio_nome' in out.columns:
-        out = out[out['municipio_nome'] == municipio]
-    return out
-
-# Aplicando filtros
-df_perfil_f = filtrar(df_perfil, estado_sel, municipio_sel)
-df_temporal_f = filtrar(df_temporal, estado_sel, municipio_sel)
-df_vacina_f = filtrar(df_vacinacao, estado_sel, municipio_sel)
-df_sintomas_f = filtrar(df_sintomas, estado_sel, municipio_sel)
-df_laboratorio_f = filtrar(df_laboratorio, estado_sel, municipio_sel)
+with st.spinner('Processando dados do Data Warehouse...'):
+    df_kpis = consultar('perfil', [], ['total_casos', 'casos_confirmados', 'obitos'])
+    df_vacina_f = consultar('vacinacao', ['status_vacinal', 'classificacao_final'], ['total_casos'])
+    df_sintomas_f = consultar('sintomas', ['nome_sintoma'], ['total_ocorrencias'])
+    df_laboratorio_f = consultar('laboratorio', ['source_id'], ['total_testes'])
+    df_positividade_f = consultar('positividade', ['data_referencia'], COLUNAS_POSITIVIDADE)
+
+    coluna_id_lab = 'source_id' # Nome da coluna que traz o ID
+
+    mapa_labs = {
+        1: "Laboratório Central de Saúde Pública (LACEN)",
+        2: "Instituto Adolfo Lutz",
+        3: "Fiocruz",
+    }
+
+    if not df_laboratorio_f.empty:
+        df_laboratorio_f['nome_laboratorio'] = df_laboratorio_f[coluna_id_lab].map(mapa_labs).fillna("Laboratório Externo/Outro")
+    else:
+        df_laboratorio_f['nome_laboratorio'] = []
 
 # --- KPIs ---
 st.title("🇧🇷 Monitoramento SRAG - Visão Nacional")
 st.markdown(f"**Atualizado em:** {datetime.now().strftime('%d/%m/%Y %H:%M')}")
 st.markdown("---")
 
-if not df_perfil_f.empty:
-    total_conf = df_perfil_f['casos_confirmados'].sum()
-    total_ob = df_perfil_f['obitos'].sum()
-    total_geral = df_perfil_f['total_casos'].sum()
+if not df_kpis.empty and df_kpis['total_casos'].notna().all():
+    total_conf = df_kpis['casos_confirmados'].sum()
+    total_ob = df_kpis['obitos'].sum()
+    total_geral = df_kpis['total_casos'].sum()
     letalidade = (total_ob / total_conf * 100) if total_conf > 0 else 0
     
     c1, c2, c3, c4 = st.columns(4)
@@ -128,41 +189,82 @@ key_suffix = f"{estado_sel}_{municipio_sel}"
 
 with tab1:
     st.subheader("Distribuição Geográfica")
-    if not df_perfil_f.empty:
-        df_mapa = df_perfil_f.groupby(['estado_uf'])['casos_confirmados'].sum().reset_index()
-        geo = get_geojson_brasil()
-        if geo:
-            fig_mapa = px.choropleth_mapbox(
-                df_mapa, geojson=geo, locations='estado_uf', featureidkey='properties.sigla',
-                color='casos_confirmados', color_continuous_scale="Reds",
-                mapbox_style="carto-positron", zoom=3, center={"lat": -14.2, "lon": -51.9},
-                opacity=0.7, hover_name='estado_uf'
-            )
-            fig_mapa.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, height=500)
-            st.plotly_chart(fig_mapa, use_container_width=True, key=f"mapa_{key_suffix}")
+    # Brasil: mapa dos estados. Com UF: todos os municípios dela, enquadrando o
+    # município selecionado. As malhas são locais (geometrias.py) e o nível de
+    # detalhe acompanha o zoom do enquadramento.
+    if estado_sel == 'Todos':
+        df_mapa = consultar('perfil', ['estado_uf'], ['casos_confirmados'])
+        local, nome, mapa = 'estado_uf', 'estado_uf', geometria_mapa('estados')
+    else:
+        df_mapa = cb.agregar(cubo, 'perfil', estado_sel, 'Todos', ['localidade'], ['casos_confirmados'])
+        foco = ([chave_municipio(c) for c in cb.codigos_municipio(cubo, estado_sel, municipio_sel)]
+                if municipio_sel != 'Todos' else None)
+        local, nome, mapa = 'codigo_ibge_municipio', 'municipio_nome', geometria_mapa('municipios', estado_sel, foco)
+        if not df_mapa.empty:
+            df_mapa[local] = df_mapa[local].map(chave_municipio)
+    if mapa is None and not MALHA_REMOTA:
+        st.warning("Malhas do mapa não encontradas em malhas/. Gere as malhas uma vez, numa máquina com acesso "
+                   "à rede, com `python geometrias.py ibge`, ou rode com ESUS_MALHA_REMOTA=1 para usar a malha "
+                   "remota dos estados.")
+    elif mapa is None:
+        # Sem as malhas locais e com ESUS_MALHA_REMOTA=1, o mapa volta à malha remota, só com os estados.
+        st.warning("Malhas do mapa não encontradas em malhas/: usando a malha remota dos estados, "
+                   "sem o detalhe por município. Para o mapa local, gere as malhas com `python geometrias.py ibge`.")
+        df_mapa = consultar('perfil', ['estado_uf'], ['casos_confirmados'])
+        local, nome, mapa = 'estado_uf', 'estado_uf', geometria_remota_estados()
+        if mapa is None:
+            st.error("Não foi possível baixar a malha remota dos estados.")
+    if mapa is not None and not df_mapa.empty:
+        geo, centro, zoom, _ = mapa
+        fig_mapa = px.choropleth_map(
+            df_mapa, geojson=geo, locations=local, featureidkey='id',
+            color='casos_confirmados', color_continuous_scale="Reds",
+            map_style="carto-positron", zoom=zoom, center=centro,
+            opacity=0.7, hover_name=nome
+        )
+        fig_mapa.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, height=500)
+        st.plotly_chart(fig_mapa, use_container_width=True, key=f"mapa_{key_suffix}")
 
 with tab2:
     st.subheader("Curva Epidêmica")
-    if not df_temporal_f.empty:
-        df_temporal_f['data_notificacao'] = pd.to_datetime(df_temporal_f['data_notificacao'])
-        df_line = df_temporal_f.groupby('data_notificacao')[['casos_confirmados', 'obitos']].sum().reset_index()
-        
+    limites = cb.periodo_disponivel(cubo)
+    df_line = pd.DataFrame()
+    if limites is not None:
+        c1, c2 = st.columns([2, 1])
+        periodo = c1.date_input("Período:", value=limites, min_value=limites[0], max_value=limites[1],
+                                format="DD/MM/YYYY", key="periodo_curva")
+        opcoes_grao = ['automatica', *GRANULARIDADES]
+        grao_sel = c2.selectbox("Agregação:", opcoes_grao, key="grao_curva",
+                                format_func=lambda g: "Automática" if g == 'automatica' else GRANULARIDADES[g][0])
+        # Enquanto o intervalo é escolhido, o seletor devolve só a data inicial.
+        inicio, fim = (periodo[0], periodo[-1]) if isinstance(periodo, (tuple, list)) and periodo else limites
+        granularidade = escolher_granularidade(inicio, fim) if grao_sel == 'automatica' else grao_sel
+        df_line = consultar('perfil', ['periodo'], ['casos_confirmados', 'obitos'],
+                            periodo_datas=(inicio, fim), granularidade=granularidade)
+        if not df_line.empty:
+            reducao = f"; reduzida a {LIMITE_PONTOS} pontos (LTTB)" if len(df_line) > LIMITE_PONTOS else ""
+            periodos = f"{len(df_line)} período" + ("s" if len(df_line) != 1 else "")
+            st.caption(f"{periodos} por {GRANULARIDADES[granularidade][0].lower()}{reducao}.")
+
+    if not df_line.empty:
         c1, c2 = st.columns(2)
         with c1:
             st.markdown("### 🦠 Casos Confirmados")
-            if len(df_line) <= 1 or df_line['casos_confirmados'].sum() == 0:
-                 fig_c = px.bar(df_line, x='data_notificacao', y='casos_confirmados')
+            df_casos = reduzir_serie(df_line, 'periodo', 'casos_confirmados')
+            if len(df_casos) <= 1 or df_casos['casos_confirmados'].sum() == 0:
+                 fig_c = px.bar(df_casos, x='periodo', y='casos_confirmados')
             else:
-                 fig_c = px.area(df_line, x='data_notificacao', y='casos_confirmados', color_discrete_sequence=['#3366CC'])
+                 fig_c = px.area(df_casos, x='periodo', y='casos_confirmados', color_discrete_sequence=['#3366CC'])
             fig_c.update_layout(height=400)
             st.plotly_chart(fig_c, use_container_width=True, key=f"chart_casos_{key_suffix}")
 
         with c2:
             st.markdown("### 💀 Óbitos")
-            if len(df_line) <= 1 or df_line['obitos'].sum() == 0:
-                fig_d = px.bar(df_line, x='data_notificacao', y='obitos', color_discrete_sequence=['#DC3912'])
+            df_obitos = reduzir_serie(df_line, 'periodo', 'obitos')
+            if len(df_obitos) <= 1 or df_obitos['obitos'].sum() == 0:
+                fig_d = px.bar(df_obitos, x='periodo', y='obitos', color_discrete_sequence=['#DC3912'])
             else:
-                fig_d = px.area(df_line, x='data_notificacao', y='obitos', color_discrete_sequence=['#DC3912'])
+                fig_d = px.area(df_obitos, x='periodo', y='obitos', color_discrete_sequence=['#DC3912'])
             fig_d.update_layout(height=400)
             st.plotly_chart(fig_d, use_container_width=True, key=f"chart_obitos_{key_suffix}")
 
@@ -170,16 +272,17 @@ with tab3:
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Sexo")
-        if 'sexo' in df_perfil_f.columns and not df_perfil_f.empty:
-            df_sexo = df_perfil_f.groupby('sexo')['total_casos'].sum().reset_index()
+        df_sexo = consultar('perfil', ['sexo'], ['total_casos'])
+        if not df_sexo.empty:
             fig_sexo = px.pie(df_sexo, values='total_casos', names='sexo', hole=0.5)
             fig_sexo.update_layout(height=400)
             st.plotly_chart(fig_sexo, use_container_width=True, key=f"chart_sexo_{key_suffix}")
             
     with c2:
         st.subheader("Faixa Etária (Confirmados)")
-        if 'faixa_etaria' in df_perfil_f.columns and not df_perfil_f.empty:
-            df_idade = df_perfil_f.groupby('faixa_etaria')['casos_confirmados'].sum().reset_index()
+        df_idade = consultar('perfil', ['faixa_etaria'], ['casos_confirmados'])
+        if not df_idade.empty:
+            df_idade = df_idade.sort_values('faixa_etaria')
             fig_idade = px.bar(df_idade, x='faixa_etaria', y='casos_confirmados', color_discrete_sequence=['#FF4B4B'])
             fig_idade.update_layout(height=400)
             st.plotly_chart(fig_idade, use_container_width=True, key=f"chart_idade_{key_suffix}")
@@ -192,7 +295,7 @@ with tab4:
          
             cols_group = [c for c in ['status_vacinal', 'classificacao_final'] if c in df_vacina_f.columns]
             if len(cols_group) == 2:
-                df_v_agrupado = df_vacina_f.groupby(cols_group)['total_casos'].sum().reset_index()
+                df_v_agrupado = df_vacina_f
                 fig_vac = px.bar(
                     df_v_agrupado, x='status_vacinal', y='total_casos', 
                     color='classificacao_final', barmode='group',
@@ -206,15 +309,41 @@ with tab4:
     with c2:
         st.subheader("Top Sintomas")
         if not df_sintomas_f.empty:
-            df_s_agrupado = df_sintomas_f.groupby('nome_sintoma')['total_ocorrencias'].sum().reset_index()
-            df_top = df_s_agrupado.sort_values('total_ocorrencias').tail(10)
+            df_top = df_sintomas_f.sort_values('total_ocorrencias').tail(10)
             fig_sint = px.bar(df_top, x='total_ocorrencias', y='nome_sintoma', orientation='h')
             fig_sint.update_layout(height=400)
             st.plotly_chart(fig_sint, use_container_width=True, key=f"chart_sintomas_{key_suffix}")
 
 with tab5:
     st.subheader("Análise Laboratorial")
-    
+
+    if not df_positividade_f.empty:
+        df_pos = df_positividade_f.assign(data_referencia=pd.to_datetime(df_positividade_f['data_referencia']))
+        df_pos = df_pos.sort_values('data_referencia')
+        for janela in JANELAS_POSITIVIDADE:
+            df_pos[f'taxa_positividade{janela}'] = taxa_positividade(df_pos, janela)
+
+        total_testes = df_pos['total_testes'].sum()
+        positividade_total = 100 * df_pos['total_positivos'].sum() / total_testes if total_testes > 0 else 0
+        ultima = df_pos.iloc[-1]
+
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Positividade no Período", f"{positividade_total:.2f}%",
+                  delta=f"{total_testes:,.0f} testes com resultado".replace(",", "."), delta_color="off")
+        c2.metric(f"Positividade 7 dias ({ultima['data_referencia']:%d/%m/%Y})",
+                  f"{ultima['taxa_positividade_7d']:.2f}%" if pd.notna(ultima['taxa_positividade_7d']) else "-")
+        c3.metric(f"Positividade 14 dias ({ultima['data_referencia']:%d/%m/%Y})",
+                  f"{ultima['taxa_positividade_14d']:.2f}%" if pd.notna(ultima['taxa_positividade_14d']) else "-")
+
+        st.markdown("#### 📉 Taxa de Positividade (média móvel)")
+        fig_pos = px.line(
+            df_pos, x='data_referencia', y=['taxa_positividade_7d', 'taxa_positividade_14d'],
+            color_discrete_sequence=['#0083B8', '#FF9900']
+        )
+        fig_pos.update_layout(height=400, xaxis_title=None, yaxis_title="Positividade (%)", legend_title=None)
+        st.plotly_chart(fig_pos, use_container_width=True, key=f"chart_positividade_{key_suffix}")
+        st.markdown("---")
+
     if not df_laboratorio_f.empty:
         # Identifica o Laboratório Principal
         top_lab = df_laboratorio_f.groupby('nome_laboratorio')['total_testes'].sum().reset_index().sort_values('total_testes', ascending=False)
@@ -234,15 +363,17 @@ with tab5:
         # GRÁFICO 1: Top Municípios Solicitantes
         with c1:
             st.markdown("#### 📍 Top Municípios Solicitantes")
-            df_city = df_laboratorio_f.groupby('municipio_nome')['total_testes'].sum().reset_index()
-            df_city_top = df_city.sort_values('total_testes', ascending=True).tail(10)
-            
+            df_city = consultar('positividade', ['localidade'], ['total_testes', 'total_positivos'])
+            df_city_top = df_city.sort_values('total_testes', ascending=True).tail(10) if not df_city.empty else df_city
+
             if not df_city_top.empty:
+                df_city_top = df_city_top.assign(taxa_positividade=taxa_positividade(df_city_top))
                 fig_city = px.bar(
                     df_city_top, x='total_testes', y='municipio_nome', orientation='h', text_auto='.2s',
-                    color_discrete_sequence=['#0083B8']
+                    color='taxa_positividade', color_continuous_scale='Blues'
                 )
-                fig_city.update_layout(height=500, xaxis_title="Volume de Exames", yaxis_title=None)
+                fig_city.update_layout(height=500, xaxis_title="Exames com Resultado", yaxis_title=None,
+                                       coloraxis_colorbar_title="Positividade (%)")
                 st.plotly_chart(fig_city, use_container_width=True, key=f"chart_muni_{key_suffix}")
             else:
                 st.info("Dados de município não disponíveis.")
@@ -0,0 +1,456 @@
+import os
+import math
+import gzip
+import json
+import shutil
+import argparse
+import tempfile
+from functools import lru_cache
+from urllib.request import urlopen
+
+import numpy as np
+
+"""
+    MALHAS GEOGRÁFICAS DO MAPA (sem rede)
+    Estados e municípios ficam em arquivos TopoJSON quantizados e compactados
+    em malhas/, um por camada e nível de detalhe (municípios, um por UF):
+        malhas/estados-<nivel>.topojson.gz
+        malhas/municipios-<UF>-<nivel>.topojson.gz
+    As fronteiras compartilhadas viram um único arco, simplificado uma vez só,
+    então os níveis mais leves não abrem frestas entre vizinhos. O dashboard
+    carrega cada arquivo só quando precisa e guarda o GeoJSON decodificado por
+    nível (carregar_camada). O nível é escolhido pelo zoom do enquadramento.
+
+    Os arquivos são gerados uma vez, numa máquina com acesso à rede, e
+    distribuídos junto com o projeto. O passo único baixa as malhas da API do
+    IBGE e grava as duas camadas; a partir de GeoJSONs já baixados, uma
+    camada de cada vez:
+        python geometrias.py ibge
+        python geometrias.py estados BR_UF.geojson --campo-id codarea --campo-nome nome
+        python geometrias.py municipios BR_Municipios.geojson --campo-id codarea --campo-nome nome
+
+    Sem os arquivos, o dashboard não desenha o mapa. Só com ESUS_MALHA_REMOTA=1
+    ele volta à malha remota dos estados (geometria_remota_estados), baixada a
+    cada processo, sem municípios.
+"""
+
+DIRETORIO_MALHAS = os.environ.get('ESUS_MALHAS_DIR',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'malhas'))
+
+# Nível de detalhe -> tolerância da simplificação (Douglas-Peucker), em graus.
+# Cerca de meio pixel no zoom em que cada nível é usado.
+NIVEIS_DETALHE = {'baixo': 0.05, 'medio': 0.01, 'alto': 0.002}
+
+# Zoom do mapa (MapLibre) a partir do qual cada nível passa a valer.
+ZOOM_NIVEIS = [(0, 'baixo'), (5, 'medio'), (7, 'alto')]
+
+# Passos da grade de quantização em cada eixo (delta-codificados nos arcos).
+QUANTIZACAO = 100_000
+
+# Área útil do mapa no dashboard, em pixels, usada para calcular o zoom.
+LARGURA_MAPA_PX = 1000
+ALTURA_MAPA_PX = 500
+
+# Malha de estados usada quando malhas/ não existe (propriedade 'sigla'), só
+# com ESUS_MALHA_REMOTA=1: por padrão o mapa não depende da rede.
+MALHA_REMOTA = os.environ.get('ESUS_MALHA_REMOTA') == '1'
+URL_ESTADOS_REMOTA = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
+TIMEOUT_REMOTO = 10
+
+# API de malhas do IBGE (propriedade codarea), usada por `geometrias.py ibge`.
+URL_MALHAS_IBGE = ("https://servicodados.ibge.gov.br/api/v3/malhas/paises/BR"
+                   "?formato=application/vnd.geo%2Bjson&qualidade=intermediaria&intrarregiao={intrarregiao}")
+INTRARREGIAO_IBGE = {'estados': 'UF', 'municipios': 'municipio'}
+TIMEOUT_IBGE = 300
+
+# Enquadramento fixo do Brasil para a malha remota, que não traz as caixas.
+CENTRO_BRASIL = {'lat': -14.2, 'lon': -51.9}
+ZOOM_BRASIL = 3
+
+# Código IBGE da UF -> sigla (ids da camada de estados).
+UF_POR_CODIGO = {
+    11: 'RO', 12: 'AC', 13: 'AM', 14: 'RR', 15: 'PA', 16: 'AP', 17: 'TO',
+    21: 'MA', 22: 'PI', 23: 'CE', 24: 'RN', 25: 'PB', 26: 'PE', 27: 'AL', 28: 'SE', 29: 'BA',
+    31: 'MG', 32: 'ES', 33: 'RJ', 35: 'SP',
+    41: 'PR', 42: 'SC', 43: 'RS',
+    50: 'MS', 51: 'MT', 52: 'GO', 53: 'DF',
+}
+
+"""
+    Id das feições de municípios e chave do mapa no dashboard, aplicada aos dois
+    lados: os 6 primeiros dígitos do código IBGE, como texto. O codarea do IBGE
+    tem 7 dígitos (o último é verificador), e o codigo_ibge_municipio do e-SUS
+    vem com 7 ou com 6, conforme a extração. Aceita número ou texto (3550308,
+    3550308.0, '355030'); outro tamanho é recusado.
+"""
+def chave_municipio(codigo):
+    chave = str(int(float(codigo)))
+    if len(chave) not in (6, 7):
+        raise ValueError(f"Código IBGE de município deve ter 6 ou 7 dígitos: {codigo!r}")
+    return chave[:6]
+
+def caminho_camada(camada, nivel, uf=None):
+    nome = f"{camada}-{uf}-{nivel}" if uf else f"{camada}-{nivel}"
+    return os.path.join(DIRETORIO_MALHAS, f"{nome}.topojson.gz")
+
+"""
+    GeoJSON (FeatureCollection) de uma camada num nível de detalhe, ou None se
+    o arquivo não existir. Decodificado uma vez por processo e reaproveitado:
+    quem recebe não deve alterar o dicionário.
+"""
+@lru_cache(maxsize=None)
+def carregar_camada(camada, nivel, uf=None):
+    caminho = caminho_camada(camada, nivel, uf)
+    if not os.path.exists(caminho):
+        return None
+    with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+        topologia = json.load(f)
+    return topojson_para_geojson(topologia, camada)
+
+"""
+    Decodifica um objeto de uma topologia quantizada: os arcos são acumulados
+    (delta), levados de volta a graus e arredondados à precisão da grade, e
+    cada anel é a concatenação dos seus arcos (índice negativo ~i = arco i invertido).
+"""
+def topojson_para_geojson(topologia, objeto):
+    escala = np.array(topologia['transform']['scale'])
+    translacao = np.array(topologia['transform']['translate'])
+    casas = max(int(math.ceil(-math.log10(escala.min()))), 0)
+    arcos = [
+        np.round(np.cumsum(np.array(arco, dtype=np.int64), axis=0) * escala + translacao, casas).tolist()
+        for arco in topologia['arcs']
+    ]
+
+    def anel(indices):
+        coordenadas = []
+        for indice in indices:
+            pontos = arcos[indice] if indice >= 0 else arcos[~indice][::-1]
+            coordenadas.extend(pontos[1:] if coordenadas else pontos)
+        return coordenadas
+
+    features = []
+    for geometria in topologia['objects'][objeto]['geometries']:
+        if geometria['type'] == 'Polygon':
+            coordenadas = [anel(r) for r in geometria['arcs']]
+        else:
+            coordenadas = [[anel(r) for r in poligono] for poligono in geometria['arcs']]
+        features.append({
+            'type': 'Feature',
+            'id': geometria['id'],
+            'bbox': geometria['bbox'],
+            'properties': geometria.get('properties', {}),
+            'geometry': {'type': geometria['type'], 'coordinates': coordenadas},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+"""
+    Centro e zoom (MapLibre) que enquadram as caixas [oeste, sul, leste, norte]
+    na área do mapa. No zoom 0 o mundo inteiro (Mercator) ocupa 512 x 512 px.
+"""
+def enquadramento(caixas, largura_px=LARGURA_MAPA_PX, altura_px=ALTURA_MAPA_PX):
+    oeste = min(c[0] for c in caixas)
+    sul = min(c[1] for c in caixas)
+    leste = max(c[2] for c in caixas)
+    norte = max(c[3] for c in caixas)
+    mercator = lambda lat: math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+    fracao_x = max(leste - oeste, 1e-3) / 360
+    fracao_y = max(mercator(norte) - mercator(sul), 1e-5) / (2 * math.pi)
+    zoom = min(math.log2(largura_px / (512 * fracao_x)), math.log2(altura_px / (512 * fracao_y)))
+    centro_lat = math.degrees(2 * math.atan(math.exp((mercator(norte) + mercator(sul)) / 2)) - math.pi / 2)
+    return {'lon': (oeste + leste) / 2, 'lat': round(centro_lat, 6)}, round(min(zoom, 12), 2)
+
+def nivel_por_zoom(zoom):
+    nivel = ZOOM_NIVEIS[0][1]
+    for zoom_minimo, candidato in ZOOM_NIVEIS:
+        if zoom >= zoom_minimo:
+            nivel = candidato
+    return nivel
+
+"""
+    Geometria e enquadramento do mapa para a seleção: a camada inteira (Brasil
+    ou uma UF) ou, com foco, só as feições com aqueles ids. O enquadramento vem
+    das caixas guardadas no nível mais leve, e o nível carregado é o do zoom
+    resultante (ou o mais próximo disponível).
+    Retorna (geojson, centro, zoom, nivel), ou None se a camada não existir.
+"""
+def geometria_mapa(camada, uf=None, foco=None):
+    niveis = list(NIVEIS_DETALHE)
+    referencia = next((g for g in (carregar_camada(camada, n, uf) for n in niveis) if g is not None), None)
+    if referencia is None:
+        return None
+    caixas = [f['bbox'] for f in referencia['features'] if foco is None or f['id'] in foco]
+    centro, zoom = enquadramento(caixas or [f['bbox'] for f in referencia['features']])
+
+    nivel = nivel_por_zoom(zoom)
+    posicao = niveis.index(nivel)
+    for candidato in sorted(niveis, key=lambda n: abs(niveis.index(n) - posicao)):
+        geojson = carregar_camada(camada, candidato, uf)
+        if geojson is not None:
+            return geojson, centro, zoom, candidato
+
+
+@lru_cache(maxsize=1)
+def baixar_estados_remota():
+    with urlopen(URL_ESTADOS_REMOTA, timeout=TIMEOUT_REMOTO) as r:
+        origem = json.load(r)
+    features = [
+        {**feature, 'id': feature['properties']['sigla']}
+        for feature in origem['features']
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+"""
+    Malha dos estados baixada de URL_ESTADOS_REMOTA (a fonte do mapa antes
+    das malhas locais), no mesmo formato de geometria_mapa, com o Brasil
+    enquadrado. Retorna None se o download falhar; só o sucesso fica em cache.
+"""
+def geometria_remota_estados():
+    try:
+        geojson = baixar_estados_remota()
+    except (OSError, ValueError, KeyError):
+        return None
+    return geojson, CENTRO_BRASIL, ZOOM_BRASIL, 'remoto'
+
+
+"""
+    CONSTRUÇÃO DAS MALHAS
+    Entrada: GeoJSON com Polygon/MultiPolygon (ex.: malhas do IBGE). As
+    coordenadas são quantizadas numa grade, os anéis são cortados nas junções
+    (pontos em que muda o vizinho de fronteira) e os trechos repetidos entre
+    polígonos vizinhos viram um mesmo arco. Cada nível simplifica os arcos com
+    a sua tolerância, preservando as pontas, e descarta ilhas menores que ela.
+"""
+def ler_poligonos(geometria):
+    if geometria['type'] == 'Polygon':
+        return [geometria['coordinates']]
+    if geometria['type'] == 'MultiPolygon':
+        return geometria['coordinates']
+    return []
+
+def quantizar_anel(anel, translacao, escala):
+    pontos = np.round((np.asarray(anel, dtype=np.float64)[:, :2] - translacao) / escala).astype(np.int64)
+    manter = np.ones(len(pontos), dtype=bool)
+    manter[1:] = np.any(pontos[1:] != pontos[:-1], axis=1)
+    pontos = pontos[manter]
+    if len(pontos) and tuple(pontos[0]) != tuple(pontos[-1]):
+        pontos = np.vstack([pontos, pontos[:1]])
+    return [tuple(p) for p in pontos.tolist()]
+
+"""
+    Pontos de junção: um ponto é junção quando aparece com mais de um par de
+    vizinhos (sem ordem) entre todos os anéis.
+"""
+def encontrar_juncoes(aneis):
+    vizinhos = {}
+    for anel in aneis:
+        pontos = anel[:-1]
+        for i, ponto in enumerate(pontos):
+            par = frozenset((pontos[i - 1], pontos[(i + 1) % len(pontos)]))
+            vizinhos.setdefault(ponto, set()).add(par)
+    return {ponto for ponto, pares in vizinhos.items() if len(pares) > 1}
+
+def cortar_anel(anel, juncoes):
+    pontos = anel[:-1]
+    cortes = [i for i, ponto in enumerate(pontos) if ponto in juncoes]
+    if not cortes:
+        # Anel sem junção (ilha ou enclave inteiro): um arco fechado, a partir
+        # do menor ponto para que o mesmo anel de outro polígono coincida.
+        inicio = min(range(len(pontos)), key=pontos.__getitem__)
+        girado = pontos[inicio:] + pontos[:inicio]
+        return [girado + girado[:1]]
+    girado = pontos[cortes[0]:] + pontos[:cortes[0]]
+    posicoes = [i - cortes[0] for i in cortes] + [len(pontos)]
+    girado = girado + girado[:1]
+    return [girado[a:b + 1] for a, b in zip(posicoes[:-1], posicoes[1:])]
+
+"""
+    Douglas-Peucker iterativo sobre um arco (array N x 2), mantendo as pontas.
+    Arcos fechados são divididos no ponto mais distante do início.
+"""
+def simplificar_arco(pontos, tolerancia):
+    if len(pontos) <= 2 or tolerancia <= 0:
+        return pontos
+    if np.array_equal(pontos[0], pontos[-1]):
+        distancias = np.hypot(*(pontos - pontos[0]).T)
+        meio = int(distancias.argmax())
+        if meio == 0:
+            return pontos[:1]
+        primeira = simplificar_arco(pontos[:meio + 1], tolerancia)
+        segunda = simplificar_arco(pontos[meio:], tolerancia)
+        return np.vstack([primeira, segunda[1:]])
+
+    manter = np.zeros(len(pontos), dtype=bool)
+    manter[[0, -1]] = True
+    pilha = [(0, len(pontos) - 1)]
+    while pilha:
+        a, b = pilha.pop()
+        if b - a < 2:
+            continue
+        trecho = pontos[a + 1:b].astype(np.float64)
+        inicio, fim = pontos[a].astype(np.float64), pontos[b].astype(np.float64)
+        direcao = fim - inicio
+        comprimento = np.hypot(*direcao)
+        if comprimento == 0:
+            distancias = np.hypot(*(trecho - inicio).T)
+        else:
+            distancias = np.abs(direcao[0] * (trecho[:, 1] - inicio[1]) - direcao[1] * (trecho[:, 0] - inicio[0])) / comprimento
+        indice = int(distancias.argmax())
+        if distancias[indice] > tolerancia:
+            meio = a + 1 + indice
+            manter[meio] = True
+            pilha += [(a, meio), (meio, b)]
+    return pontos[manter]
+
+"""
+    Monta as topologias de uma camada, uma por nível de detalhe.
+    features: lista de (id, propriedades, polígonos em lon/lat).
+"""
+def construir_topologias(features, objeto, niveis=NIVEIS_DETALHE, quantizacao=QUANTIZACAO):
+    todas = np.vstack([np.asarray(anel, dtype=np.float64)[:, :2]
+                       for _, _, poligonos in features for poligono in poligonos for anel in poligono])
+    translacao = todas.min(axis=0)
+    escala = np.maximum((todas.max(axis=0) - translacao) / (quantizacao - 1), 1e-12)
+
+    geometrias = []
+    aneis = []
+    for id_, propriedades, poligonos in features:
+        quantizados = [[quantizar_anel(anel, translacao, escala) for anel in poligono] for poligono in poligonos]
+        quantizados = [[anel for anel in poligono if len(anel) >= 4] for poligono in quantizados]
+        quantizados = [poligono for poligono in quantizados if poligono]
+        geometrias.append((id_, propriedades, quantizados))
+        aneis += [anel for poligono in quantizados for anel in poligono]
+    juncoes = encontrar_juncoes(aneis)
+
+    # Arcos únicos; um trecho percorrido ao contrário por outro polígono é o mesmo arco (~i).
+    arcos, indice_arco = [], {}
+    def registrar(arco):
+        chave = tuple(arco)
+        if chave in indice_arco:
+            return indice_arco[chave]
+        inverso = tuple(reversed(arco))
+        if inverso in indice_arco:
+            return ~indice_arco[inverso]
+        indice_arco[chave] = len(arcos)
+        arcos.append(np.array(arco, dtype=np.int64))
+        return indice_arco[chave]
+
+    geometrias = [
+        (id_, propriedades, [[[registrar(arco) for arco in cortar_anel(anel, juncoes)] for anel in poligono]
+                             for poligono in poligonos])
+        for id_, propriedades, poligonos in geometrias
+    ]
+
+    caixas = {}
+    for id_, _, poligonos in geometrias:
+        pontos = np.vstack([arcos[i if i >= 0 else ~i] for poligono in poligonos for anel in poligono for i in anel])
+        minimo, maximo = pontos.min(axis=0) * escala + translacao, pontos.max(axis=0) * escala + translacao
+        caixas[id_] = [round(float(v), 6) for v in (*minimo, *maximo)]
+
+    topologias = {}
+    for nivel, tolerancia_graus in niveis.items():
+        tolerancia = tolerancia_graus / escala.max()
+        simplificados = [simplificar_arco(arco, tolerancia) for arco in arcos]
+        usados, saida = {}, []
+        geometrias_nivel = []
+        for id_, propriedades, poligonos in geometrias:
+            # Ilhas menores que a tolerância somem, menos o maior polígono da feição.
+            extensoes = [np.ptp(np.vstack([arcos[i if i >= 0 else ~i] for i in poligono[0]]), axis=0).max()
+                         for poligono in poligonos]
+            maior = int(np.argmax(extensoes))
+            poligonos = [p for k, p in enumerate(poligonos) if k == maior or extensoes[k] >= tolerancia]
+
+            def reindexar(i):
+                original = i if i >= 0 else ~i
+                if original not in usados:
+                    usados[original] = len(saida)
+                    saida.append(simplificados[original])
+                return usados[original] if i >= 0 else ~usados[original]
+
+            arcos_geometria = [[[reindexar(i) for i in anel] for anel in poligono] for poligono in poligonos]
+            geometria = {'id': id_, 'bbox': caixas[id_], 'properties': propriedades}
+            if len(arcos_geometria) == 1:
+                geometria.update(type='Polygon', arcs=arcos_geometria[0])
+            else:
+                geometria.update(type='MultiPolygon', arcs=arcos_geometria)
+            geometrias_nivel.append(geometria)
+
+        topologias[nivel] = {
+            'type': 'Topology',
+            'transform': {'scale': escala.tolist(), 'translate': translacao.tolist()},
+            'objects': {objeto: {'type': 'GeometryCollection', 'geometries': geometrias_nivel}},
+            'arcs': [np.vstack([arco[:1], np.diff(arco, axis=0)]).tolist() for arco in saida],
+        }
+    return topologias
+
+def gravar_topologia(topologia, caminho):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = caminho + '.tmp'
+    with gzip.open(temporario, 'wt', encoding='utf-8') as f:
+        json.dump(topologia, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporario, caminho)
+    return os.path.getsize(caminho)
+
+"""
+    Lê o GeoJSON de origem e grava as malhas da camada. Estados usam a sigla
+    como id (o código IBGE de 2 dígitos é convertido); municípios usam a chave do
+    código IBGE (chave_municipio), a mesma dos dados no dashboard, e são
+    separados por UF.
+"""
+def construir_camada(camada, arquivo, campo_id, campo_nome=None):
+    with open(arquivo, encoding='utf-8') as f:
+        origem = json.load(f)
+
+    features = []
+    for feature in origem['features']:
+        propriedades = feature.get('properties') or {}
+        valor = str(propriedades.get(campo_id, feature.get('id')))
+        if camada == 'estados':
+            id_ = UF_POR_CODIGO[int(valor)] if valor.isdigit() else valor.upper()
+        else:
+            id_ = chave_municipio(valor)
+        nome = {'nome': propriedades[campo_nome]} if campo_nome and campo_nome in propriedades else {}
+        features.append((id_, nome, ler_poligonos(feature['geometry'])))
+
+    if camada == 'estados':
+        grupos = {None: features}
+    else:
+        grupos = {}
+        for feature in features:
+            grupos.setdefault(UF_POR_CODIGO[int(feature[0][:2])], []).append(feature)
+
+    for uf, features_grupo in sorted(grupos.items(), key=lambda item: item[0] or ''):
+        for nivel, topologia in construir_topologias(features_grupo, camada).items():
+            caminho = caminho_camada(camada, nivel, uf)
+            tamanho = gravar_topologia(topologia, caminho)
+            print(f"{caminho}: {len(features_grupo)} feições, {len(topologia['arcs'])} arcos, {tamanho / 1024:.0f} KB")
+
+"""
+    Passo único de preparação: baixa as malhas de estados e municípios da API
+    do IBGE e grava as duas camadas em DIRETORIO_MALHAS.
+"""
+def construir_malhas_ibge():
+    with tempfile.TemporaryDirectory() as pasta:
+        for camada, intrarregiao in INTRARREGIAO_IBGE.items():
+            arquivo = os.path.join(pasta, f"{camada}.geojson")
+            print(f"Baixando a malha de {camada} do IBGE...")
+            with urlopen(URL_MALHAS_IBGE.format(intrarregiao=intrarregiao), timeout=TIMEOUT_IBGE) as r, \
+                    open(arquivo, 'wb') as f:
+                shutil.copyfileobj(r, f)
+            construir_camada(camada, arquivo, 'codarea')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera as malhas simplificadas do mapa do dashboard")
+    parser.add_argument("camada", choices=['estados', 'municipios', 'ibge'],
+                        help="Camada a gerar a partir do arquivo, ou 'ibge' para baixar e gerar as duas")
+    parser.add_argument("arquivo", nargs="?", help="GeoJSON de origem (ex.: malha do IBGE)")
+    parser.add_argument("--campo-id", default="codarea",
+                        help="Propriedade com o código IBGE ou a sigla (padrão: codarea)")
+    parser.add_argument("--campo-nome", default=None, help="Propriedade com o nome, guardada nas feições")
+    args = parser.parse_args()
+    if args.camada == 'ibge':
+        construir_malhas_ibge()
+    elif not args.arquivo:
+        parser.error("informe o GeoJSON de origem da camada")
+    else:
+        construir_camada(args.camada, args.arquivo, args.campo_id, args.campo_nome)
@@ -0,0 +1,234 @@
+import os
+import re
+import sys
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+"""
+    INSTRUMENTAÇÃO DO PIPELINE E DO DASHBOARD
+    Cada estágio roda dentro de `with etapa(nome) as medida:` e gera um registro
+    com tempo de parede, tempo de CPU, variação de RSS, linhas de entrada/saída
+    e bytes movimentados. Os registros vão para um log JSON-lines e os totais por
+    estágio para um arquivo textfile do Prometheus (lido pelo node_exporter).
+    Sem iniciar_execucao as etapas rodam sem nenhuma medição. Processos filhos
+    (workers da carga multiarquivo) herdam a execução e gravam suas etapas no
+    log, com o próprio pid; métricas e perfis ficam com o processo principal.
+"""
+
+# Diretório do log JSON-lines, dos arquivos .prom e dos perfis de CPU.
+LOG_DIR_PADRAO = os.environ.get('ESUS_LOG_DIR', 'logs')
+
+# Estágios mais lentos que este limite (segundos) têm o perfil de CPU gravado em
+# <log_dir>/perfis. None desativa; ligar o perfil deixa os estágios um pouco mais lentos.
+LIMITE_PERFIL_PADRAO = float(os.environ['ESUS_PERFIL_ACIMA']) if os.environ.get('ESUS_PERFIL_ACIMA') else None
+
+PREFIXO_METRICAS = 'esus'
+
+_execucao = None
+_trava = threading.Lock()
+# Profundidade de etapas aninhadas por thread (o Streamlit atende cada sessão numa thread).
+_local = threading.local()
+
+def rss_atual():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def rss_pico():
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS.
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+"""
+    Abre a execução do processo (uma carga do pipeline ou o servidor do
+    dashboard). Chamadas repetidas para o mesmo processo reaproveitam a
+    execução aberta. Os atributos extras vão para o registro final.
+"""
+def iniciar_execucao(processo, log_dir=LOG_DIR_PADRAO, limite_perfil=LIMITE_PERFIL_PADRAO, **atributos):
+    global _execucao
+    with _trava:
+        if _execucao is not None and _execucao['processo'] == processo:
+            return _execucao
+        os.makedirs(log_dir, exist_ok=True)
+        inicio = datetime.now()
+        _execucao = {
+            'id': f"{processo}-{inicio:%Y%m%d-%H%M%S}-{os.getpid()}",
+            'processo': processo,
+            'inicio': inicio,
+            'pid': os.getpid(),
+            'relogio': time.perf_counter(),
+            'cpu': time.process_time(),
+            'log': os.path.join(log_dir, 'execucoes.jsonl'),
+            'prometheus': os.path.join(log_dir, f"{PREFIXO_METRICAS}_{processo}.prom"),
+            'perfis': os.path.join(log_dir, 'perfis'),
+            'limite_perfil': limite_perfil,
+            'atributos': atributos,
+            'totais': {},
+            'erros': 0,
+        }
+        return _execucao
+
+"""
+    Fecha a execução: grava o registro-resumo no log e o status final no
+    arquivo do Prometheus. O status é 'erro' se alguma etapa falhou.
+"""
+def finalizar_execucao():
+    global _execucao
+    if _execucao is None:
+        return
+    with _trava:
+        execucao, _execucao = _execucao, None
+        status = 'erro' if execucao['erros'] else 'ok'
+        registro = {
+            'tipo': 'execucao',
+            'execucao': execucao['id'],
+            'processo': execucao['processo'],
+            'inicio': execucao['inicio'].isoformat(timespec='seconds'),
+            'segundos': round(time.perf_counter() - execucao['relogio'], 4),
+            'cpu_segundos': round(time.process_time() - execucao['cpu'], 4),
+            'rss_pico_mb': _mb(rss_pico()),
+            'status': status,
+            **execucao['atributos'],
+        }
+        _gravar_log(execucao, registro)
+        _gravar_prometheus(execucao, fim=(time.time(), status))
+
+"""
+    Mede um estágio. O dicionário entregue ao bloco aceita linhas_saida e bytes
+    (e qualquer outro campo, que vai para o log); registrar=False descarta a
+    medição. Só as etapas de primeiro nível passam pelo perfil de CPU; as
+    aninhadas aparecem dentro do perfil da etapa que as contém.
+"""
+@contextmanager
+def etapa(nome, linhas_entrada=None, **atributos):
+    medida = {'linhas_entrada': linhas_entrada, 'linhas_saida': None, 'bytes': None, **atributos}
+    execucao = _execucao
+    if execucao is None:
+        yield medida
+        return
+
+    principal = os.getpid() == execucao['pid']
+    profundidade = getattr(_local, 'profundidade', 0)
+    perfil = None
+    if principal and execucao['limite_perfil'] is not None and profundidade == 0:
+        perfil = cProfile.Profile()
+    rss_inicio = rss_atual()
+    cpu_inicio = time.process_time()
+    inicio = time.perf_counter()
+    _local.profundidade = profundidade + 1
+    if perfil is not None:
+        perfil.enable()
+    status = 'ok'
+    try:
+        yield medida
+    except BaseException:
+        status = 'erro'
+        raise
+    finally:
+        if perfil is not None:
+            perfil.disable()
+        segundos = time.perf_counter() - inicio
+        cpu_segundos = time.process_time() - cpu_inicio
+        rss_fim = rss_atual()
+        _local.profundidade = profundidade
+        if medida.pop('registrar', True):
+            registro = {
+                'tipo': 'etapa',
+                'execucao': execucao['id'],
+                'processo': execucao['processo'],
+                'etapa': nome,
+                'pid': os.getpid(),
+                'inicio': datetime.now().isoformat(timespec='milliseconds'),
+                'segundos': round(segundos, 4),
+                'cpu_segundos': round(cpu_segundos, 4),
+                'rss_delta_mb': _mb(rss_fim - rss_inicio) if rss_inicio is not None else None,
+                'rss_mb': _mb(rss_fim),
+                **medida,
+                'status': status,
+            }
+            if perfil is not None and segundos >= execucao['limite_perfil']:
+                registro['perfil'] = _gravar_perfil(execucao, nome, perfil)
+            with _trava:
+                _gravar_log(execucao, registro)
+                if principal:
+                    _acumular(execucao, nome, registro)
+                    if profundidade == 0:
+                        _gravar_prometheus(execucao)
+
+def _mb(valor):
+    return round(valor / 2**20, 1) if valor is not None else None
+
+def _acumular(execucao, nome, registro):
+    total = execucao['totais'].setdefault(nome, {
+        'execucoes': 0, 'erros': 0, 'segundos': 0.0, 'cpu_segundos': 0.0, 'linhas_saida': 0, 'bytes': 0,
+    })
+    total['execucoes'] += 1
+    total['erros'] += registro['status'] == 'erro'
+    total['segundos'] += registro['segundos']
+    total['cpu_segundos'] += registro['cpu_segundos']
+    total['linhas_saida'] += registro['linhas_saida'] or 0
+    total['bytes'] += registro['bytes'] or 0
+    total['ultima_duracao'] = registro['segundos']
+    total['ultimo_rss_delta_mb'] = registro['rss_delta_mb']
+    execucao['erros'] += registro['status'] == 'erro'
+
+def _gravar_log(execucao, registro):
+    with open(execucao['log'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+
+def _gravar_perfil(execucao, nome, perfil):
+    os.makedirs(execucao['perfis'], exist_ok=True)
+    caminho = os.path.join(execucao['perfis'], f"{execucao['id']}-{re.sub(r'[^0-9A-Za-z_]+', '_', nome)}.pstats")
+    perfil.dump_stats(caminho)
+    print(f"Perfil de CPU da etapa '{nome}' gravado em {caminho}")
+    return caminho
+
+"""
+    Reescreve o arquivo .prom do processo com os totais por etapa. A escrita é
+    feita num temporário e renomeada, como pede o textfile collector.
+"""
+def _gravar_prometheus(execucao, fim=None):
+    p = PREFIXO_METRICAS
+    rotulo_processo = f'processo="{execucao["processo"]}"'
+    series = {
+        f'{p}_etapa_execucoes_total': ('counter', 'Execuções da etapa', 'execucoes'),
+        f'{p}_etapa_erros_total': ('counter', 'Execuções da etapa que terminaram com erro', 'erros'),
+        f'{p}_etapa_segundos_total': ('counter', 'Tempo de parede acumulado da etapa', 'segundos'),
+        f'{p}_etapa_cpu_segundos_total': ('counter', 'Tempo de CPU acumulado da etapa', 'cpu_segundos'),
+        f'{p}_etapa_linhas_total': ('counter', 'Linhas produzidas pela etapa', 'linhas_saida'),
+        f'{p}_etapa_bytes_total': ('counter', 'Bytes lidos ou carregados pela etapa', 'bytes'),
+        f'{p}_etapa_ultima_duracao_segundos': ('gauge', 'Duração da última execução da etapa', 'ultima_duracao'),
+        f'{p}_etapa_ultimo_rss_delta_megabytes': ('gauge', 'Variação de RSS na última execução da etapa',
+                                                  'ultimo_rss_delta_mb'),
+    }
+    linhas = []
+    for metrica, (tipo, descricao, campo) in series.items():
+        linhas += [f"# HELP {metrica} {descricao}", f"# TYPE {metrica} {tipo}"]
+        for nome, total in sorted(execucao['totais'].items()):
+            if total.get(campo) is not None:
+                linhas.append(f'{metrica}{{{rotulo_processo},etapa="{nome}"}} {round(total[campo], 6)}')
+    if fim is not None:
+        timestamp, status = fim
+        linhas += [
+            f"# HELP {p}_execucao_fim_timestamp_seconds Fim da última execução",
+            f"# TYPE {p}_execucao_fim_timestamp_seconds gauge",
+            f"{p}_execucao_fim_timestamp_seconds{{{rotulo_processo}}} {timestamp:.0f}",
+            f"# HELP {p}_execucao_sucesso 1 se a última execução terminou sem erro",
+            f"# TYPE {p}_execucao_sucesso gauge",
+            f"{p}_execucao_sucesso{{{rotulo_processo}}} {int(status == 'ok')}",
+        ]
+
+    temporario = execucao['prometheus'] + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(linhas) + '\n')
+    os.replace(temporario, execucao['prometheus'])
@@ -1,8 +1,23 @@
 import pandas as pd
 import numpy as np
 import os
+import io
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy import create_engine
 import psycopg2 
+from instrumentacao import etapa, iniciar_execucao, finalizar_execucao, LOG_DIR_PADRAO, LIMITE_PERFIL_PADRAO
+from analitico import exportar_parquet, DIRETORIO_PARQUET_PADRAO
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
 DB_USER = "postgres"
 DB_PASSWORD = "admin"
@@ -12,57 +27,200 @@ DB_NAME = "esus_srag_db"
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+COLUNAS_DESCARTADAS = [
+    'source_id', 'excluido', 'validado',
+    'outroBuscaAtivaAssintomatico', 'outroTriagemPopulacaoEspecifica', 'outroLocalRealizacaoTestagem'
+]
+
+# Layout do CSV do e-SUS Notifica. Tipos declarados evitam a inferência coluna a
+# coluna do pandas; textos de baixa cardinalidade viram category. Códigos numéricos
+# (com nulos) usam float32, exato para inteiros até 16 milhões e bem mais rápido de
+# ler que os inteiros anuláveis (Int16/Int32). Colunas fora do dicionário seguem inferidas.
+ESUS_DTYPES = {
+    'source_id': str,
+    'estado': 'category',
+    'estadoIBGE': 'category',
+    'municipio': 'category',
+    'municipioIBGE': 'float32',
+    'estadoNotificacao': 'category',
+    'estadoNotificacaoIBGE': 'category',
+    'municipioNotificacao': 'category',
+    'municipioNotificacaoIBGE': 'float32',
+    'sexo': 'category',
+    'racaCor': 'category',
+    'idade': 'float32',
+    'evolucaoCaso': 'category',
+    'classificacaoFinal': 'category',
+    'sintomas': 'category',
+    'condicoes': 'category',
+    'profissionalSaude': 'category',
+    'profissionalSeguranca': 'category',
+    'cbo': 'category',
+    'codigoRecebeuVacina': 'float32',
+    'codigoDosesVacina': 'category',
+    'codigoLaboratorioPrimeiraDose': 'category',
+    'codigoEstrategiaCovid': 'float32',
+    **{f'codigoEstadoTeste{i}': 'float32' for i in range(1, 5)},
+    **{f'codigoTipoTeste{i}': 'float32' for i in range(1, 5)},
+    **{f'codigoFabricanteTeste{i}': 'float32' for i in range(1, 5)},
+    **{f'codigoResultadoTeste{i}': 'float32' for i in range(1, 5)},
+}
+
+# Colunas de data do layout. Qualquer outra coluna com "data" no nome também é convertida.
+ESUS_COLUNAS_DATA = [
+    'dataNotificacao', 'dataInicioSintomas', 'dataEncerramento',
+    'dataPrimeiraDose', 'dataSegundaDose',
+    *[f'dataColetaTeste{i}' for i in range(1, 5)],
+]
+
+# Formatos de data aceitos, na ordem de tentativa. O primeiro que converte toda a
+# amostra da coluna é usado na coluna inteira; valores que ainda falharem caem na
+# inferência original (dayfirst).
+FORMATOS_DATA = ['%d/%m/%Y', '%Y-%m-%d', 'ISO8601']
+
+# Leitor do CSV: 'c' (padrão do pandas) ou 'pyarrow' (multithread, requer pyarrow).
+# O modo streaming sempre usa 'c', que é o único com suporte a chunksize.
+# O padrão é 'c': em 300 mil linhas (76 MB) a leitura com as datas leva 2,2-2,4 s
+# com pico de 160 MB; o pyarrow leva 2,1-2,2 s, mas com pico de 520 MB.
+LEITOR_CSV_PADRAO = 'c'
+
+# Métricas de cada um dos 4 slots de teste do e-SUS (prefixo no CSV -> coluna na fato).
+TEST_METRICS = {
+    'codigoEstadoTeste': 'codigo_estado_teste',
+    'codigoTipoTeste': 'codigo_tipo_teste',
+    'codigoFabricanteTeste': 'codigo_fabricante_teste',
+    'codigoResultadoTeste': 'codigo_resultado_teste',
+    'dataColetaTeste': 'data_coleta',
+}
+
+# Indicadores de positividade (indicadores_municipais): janelas móveis, em dias,
+# e o código de resultado do e-SUS contado como positivo (1 = Reagente/Detectável).
+# Só entram no cálculo os testes com resultado informado.
+JANELAS_POSITIVIDADE = (7, 14)
+RESULTADO_POSITIVO = 1
+
+# Diretório do staging em Parquet (saídas de extração e transformação, endereçadas
+# pelo hash do arquivo de entrada e do código de cada estágio).
+STAGING_DIR_PADRAO = 'staging'
+
+# Snapshot das dimensões (chave natural -> id) no diretório de staging, gravado
+# depois de cada carga. A carga incremental o usa no lugar de ler as dimensões
+# do banco quando a assinatura delas (linhas e hash dos pares id=chave) confere.
+ARQUIVO_SNAPSHOT_DIMENSOES = 'dimensoes.json'
+
+# Tamanho padrão do bloco no modo streaming (linhas por bloco).
+# O pico de memória passa a ser proporcional a este valor, e não ao tamanho do arquivo.
+CHUNK_SIZE_PADRAO = 200_000
+
+# Linhas serializadas por comando COPY (limita o buffer CSV em memória).
+COPY_BATCH_ROWS = 50_000
+
+# Modo incremental: notificações com dataNotificacao anterior à marca d'água
+# menos esta janela são consideradas já carregadas e nem são comparadas.
+JANELA_INCREMENTAL_DIAS = 30
+
+# Chave natural e id de cada dimensão (usados no modo incremental / ON CONFLICT).
+DIM_NATURAL_KEYS = {
+    'dim_localidades': ('codigo_ibge_municipio', 'id_localidade'),
+    'dim_sintomas': ('nome_sintoma', 'id_sintoma'),
+    'dim_condicoes': ('nome_condicao', 'id_condicao'),
+    'dim_raca_cor': ('descricao_raca_cor', 'id_raca_cor'),
+    'dim_evolucao_caso': ('descricao_evolucao', 'id_evolucao'),
+}
+
+# Colunas das fatos que apontam para cada dimensão (remapeadas na carga multiarquivo).
+DIM_FK_COLUMNS = {
+    'dim_localidades': [('fato_notificacoes', 'fk_localidade_residencia')],
+    'dim_sintomas': [('fato_notificacao_sintoma', 'fk_sintoma')],
+    'dim_condicoes': [('fato_notificacao_condicao', 'fk_condicao')],
+    'dim_raca_cor': [('fato_notificacoes', 'fk_raca_cor')],
+    'dim_evolucao_caso': [('fato_notificacoes', 'fk_evolucao_caso')],
+}
+
+# Ordem de carga: dimensões antes das fatos, por causa das FKs.
+LOAD_ORDER = [
+    'dim_localidades', 'dim_sintomas', 'dim_condicoes', 'dim_raca_cor', 'dim_evolucao_caso',
+    'fato_notificacoes', 'fato_notificacao_sintoma', 'fato_notificacao_condicao', 'fato_testes_realizados'
+]
+
+# Colunas de residência e de notificação usadas na dim_localidades.
+COLUNAS_LOCALIDADES = [
+    'estado', 'estadoIBGE', 'municipio', 'municipioIBGE',
+    'estadoNotificacao', 'estadoNotificacaoIBGE', 'municipioNotificacao', 'municipioNotificacaoIBGE',
+]
+
+# Tabelas fato particionadas por mês de data_notificacao (ver create_tables.sql).
+TABELAS_FATO = ['fato_notificacoes', 'fato_notificacao_sintoma', 'fato_notificacao_condicao', 'fato_testes_realizados']
+
 """
     Normaliza as 4 colunas de testes.
-    ALTERAÇÃO: Agora buscamos o TEXTO do resultado (resultadoTeste) e não mais o código.
+    Cada slot de teste (1..4) contribui com as posições das linhas que têm
+    alguma métrica preenchida (e que estão em `linhas`, se informada). A ordem
+    de saída (id_notificacao, test_number) é calculada só sobre essas posições,
+    e cada coluna da saída é preenchida uma vez, direto das colunas do slot,
+    sem copiar o DataFrame de entrada nem concatenar blocos intermediários.
 """
-def process_testes_realizados(df):
+def process_testes_realizados(df, linhas=None):
     print("Processando Fato Testes Realizados (Unpivot)...")
 
-    test_metrics = [
-        'codigoEstadoTeste', 
-        'codigoTipoTeste', 
-        'codigoFabricanteTeste', 
-        'dataColetaTeste'
-    ]
-    
-    id_vars = ['id_notificacao']
-    
-    value_vars = [f'{metric}{i}' for i in range(1, 5) for metric in test_metrics]
-    
-    cols_present = [c for c in value_vars if c in df.columns]
-    
-    df_testes = df[id_vars + cols_present].copy()
-
-    df_long = pd.melt(
-        df_testes,
-        id_vars=['id_notificacao'],
-        value_vars=cols_present,
-        var_name='test_variable',
-        value_name='test_value'
-    ).dropna(subset=['test_value']) 
-
-    df_long['test_number'] = df_long['test_variable'].str[-1].astype(int)
-    df_long['metric_name'] = df_long['test_variable'].str[:-1]
-
-    df_final = df_long.pivot_table(
-        index=['id_notificacao', 'test_number'],
-        columns='metric_name',
-        values='test_value',
-        aggfunc='first'
-    ).reset_index()
-
-    df_final.columns.name = None
-    
-    df_final = df_final.rename(columns={
-        'codigoEstadoTeste': 'codigo_estado_teste',
-        'codigoTipoTeste': 'codigo_tipo_teste',
-        'codigoFabricanteTeste': 'codigo_fabricante_teste',
-        'dataColetaTeste': 'data_coleta'
-    })
-    
+    ids = df['id_notificacao'].to_numpy()
+    slots = []
+    for test_number in range(1, 5):
+        colunas = {
+            nome: f'{metric}{test_number}'
+            for metric, nome in TEST_METRICS.items()
+            if f'{metric}{test_number}' in df.columns
+        }
+        if not colunas:
+            continue
+
+        preenchido = np.zeros(len(df), dtype=bool)
+        for col in colunas.values():
+            preenchido |= df[col].notna().to_numpy()
+        if linhas is not None:
+            preenchido &= np.asarray(linhas)
+        posicoes = np.flatnonzero(preenchido)
+        if len(posicoes):
+            slots.append((test_number, colunas, posicoes))
+
+    if not slots:
+        df_final = pd.DataFrame(columns=['id_notificacao', 'test_number', *TEST_METRICS.values()])
+        df_final['id_registro'] = df_final.index + 1
+        print("Fato_Testes_Realizados criada com 0 testes individuais.")
+        return df_final
+
+    posicoes = np.concatenate([p for _, _, p in slots])
+    numeros = np.concatenate([np.full(len(p), n, dtype=np.int64) for n, _, p in slots])
+    ordem = np.lexsort((numeros, ids[posicoes]))
+    # destino[i] = linha de saída do i-ésimo teste, na ordem dos slots.
+    destino = np.empty(len(ordem), dtype=np.int64)
+    destino[ordem] = np.arange(len(ordem))
+
+    saida = {'id_notificacao': ids[posicoes[ordem]], 'test_number': numeros[ordem]}
+    del numeros
+    for nome in TEST_METRICS.values():
+        fontes = []
+        inicio = 0
+        for _, colunas, posicoes_slot in slots:
+            fim = inicio + len(posicoes_slot)
+            if nome in colunas:
+                fontes.append((destino[inicio:fim], df[colunas[nome]].to_numpy()[posicoes_slot]))
+            inicio = fim
+        if not fontes:
+            continue
+        tipo = np.result_type(*[valores.dtype for _, valores in fontes])
+        if len(fontes) < len(slots) and tipo.kind not in 'fMm':
+            tipo = np.dtype(object)
+        coluna = np.empty(len(ordem), dtype=tipo) if len(fontes) == len(slots) else \
+            np.full(len(ordem), np.datetime64('NaT') if tipo.kind in 'Mm' else np.nan, dtype=tipo)
+        for linhas_saida, valores in fontes:
+            coluna[linhas_saida] = valores
+        saida[nome] = coluna
+        del fontes
+
+    df_final = pd.DataFrame(saida, copy=False)
     df_final['id_registro'] = df_final.index + 1
-    
+
     print(f"Fato_Testes_Realizados criada com {len(df_final)} testes individuais.")
     return df_final
 
@@ -79,8 +237,12 @@ def process_localidades(df):
     df_notificacao = df[['estadoNotificacao', 'estadoNotificacaoIBGE', 'municipioNotificacao', 'municipioNotificacaoIBGE']].copy()
     df_notificacao.columns = ['estado_nome', 'estado_uf', 'municipio_nome', 'codigo_ibge_municipio']
     
-    dim_localidades = pd.concat([df_residencia, df_notificacao])
-    dim_localidades = dim_localidades.dropna(subset=['codigo_ibge_municipio'])
+    # Deduplicar cada parte antes do concat mantém a primeira ocorrência de cada
+    # município e evita empilhar duas cópias de todas as linhas.
+    dim_localidades = pd.concat([
+        parte.dropna(subset=['codigo_ibge_municipio']).drop_duplicates(subset=['codigo_ibge_municipio'])
+        for parte in (df_residencia, df_notificacao)
+    ])
     dim_localidades['codigo_ibge_municipio'] = dim_localidades['codigo_ibge_municipio'].astype(int)
     dim_localidades = dim_localidades.drop_duplicates(subset=['codigo_ibge_municipio']).reset_index(drop=True)
     dim_localidades['codigo_ibge_estado'] = dim_localidades['codigo_ibge_municipio'].astype(str).str[:2].astype(int)
@@ -95,166 +257,569 @@ def process_localidades(df):
     return dim_localidades
 
 """
-    Tratamento de Nulos (Mantido igual)
+    Converte uma coluna numérica com nulos (NaN) para o inteiro anulável do
+    tipo dado, montando o IntegerArray direto de valores + máscara (o astype
+    do pandas para Int* é bem mais lento).
+"""
+def to_nullable_int(serie, dtype):
+    valores = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+    nulo = np.isnan(valores)
+    inteiros = np.where(nulo, 0, valores).astype(dtype)
+    return pd.Series(pd.arrays.IntegerArray(inteiros, nulo), index=serie.index, name=serie.name)
+
+"""
+    Menor inteiro anulável (Int8/Int16/Int32) que comporta os códigos de uma
+    coluna float com nulos. Colunas com valores não inteiros ou fora da faixa
+    do int64 ficam como estão.
+"""
+def compact_code_column(serie):
+    valores = serie.dropna().to_numpy()
+    if not (valores == np.trunc(valores)).all():
+        return serie
+    minimo, maximo = (valores.min(), valores.max()) if len(valores) else (0, 0)
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        limites = np.iinfo(dtype)
+        if limites.min <= minimo and maximo <= limites.max:
+            return to_nullable_int(serie, dtype)
+    return serie
+
+"""
+    REGRAS DE IMPUTAÇÃO E CORREÇÃO
+    Cada regra é (nome, coluna, condição, valor, descrição):
+        condição: ('nulo',), ('>', coluna), ('<', coluna) ou ('fora', mínimo, máximo)
+        valor:    ('constante', v), ('coluna', coluna, dias), ('mapa', coluna, {código: v}, padrão),
+                  ('mediana',), ('nulo',) ou None (a regra só conta as linhas, sem alterar)
+    As regras de uma coluna são aplicadas juntas, em uma passada: a primeira
+    regra cuja condição vale decide a linha, e as condições leem sempre os
+    valores de entrada, nunca os já imputados. A mediana é a do bloco (ou do
+    arquivo, na carga completa). Os acertos de cada regra vão para o relatório
+    de integridade da carga.
+"""
+REGRAS_IMPUTACAO = [
+    ('notificacao_sem_data', 'dataNotificacao', ('nulo',), None,
+     "Notificação sem data de notificação (descartada na transformação)"),
+    ('classificacao_por_resultado', 'classificacaoFinal', ('nulo',),
+     ('mapa', 'codigoResultadoTeste1', {1: 'Confirmado Laboratorial', 2: 'Descartado'}, 'Suspeito'),
+     "Classificação final ausente (deduzida do resultado do 1º teste; sem resultado, Suspeito)"),
+    ('inicio_sintomas_ausente', 'dataInicioSintomas', ('nulo',), ('coluna', 'dataNotificacao', -1),
+     "Início dos sintomas ausente (véspera da notificação)"),
+    ('inicio_sintomas_apos_notificacao', 'dataInicioSintomas', ('>', 'dataNotificacao'), ('coluna', 'dataNotificacao', 0),
+     "Cronologia inválida: início dos sintomas após a notificação (igualado à data de notificação)"),
+    ('encerramento_antes_notificacao', 'dataEncerramento', ('<', 'dataNotificacao'), ('nulo',),
+     "Encerramento anterior à notificação (data de encerramento anulada)"),
+    ('idade_ausente', 'idade', ('nulo',), ('mediana',),
+     "Idade ausente (mediana das idades lidas)"),
+    ('idade_fora_da_faixa', 'idade', ('fora', 0, 120), None,
+     "Idade fora da faixa de 0 a 120 anos (mantida)"),
+    ('sexo_ausente', 'sexo', ('nulo',), ('constante', 'IGNORADO'),
+     "Sexo ausente (IGNORADO)"),
+    ('raca_cor_ausente', 'racaCor', ('nulo',), ('constante', 'NAO INFORMADO'),
+     "Raça/cor ausente (NAO INFORMADO)"),
+    ('evolucao_ausente', 'evolucaoCaso', ('nulo',), ('constante', 'EM ABERTO'),
+     "Evolução do caso ausente (EM ABERTO)"),
+]
+
+"""
+    Agrupa as regras por coluna, na ordem em que aparecem, e valida condições
+    e valores. Cada coluna do plano é lida e escrita uma única vez.
+"""
+def compile_imputation_rules(regras):
+    plano = {}
+    for nome, coluna, condicao, valor, _ in regras:
+        if condicao[0] not in ('nulo', '>', '<', 'fora'):
+            raise ValueError(f"Condição desconhecida na regra {nome}: {condicao}")
+        if valor is not None and valor[0] not in ('constante', 'coluna', 'mapa', 'mediana', 'nulo'):
+            raise ValueError(f"Valor desconhecido na regra {nome}: {valor}")
+        plano.setdefault(coluna, []).append((nome, condicao, valor))
+    return plano
+
+PLANO_IMPUTACAO = compile_imputation_rules(REGRAS_IMPUTACAO)
+
+# Descarte feito só na seleção do delta incremental (select_incremental_delta),
+# fora das regras de imputação: sem source_id não há como reconhecer a
+# notificação já carregada. Nas cargas completas ela entra com id_origem nulo.
+# (nome, coluna, descrição), contado no relatório de integridade da carga incremental.
+DESCARTE_SEM_SOURCE_ID = (
+    'notificacao_sem_source_id', 'id_origem',
+    "Notificação sem source_id, sem identificação estável na origem (descartada na carga incremental)",
+)
+
+def new_integrity_counts():
+    return {'linhas': 0, 'regras': {regra[0]: 0 for regra in REGRAS_IMPUTACAO}}
+
+def merge_integrity_counts(destino, origem):
+    destino['linhas'] += origem['linhas']
+    for nome, acertos in origem['regras'].items():
+        destino['regras'][nome] = destino['regras'].get(nome, 0) + acertos
+    return destino
+
+"""
+    Valores da coluna como array NumPy, com o nulo do próprio tipo: códigos
+    (-1) em category, NaT em datas e NaN nos números (inteiros anuláveis viram float).
+"""
+def column_values(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy()
+    if serie.dtype.kind in 'iufbM' and not pd.api.types.is_extension_array_dtype(serie.dtype):
+        return serie.to_numpy()
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        return serie.to_numpy(dtype=np.float64, na_value=np.nan)
+    return serie.to_numpy(dtype=object)
+
+def null_mask(valores, categorica):
+    if categorica:
+        return valores < 0
+    if valores.dtype.kind == 'M':
+        return np.isnat(valores)
+    return pd.isna(valores)
+
+"""
+    Aplica o plano a df (no lugar) e devolve os acertos de cada regra.
+    Para cada coluna: uma leitura, as máscaras das regras (exclusivas, pela
+    ordem) e uma escrita, só se alguma regra com valor acertou. Em colunas
+    category os valores novos entram como categorias e a escrita é nos códigos.
 """
-def intelligent_null_imputation(df):
+def apply_imputation_rules(df, plano=PLANO_IMPUTACAO):
+    acertos = {}
+    lidas = {}
+
+    def ler(coluna):
+        if coluna not in lidas:
+            lidas[coluna] = column_values(df[coluna]) if coluna in df.columns else None
+        return lidas[coluna]
+
+    for coluna, regras in plano.items():
+        if coluna not in df.columns:
+            acertos.update((nome, 0) for nome, _, _ in regras)
+            continue
+        serie = df[coluna]
+        categorica = isinstance(serie.dtype, pd.CategoricalDtype)
+        valores = ler(coluna)
+        categorias = list(serie.cat.categories) if categorica else None
+        livres = np.ones(len(valores), dtype=bool)
+        escritas = []
+
+        for nome, condicao, valor in regras:
+            tipo = condicao[0]
+            if tipo == 'nulo':
+                mascara = null_mask(valores, categorica)
+            elif tipo == 'fora':
+                mascara = (valores < condicao[1]) | (valores > condicao[2])
+            else:
+                outra = ler(condicao[1])
+                if outra is None:
+                    mascara = np.zeros(len(valores), dtype=bool)
+                else:
+                    mascara = valores > outra if tipo == '>' else valores < outra
+            mascara &= livres
+            livres &= ~mascara
+            acertos[nome] = int(mascara.sum())
+            if valor is not None and acertos[nome]:
+                escritas.append((mascara, valor))
+
+        if not escritas:
+            continue
+
+        def codigo(rotulo):
+            if rotulo not in categorias:
+                categorias.append(rotulo)
+            return categorias.index(rotulo)
+
+        resultado = valores.astype(np.int32) if categorica else valores.copy()
+        for mascara, valor in escritas:
+            tipo = valor[0]
+            if tipo == 'constante':
+                resultado[mascara] = codigo(valor[1]) if categorica else valor[1]
+            elif tipo == 'nulo':
+                resultado[mascara] = -1 if categorica else (np.datetime64('NaT') if valores.dtype.kind == 'M' else np.nan)
+            elif tipo == 'mediana':
+                resultado[mascara] = serie.median()
+            elif tipo == 'coluna':
+                origem = ler(valor[1])[mascara]
+                resultado[mascara] = origem + np.timedelta64(valor[2], 'D') if origem.dtype.kind == 'M' else origem + valor[2]
+            else:
+                _, coluna_origem, mapa, padrao = valor
+                origem = ler(coluna_origem)
+                rotulos = list(mapa.values()) + [padrao]
+                escolhas = np.array([codigo(r) for r in rotulos] if categorica else rotulos, dtype=resultado.dtype)
+                if origem is None:
+                    resultado[mascara] = escolhas[-1]
+                else:
+                    origem = origem[mascara]
+                    indice = np.select([origem == chave for chave in mapa], np.arange(len(mapa)), len(mapa))
+                    resultado[mascara] = escolhas[indice]
+
+        if categorica:
+            df[coluna] = pd.Categorical.from_codes(resultado, categories=categorias)
+        else:
+            df[coluna] = resultado
+    return acertos
+
+"""
+    Tratamento de Nulos
+    Altera df no lugar (o chamador não precisa de uma cópia) e mantém os tipos
+    compactos da leitura: a classificação continua category e a idade vira o
+    menor inteiro que comporta os valores. As correções são as de
+    REGRAS_IMPUTACAO; com contagens (new_integrity_counts), os acertos de cada
+    regra são somados nela.
+"""
+def intelligent_null_imputation(df, contagens=None):
     print("Iniciando tratamento de nulos...")
-    
-    if 'codigoResultadoTeste1' in df.columns:
-        df['classificacaoFinal'] = np.where(
-            (df['classificacaoFinal'].isnull()) & (df['codigoResultadoTeste1'] == 1),
-            'Confirmado Laboratorial',
-            df['classificacaoFinal']
-        )
-        df['classificacaoFinal'] = np.where(
-            (df['classificacaoFinal'].isnull()) & (df['codigoResultadoTeste1'] == 2),
-            'Descartado',
-            df['classificacaoFinal']
-        )
-    
-    df['classificacaoFinal'] = df['classificacaoFinal'].fillna('Suspeito')
 
-    df['dataInicioSintomas'] = np.where(
-        df['dataInicioSintomas'].isnull(),
-        df['dataNotificacao'] - pd.Timedelta(days=1),
-        df['dataInicioSintomas']
-    )
-    
-    mask_erro_data = df['dataInicioSintomas'] > df['dataNotificacao']
-    df.loc[mask_erro_data, 'dataInicioSintomas'] = df.loc[mask_erro_data, 'dataNotificacao']
-    
-    mask_erro_fim = (df['dataEncerramento'] < df['dataNotificacao']) & (df['dataEncerramento'].notnull())
-    df.loc[mask_erro_fim, 'dataEncerramento'] = pd.NaT 
-
-    median_age = df['idade'].median()
-    df['idade'] = df['idade'].fillna(median_age).astype(int)
-    df['sexo'] = df['sexo'].fillna('IGNORADO')
-    df['racaCor'] = df['racaCor'].fillna('NAO INFORMADO')
-    df['evolucaoCaso'] = df['evolucaoCaso'].fillna('EM ABERTO')
-    
+    acertos = apply_imputation_rules(df)
+    df['idade'] = pd.to_numeric(np.trunc(df['idade']), downcast='integer')
+
+    if contagens is not None:
+        merge_integrity_counts(contagens, {'linhas': len(df), 'regras': acertos})
     print("Tratamento concluído.")
     return df
 
 """
-    Leitura CSV (Mantido igual)
+    Monta os argumentos de leitura a partir do cabeçalho do arquivo: usecols deixa
+    de fora as colunas descartadas (exceto source_id, usada como id_origem) e os
+    tipos declarados em ESUS_DTYPES são aplicados às colunas presentes.
+    As datas são lidas como category (texto com poucos valores distintos) e
+    convertidas depois por parse_date_column.
+    Com todas as colunas tipadas, o leitor C pode tokenizar o arquivo em partes
+    (low_memory), o que corta o pico da leitura; low_memory=False só é usado
+    quando sobra coluna para inferir, para que o tipo não varie entre as partes.
+"""
+def build_read_options(file_path):
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = [c for c in header if c not in COLUNAS_DESCARTADAS or c == 'source_id']
+    date_cols = [c for c in usecols if c in ESUS_COLUNAS_DATA or 'data' in c.lower()]
+
+    dtype = {c: t for c, t in ESUS_DTYPES.items() if c in usecols}
+    dtype.update({c: 'category' for c in date_cols})
+    return {'usecols': usecols, 'dtype': dtype, 'low_memory': all(c in dtype for c in usecols)}
+
+"""
+    Leitura CSV com o schema declarado do e-SUS.
+    leitor='pyarrow' usa o engine do pyarrow quando instalado.
 """
-def extract_and_initial_transform(file_path):
+def extract_and_initial_transform(file_path, leitor=LEITOR_CSV_PADRAO):
     print(f"Lendo arquivo: {file_path}")
-    COLUNAS_DESCARTADAS = [
-        'source_id', 'excluido', 'validado',
-        'outroBuscaAtivaAssintomatico', 'outroTriagemPopulacaoEspecifica', 'outroLocalRealizacaoTestagem'
-    ]
     try:
-        df = pd.read_csv(file_path, low_memory=False)
+        read_options = build_read_options(file_path)
     except FileNotFoundError:
         print(f"ERRO: Arquivo não encontrado em {file_path}")
         return None
 
-    df = df.drop(columns=COLUNAS_DESCARTADAS, errors='ignore')
-    
-    date_cols = [col for col in df.columns if 'data' in col.lower()]
-    for col in date_cols:
-        df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
+    if leitor == 'pyarrow' and pa is None:
+        print("pyarrow não instalado; usando o leitor padrão do pandas.")
+        leitor = 'c'
+    with etapa('extract', leitor=leitor) as medida:
+        if leitor == 'pyarrow':
+            read_options.pop('low_memory')
+            df = pd.read_csv(file_path, engine='pyarrow', **read_options)
+        else:
+            df = pd.read_csv(file_path, **read_options)
+
+        df = initial_transform(df)
+        medida['linhas_saida'] = len(df)
+        medida['bytes'] = os.path.getsize(file_path)
         
     print(f"Registros lidos: {len(df)}")
     return df
 
 """
-    Normalização multivalorada (Mantido igual)
+    Converte uma coluna de data lida como texto.
+    Testa os formatos de FORMATOS_DATA numa amostra e aplica o primeiro que servir
+    à coluna toda (bem mais rápido que inferir o formato). Só os valores que
+    falharem passam pela inferência com dayfirst, como no tratamento original.
+    Em colunas category só as datas distintas são convertidas e o resultado é
+    expandido pelos códigos, sem criar um texto por linha.
 """
-def normalize_multivalued_data(df, column_name, dim_name):
-    df_temp = df[['id_notificacao', column_name]].copy()
-    df_temp = df_temp.rename(columns={column_name: dim_name})
-    df_temp = df_temp.dropna(subset=[dim_name])
-    
-    df_exploded = (df_temp[dim_name]
-                    .str.split(', ')
-                    .explode()
-                    .to_frame())
-    
-    df_exploded = df_exploded.merge(df_temp[['id_notificacao']], left_index=True, right_index=True)
-    df_exploded[dim_name] = df_exploded[dim_name].str.strip()
-    df_exploded = df_exploded.drop_duplicates(subset=['id_notificacao', dim_name]).reset_index(drop=True)
-    
-    return df_exploded
+def parse_date_column(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        datas = parse_date_column(pd.Series(serie.cat.categories.astype(object)))
+        # O código -1 (nulo) cai no NaT acrescentado ao final.
+        datas = np.append(datas.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+        return pd.Series(datas[serie.cat.codes.to_numpy()], index=serie.index, name=serie.name)
 
+    amostra = serie.iloc[:5000].dropna()
+    if amostra.empty:
+        amostra = serie.dropna().iloc[:1000]
+    if amostra.empty:
+        return pd.to_datetime(serie, errors='coerce')
+
+    for formato in FORMATOS_DATA:
+        if pd.to_datetime(amostra, format=formato, errors='coerce').notna().all():
+            convertida = pd.to_datetime(serie, format=formato, errors='coerce')
+            break
+    else:
+        return pd.to_datetime(serie, errors='coerce', dayfirst=True)
+
+    falhas = convertida.isna().to_numpy()
+    falhas[falhas] = serie[falhas].notna().to_numpy()
+    if falhas.any():
+        convertida[falhas] = pd.to_datetime(serie[falhas], errors='coerce', dayfirst=True).to_numpy()
+    return convertida
 
 """
-    PIPELINE PRINCIPAL (Com ajustes de mapeamento)
+    Remove as colunas descartadas e converte as colunas de data.
+    Usada tanto na leitura completa quanto em cada bloco do modo streaming.
+    Antes do descarte guarda a identificação da origem: id_origem (source_id)
+    e hash_origem (hash do conteúdo da linha), usados pela carga incremental.
+    Sem source_id, id_origem fica nulo: o hash muda quando a linha é editada e
+    não serve de identidade. A carga incremental descarta essas linhas; as
+    cargas completas as mantêm.
 """
-def run_etl_pipeline(file_path):
-    
-    df_raw = extract_and_initial_transform(file_path)
-    if df_raw is None: return
+def initial_transform(df):
+    date_cols = [col for col in df.columns if 'data' in col.lower()]
+    for col in date_cols:
+        df[col] = parse_date_column(df[col])
 
-    df_raw['id_notificacao'] = df_raw.index + 1
-    
-    df_clean = intelligent_null_imputation(df_raw.copy())
-    df_clean = df_clean.dropna(subset=['dataNotificacao'])
+    # O hash é calculado depois da conversão das datas: datetime64 é bem mais
+    # barato de hashear que o texto original.
+    # Hash e descarte sem df.drop, que copiaria o DataFrame inteiro a cada chamada.
+    descartadas = [col for col in COLUNAS_DESCARTADAS if col in df.columns]
+    hash_origem = pd.util.hash_pandas_object(
+        select_rows(df, [col for col in df.columns if col not in descartadas], None), index=False
+    ).to_numpy().view('int64')
+    if 'source_id' in df.columns:
+        id_origem = df['source_id']
+    else:
+        id_origem = pd.Series(None, index=df.index, dtype=object)
 
-    df_sintomas_exploded = normalize_multivalued_data(df_clean, 'sintomas', 'nome_sintoma')
-    dim_sintomas = df_sintomas_exploded[['nome_sintoma']].drop_duplicates().reset_index(drop=True)
-    dim_sintomas['id_sintoma'] = dim_sintomas.index + 1
-    
-    df_condicoes_exploded = normalize_multivalued_data(df_clean, 'condicoes', 'nome_condicao')
-    dim_condicoes = df_condicoes_exploded[['nome_condicao']].drop_duplicates().reset_index(drop=True)
-    dim_condicoes['id_condicao'] = dim_condicoes.index + 1
-    
-    dim_raca_cor = df_clean[['racaCor']].drop_duplicates().dropna().reset_index(drop=True)
-    dim_raca_cor['id_raca_cor'] = dim_raca_cor.index + 1
-    dim_raca_cor = dim_raca_cor.rename(columns={'racaCor': 'descricao_raca_cor'})
-    
-    dim_localidades = process_localidades(df_clean)
-    
-    dim_evolucao = df_clean[['evolucaoCaso']].drop_duplicates().dropna().reset_index(drop=True)
-    dim_evolucao['id_evolucao'] = dim_evolucao.index + 1
-    dim_evolucao = dim_evolucao.rename(columns={'evolucaoCaso': 'descricao_evolucao'})
+    for col in descartadas:
+        del df[col]
+    df['id_origem'] = id_origem
+    df['hash_origem'] = hash_origem
+    return df
 
-    df_fato_testes_realizados = process_testes_realizados(df_clean)
+"""
+    Leitura CSV em blocos (modo streaming).
+    Retorna um iterador de DataFrames com no máximo chunk_size linhas cada,
+    já com o mesmo schema e tratamento inicial da leitura completa.
+"""
+def extract_in_chunks(file_path, chunk_size):
+    print(f"Lendo arquivo em blocos de {chunk_size} linhas: {file_path}")
+    try:
+        read_options = build_read_options(file_path)
+        reader = pd.read_csv(file_path, chunksize=chunk_size, **read_options)
+    except FileNotFoundError:
+        print(f"ERRO: Arquivo não encontrado em {file_path}")
+        return None
 
-    df_fato_testes_realizados = df_fato_testes_realizados.rename(columns={
-        'id_notificacao': 'fk_notificacao',
-        'codigo_tipo_teste': 'fk_tipo_teste',
-        'codigo_fabricante_teste': 'fk_fabricante',
+    return read_chunks(reader)
+
+def read_chunks(reader):
+    while True:
+        with etapa('extract') as medida:
+            chunk = next(reader, None)
+            if chunk is None:
+                medida['registrar'] = False
+            else:
+                chunk = initial_transform(chunk)
+                medida['linhas_saida'] = len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+"""
+    Normalização multivalorada codificada por dicionário.
+    Serve para qualquer campo do e-SUS com valores separados por vírgula.
+    Cada combinação distinta (ex.: "Febre, Tosse") é fatorada uma única vez e só
+    essas combinações são quebradas em termos; as linhas recebem os termos por
+    indexação em arrays NumPy. Os termos novos entram em `mapping` via
+    register_dimension_members e a ponte sai direto como inteiros.
+    Retorna (membros novos da dimensão, ponte fk_notificacao -> fk_col).
+"""
+def encode_multivalued_data(df, column_name, mapping, key_col, id_col, fk_col, sep=', '):
+    codigos, combinacoes = pd.factorize(df[column_name])
+
+    termos = {}
+    termos_combinacao = []
+    for combinacao in combinacoes:
+        vistos = dict.fromkeys(termo.strip() for termo in str(combinacao).split(sep))
+        termos_combinacao.append([termos.setdefault(termo, len(termos)) for termo in vistos])
+
+    tamanhos = np.array([len(t) for t in termos_combinacao], dtype=np.int64)
+    inicio = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+    termos_planos = np.fromiter((t for lista in termos_combinacao for t in lista), dtype=np.int64,
+                                count=int(tamanhos.sum()))
+
+    validos = codigos >= 0
+    codigos = codigos[validos]
+    tamanhos_linha = tamanhos[codigos]
+    total = int(tamanhos_linha.sum())
+    deslocamento = np.arange(total) - np.repeat(np.cumsum(tamanhos_linha) - tamanhos_linha, tamanhos_linha)
+    termo_linha = termos_planos[np.repeat(inicio[codigos], tamanhos_linha) + deslocamento]
+
+    dim_nova = register_dimension_members(mapping, pd.DataFrame({key_col: list(termos)}), key_col, id_col)
+    ids_termos = np.array([mapping[termo] for termo in termos], dtype=np.int32)
+
+    ponte = pd.DataFrame({
+        'fk_notificacao': np.repeat(df['id_notificacao'].to_numpy()[validos], tamanhos_linha),
+        fk_col: ids_termos[termo_linha],
     })
-    
-    colunas_banco_testes = [
-        'fk_notificacao', 
-        'data_coleta', 
-        'codigo_estado_teste', 
-        'fk_tipo_teste', 
-        'fk_fabricante', 
-    ]
+    return dim_nova, ponte
 
-    cols_existentes = [c for c in colunas_banco_testes if c in df_fato_testes_realizados.columns]
-    df_fato_testes_realizados = df_fato_testes_realizados[cols_existentes]
 
-    df_fato_sintoma = df_sintomas_exploded.merge(dim_sintomas, on='nome_sintoma', how='left')
-    df_fato_sintoma = df_fato_sintoma.rename(columns={'id_notificacao': 'fk_notificacao', 'id_sintoma': 'fk_sintoma'})
-    df_fato_sintoma = df_fato_sintoma[['fk_notificacao', 'fk_sintoma']] 
+"""
+    Colunas de df nas linhas da máscara `linhas` (None = todas). Colunas
+    ausentes do arquivo são ignoradas. O DataFrame é montado coluna a coluna:
+    df.loc[linhas, colunas] copiaria primeiro todas as colunas e só depois
+    filtraria as linhas. Sem máscara, as colunas são as próprias de df, sem
+    cópia: quem recebe não deve alterá-las no lugar.
+"""
+def select_rows(df, colunas, linhas):
+    colunas = [col for col in colunas if col in df.columns]
+    if linhas is None:
+        return pd.DataFrame({col: df[col] for col in colunas}, copy=False)
+    mascara = np.asarray(linhas)
+    return pd.DataFrame({col: df[col].array[mascara] for col in colunas}, index=df.index[mascara], copy=False)
 
-    df_fato_condicao = df_condicoes_exploded.merge(dim_condicoes, on='nome_condicao', how='left')
-    df_fato_condicao = df_fato_condicao.rename(columns={'id_notificacao': 'fk_notificacao', 'id_condicao': 'fk_condicao'})
-    df_fato_condicao = df_fato_condicao[['fk_notificacao', 'fk_condicao']]  
-    
-    df_fato_notificacoes = df_clean.copy()
-    
-    df_fato_notificacoes = df_fato_notificacoes.merge(
-        dim_localidades[['codigo_ibge_municipio', 'id_localidade']],
-        left_on='municipioIBGE', right_on='codigo_ibge_municipio', how='left'
-    ).rename(columns={'id_localidade': 'fk_localidade_residencia'})
-    
-    df_fato_notificacoes = df_fato_notificacoes.merge(
-        dim_raca_cor, left_on='racaCor', right_on='descricao_raca_cor', how='left'
-    ).rename(columns={'id_raca_cor': 'fk_raca_cor'})
+"""
+    Estado das dimensões (chave natural -> id) compartilhado entre os blocos.
+    No modo completo começa vazio e é preenchido de uma vez; no modo streaming
+    cresce a cada bloco, garantindo ids estáveis para o mesmo membro.
+    'indices' guarda os índices de dimension_index, refeitos sob demanda.
+"""
+def new_dimension_state():
+    return {
+        'dim_localidades': {},
+        'dim_sintomas': {},
+        'dim_condicoes': {},
+        'dim_raca_cor': {},
+        'dim_evolucao_caso': {},
+        'indices': {},
+    }
 
-    df_fato_notificacoes = df_fato_notificacoes.merge(
-        dim_evolucao, left_on='evolucaoCaso', right_on='descricao_evolucao', how='left'
-    ).rename(columns={'id_evolucao': 'fk_evolucao_caso'})
-    
-    bool_map = {'Sim': True, 'Não': False}
-    df_fato_notificacoes['profissionalSaude'] = df_fato_notificacoes['profissionalSaude'].map(bool_map).fillna(False)
-    df_fato_notificacoes['profissionalSeguranca'] = df_fato_notificacoes['profissionalSeguranca'].map(bool_map).fillna(False)
+"""
+    Registra na dimensão apenas os membros ainda não vistos.
+    Os ids continuam a partir do maior já atribuído, e o DataFrame retornado
+    contém somente as linhas novas (as únicas que precisam ser carregadas).
+"""
+def register_dimension_members(mapping, df_members, key_col, id_col):
+    df_new = df_members.drop_duplicates(subset=[key_col])
+    df_new = df_new[~df_new[key_col].isin(list(mapping))].reset_index(drop=True)
+
+    next_id = max(mapping.values(), default=0) + 1
+    df_new[id_col] = np.arange(next_id, next_id + len(df_new))
+    mapping.update(zip(df_new[key_col], df_new[id_col]))
+    return df_new
+
+"""
+    Índice de uma dimensão para resolver FKs por arrays: as chaves naturais num
+    pd.Index e os ids, alinhados, num array com um 0 sentinela no fim (a posição
+    -1 das chaves ausentes cai nele). Como os membros só são acrescentados, o
+    índice guardado vale enquanto o tamanho da dimensão não mudar.
+"""
+def dimension_index(dim_state, table_name):
+    mapping = dim_state[table_name]
+    indice = dim_state['indices'].get(table_name)
+    if indice is None or indice[0] != len(mapping):
+        ids = np.fromiter(mapping.values(), dtype=np.int32, count=len(mapping))
+        indice = (len(mapping), pd.Index(list(mapping)), np.append(ids, np.int32(0)))
+        dim_state['indices'][table_name] = indice
+    return indice[1], indice[2]
+
+"""
+    FK (Int32) de uma coluna de chaves naturais, por Index.get_indexer; chaves
+    nulas ou fora da dimensão ficam nulas. Em colunas category só as categorias
+    passam pelo índice, e as linhas recebem o id indexando pelos códigos.
+"""
+def resolve_dimension_keys(dim_state, table_name, serie):
+    indice, ids = dimension_index(dim_state, table_name)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        posicoes = np.append(indice.get_indexer(serie.cat.categories), -1)[serie.cat.codes.to_numpy()]
+    else:
+        posicoes = indice.get_indexer(serie.to_numpy())
+    return pd.Series(pd.arrays.IntegerArray(ids[posicoes], posicoes < 0), index=serie.index)
+
+
+"""
+    TRANSFORMAÇÃO (Com ajustes de mapeamento)
+    Recebe os dados brutos (arquivo inteiro ou um bloco), já com id_notificacao,
+    e devolve as tabelas prontas para carga, na ordem de LOAD_ORDER.
+    As dimensões retornadas contêm apenas os membros novos em relação a dim_state.
+    df_raw é consumido: a imputação de nulos altera as colunas no lugar. As
+    linhas sem data de notificação são descartadas por select_rows, que filtra só as colunas usadas por cada tabela, sem
+    copiar o DataFrame inteiro.
+    Os acertos das regras de imputação vão para o log da etapa e, com
+    contagens, são somados nela.
+"""
+def transform_notificacoes(df_raw, dim_state, contagens=None):
+
+    with etapa('transform:imputacao', linhas_entrada=len(df_raw)) as medida:
+        acertos = new_integrity_counts()
+        df_raw = intelligent_null_imputation(df_raw, acertos)
+        validas = df_raw['dataNotificacao'].notna()
+        linhas = None if validas.all() else validas
+        medida['linhas_saida'] = int(validas.sum())
+        medida['regras'] = acertos['regras']
+    if contagens is not None:
+        merge_integrity_counts(contagens, acertos)
+
+    with etapa('transform:multivalorados', linhas_entrada=medida['linhas_saida']) as medida:
+        df_multivalorados = select_rows(df_raw, ['id_notificacao', 'sintomas', 'condicoes'], linhas)
+        dim_sintomas, df_fato_sintoma = encode_multivalued_data(
+            df_multivalorados, 'sintomas', dim_state['dim_sintomas'], 'nome_sintoma', 'id_sintoma', 'fk_sintoma'
+        )
+
+        dim_condicoes, df_fato_condicao = encode_multivalued_data(
+            df_multivalorados, 'condicoes', dim_state['dim_condicoes'], 'nome_condicao', 'id_condicao', 'fk_condicao'
+        )
+        medida['linhas_saida'] = len(df_fato_sintoma) + len(df_fato_condicao)
+        del df_multivalorados
+
+    # As fatos filhas levam a data da notificação (chave de partição da FK composta).
+    df_datas = select_rows(df_raw, ['id_notificacao', 'dataNotificacao'], linhas)
+    data_por_notificacao = pd.Series(df_datas['dataNotificacao'].to_numpy(), index=df_datas['id_notificacao'].to_numpy())
+    del df_datas
+    df_fato_sintoma.insert(1, 'data_notificacao', df_fato_sintoma['fk_notificacao'].map(data_por_notificacao))
+    df_fato_condicao.insert(1, 'data_notificacao', df_fato_condicao['fk_notificacao'].map(data_por_notificacao))
+
+    dim_raca_cor = select_rows(df_raw, ['racaCor'], linhas).drop_duplicates().dropna().rename(columns={'racaCor': 'descricao_raca_cor'})
+    dim_raca_cor = register_dimension_members(
+        dim_state['dim_raca_cor'], dim_raca_cor, 'descricao_raca_cor', 'id_raca_cor'
+    )
+
+    dim_localidades = process_localidades(select_rows(df_raw, COLUNAS_LOCALIDADES, linhas))
+    dim_localidades = register_dimension_members(
+        dim_state['dim_localidades'], dim_localidades.drop(columns=['id_localidade']),
+        'codigo_ibge_municipio', 'id_localidade'
+    )
+
+    dim_evolucao = select_rows(df_raw, ['evolucaoCaso'], linhas).drop_duplicates().dropna().rename(columns={'evolucaoCaso': 'descricao_evolucao'})
+    dim_evolucao = register_dimension_members(
+        dim_state['dim_evolucao_caso'], dim_evolucao, 'descricao_evolucao', 'id_evolucao'
+    )
+
+    with etapa('transform:testes', linhas_entrada=len(data_por_notificacao)) as medida:
+        df_testes = process_testes_realizados(df_raw, linhas)
+        medida['linhas_saida'] = len(df_testes)
+
+    # A fato de testes é montada com as colunas já renomeadas, sem rename nem
+    # seleção (cada um copiaria a tabela inteira).
+    nomes_banco = {
+        'id_notificacao': 'fk_notificacao',
+        'codigo_tipo_teste': 'fk_tipo_teste',
+        'codigo_fabricante_teste': 'fk_fabricante',
+        'codigo_resultado_teste': 'fk_resultado_teste',
+    }
+    colunas_testes = {nomes_banco.get(col, col): df_testes[col] for col in df_testes.columns}
+    del df_testes
+    colunas_testes['data_notificacao'] = colunas_testes['fk_notificacao'].map(data_por_notificacao)
+    for col in ('codigo_estado_teste', 'fk_tipo_teste', 'fk_fabricante', 'fk_resultado_teste'):
+        if col in colunas_testes:
+            colunas_testes[col] = compact_code_column(colunas_testes[col])
+
+    colunas_banco_testes = [
+        'fk_notificacao',
+        'data_notificacao',
+        'data_coleta',
+        'codigo_estado_teste',
+        'fk_tipo_teste',
+        'fk_fabricante',
+        'fk_resultado_teste',
+    ]
+    df_fato_testes_realizados = pd.DataFrame(
+        {col: colunas_testes[col] for col in colunas_banco_testes if col in colunas_testes}, copy=False
+    )
+    del colunas_testes
 
     cols_map = {
         'dataNotificacao': 'data_notificacao',
@@ -271,37 +836,1069 @@ def run_etl_pipeline(file_path):
         'cbo': 'codigo_cbo',
         'codigoEstrategiaCovid': 'codigo_estrategia_covid'
     }
-    df_fato_notificacoes = df_fato_notificacoes.rename(columns=cols_map)
+    # A fato é montada só com as colunas que usa; as chaves naturais viram FKs
+    # pelo índice das dimensões e os códigos vão para o menor inteiro que os comporta.
+    df_clean = select_rows(df_raw, [
+        'id_notificacao', 'id_origem', 'hash_origem', 'sexo', 'idade',
+        'municipioIBGE', 'racaCor', 'evolucaoCaso', *cols_map
+    ], linhas)
+    del df_raw
+    colunas_fato = {cols_map.get(col, col): df_clean[col] for col in df_clean.columns}
+
+    colunas_fato['fk_localidade_residencia'] = resolve_dimension_keys(dim_state, 'dim_localidades', df_clean['municipioIBGE'])
+    colunas_fato['fk_raca_cor'] = resolve_dimension_keys(dim_state, 'dim_raca_cor', df_clean['racaCor'])
+    colunas_fato['fk_evolucao_caso'] = resolve_dimension_keys(dim_state, 'dim_evolucao_caso', df_clean['evolucaoCaso'])
+
+    # 'Sim' -> True; 'Não', nulo ou qualquer outro valor -> False
+    colunas_fato['profissional_saude'] = df_clean['profissionalSaude'] == 'Sim'
+    colunas_fato['profissional_seguranca'] = df_clean['profissionalSeguranca'] == 'Sim'
+
+    for col in ('codigo_recebeu_vacina', 'codigo_estrategia_covid'):
+        if col in colunas_fato:
+            colunas_fato[col] = compact_code_column(colunas_fato[col])
 
     final_columns = [
-        'nome_fabricante_vacina', 'id_notificacao', 'sexo', 'idade', 'profissional_saude', 'profissional_seguranca', 
-        'codigo_cbo', 'fk_raca_cor', 'fk_localidade_residencia', 
-        'fk_localidade_notificacao', 'fk_evolucao_caso', 'data_notificacao', 
-        'data_inicio_sintomas', 'data_encerramento', 'classificacao_final', 
-        'codigo_recebeu_vacina', 'codigo_doses_vacina', 'data_primeira_dose', 
+        'nome_fabricante_vacina', 'id_notificacao', 'id_origem', 'hash_origem', 'sexo', 'idade', 'profissional_saude', 'profissional_seguranca',
+        'codigo_cbo', 'fk_raca_cor', 'fk_localidade_residencia',
+        'fk_localidade_notificacao', 'fk_evolucao_caso', 'data_notificacao',
+        'data_inicio_sintomas', 'data_encerramento', 'classificacao_final',
+        'codigo_recebeu_vacina', 'codigo_doses_vacina', 'data_primeira_dose',
         'data_segunda_dose', 'codigo_estrategia_covid'
     ]
-    cols_to_load = [c for c in final_columns if c in df_fato_notificacoes.columns]
-    df_fato_notificacoes = df_fato_notificacoes[cols_to_load]
+    df_fato_notificacoes = pd.DataFrame(
+        {col: colunas_fato[col] for col in final_columns if col in colunas_fato}, copy=False
+    )
+    del colunas_fato
+
+    return {
+        'dim_localidades': dim_localidades,
+        'dim_sintomas': dim_sintomas,
+        'dim_condicoes': dim_condicoes,
+        'dim_raca_cor': dim_raca_cor,
+        'dim_evolucao_caso': dim_evolucao,
+        'fato_notificacoes': df_fato_notificacoes,
+        'fato_notificacao_sintoma': df_fato_sintoma,
+        'fato_notificacao_condicao': df_fato_condicao,
+        'fato_testes_realizados': df_fato_testes_realizados,
+    }
+
+"""
+    Converte colunas float (ou object com números) que só contêm inteiros, como as
+    FKs com nulos vindas de .map, para Int64. Assim o COPY escreve "3" e não "3.0"
+    em colunas INT. As demais colunas são reaproveitadas sem cópia, e o próprio
+    df volta quando nada precisa ser convertido.
+"""
+def coerce_integer_columns(df):
+    convertidas = {}
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object:
+            serie = serie.infer_objects()
+        if serie.dtype.kind == 'f':
+            valores = serie.dropna()
+            if (valores == np.floor(valores)).all():
+                convertidas[col] = serie.astype('Int64')
+    if not convertidas:
+        return df
+    return pd.DataFrame({col: convertidas.get(col, df[col]) for col in df.columns}, copy=False)
+
+"""
+    Carga via COPY FROM STDIN (PostgreSQL).
+    O DataFrame é serializado em CSV num buffer em memória, em lotes de
+    COPY_BATCH_ROWS linhas, para não duplicar a tabela inteira de uma vez.
+"""
+def copy_dataframe(cursor, df, table_name):
+    colunas = ', '.join(df.columns)
+    comando = f"COPY {table_name} ({colunas}) FROM STDIN WITH (FORMAT csv)"
+    total_bytes = 0
+    for inicio in range(0, len(df), COPY_BATCH_ROWS):
+        buffer = io.StringIO()
+        df.iloc[inicio:inicio + COPY_BATCH_ROWS].to_csv(buffer, index=False, header=False)
+        total_bytes += buffer.tell()
+        buffer.seek(0)
+        cursor.copy_expert(comando, buffer)
+    return total_bytes
+
+"""
+    Carga de uma tabela dentro da transação aberta em conn.
+    PostgreSQL usa COPY; outros bancos caem no to_sql padrão do pandas, também
+    em lotes de COPY_BATCH_ROWS linhas (o to_sql converte o DataFrame inteiro
+    para objetos Python antes de usar o próprio chunksize).
+    Retorna os bytes enviados pelo COPY (None no to_sql).
+"""
+def load_table(conn, df, table_name):
+    if conn.dialect.name == 'postgresql':
+        df = coerce_integer_columns(df)
+        with conn.connection.cursor() as cursor:
+            return copy_dataframe(cursor, df, table_name)
+    # Pelo menos um lote, para que o to_sql crie a tabela mesmo vazia.
+    for inicio in range(0, max(len(df), 1), COPY_BATCH_ROWS):
+        df.iloc[inicio:inicio + COPY_BATCH_ROWS].to_sql(table_name, conn, if_exists='append', index=False)
+    return None
+
+"""
+    Upsert de dimensão pela chave natural (modo incremental).
+    Os membros vão por COPY para uma tabela temporária e entram na dimensão com
+    INSERT ... ON CONFLICT, atualizando os atributos descritivos quando existirem.
+"""
+def upsert_dimension(conn, df, table_name):
+    key_col, id_col = DIM_NATURAL_KEYS[table_name]
+    staging = f"stg_{table_name}"
+    conn.exec_driver_sql(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    conn.exec_driver_sql(f"TRUNCATE {staging}")
+    total_bytes = load_table(conn, df, staging)
+
+    colunas = ', '.join(df.columns)
+    atributos = [c for c in df.columns if c not in (key_col, id_col)]
+    if atributos:
+        acao = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in atributos)
+    else:
+        acao = "DO NOTHING"
+    conn.exec_driver_sql(
+        f"INSERT INTO {table_name} ({colunas}) SELECT {colunas} FROM {staging} ON CONFLICT ({key_col}) {acao}"
+    )
+    return total_bytes
+
+"""
+    Carrega uma tabela fato nas tabelas de staging do mês (stg_<tabela>_AAAA_MM),
+    que depois viram partições via fn_trocar_particao_mes. Cada staging já nasce
+    com o CHECK do intervalo do mês, então o ATTACH dispensa a varredura de
+    validação. As linhas vão ordenadas por data para o índice BRIN ser efetivo.
+    Os meses tocados são acumulados em meses_particao.
+"""
+def stage_monthly_partitions(conn, df, table_name, meses_particao):
+    meses = df['data_notificacao'].to_numpy().astype('datetime64[M]')
+    total_bytes = 0
+    for mes in np.unique(meses):
+        inicio = pd.Timestamp(mes)
+        fim = inicio + pd.offsets.MonthBegin(1)
+        staging = f"stg_{table_name}_{inicio:%Y_%m}"
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {staging} (LIKE {table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+            f"CHECK (data_notificacao >= '{inicio:%Y-%m-%d}' AND data_notificacao < '{fim:%Y-%m-%d}'))"
+        )
+        df_mes = df[meses == mes].sort_values('data_notificacao', kind='stable')
+        total_bytes += load_table(conn, df_mes, staging) or 0
+        meses_particao.add(inicio)
+    return total_bytes
+
+"""
+    Garante as partições dos meses presentes no bloco (modo incremental, que
+    insere direto pelas tabelas pai).
+"""
+def ensure_month_partitions(conn, df_fato_notificacoes):
+    meses = np.unique(df_fato_notificacoes['data_notificacao'].to_numpy().astype('datetime64[M]'))
+    for mes in meses:
+        conn.exec_driver_sql("SELECT fn_criar_particao_mes(%s)", (pd.Timestamp(mes).date(),))
+
+"""
+    Carga das tabelas transformadas, respeitando LOAD_ORDER.
+    Acumula em load_stats (tabela -> [linhas, segundos]) para o relatório final.
+    Com upsert_dims=True as dimensões entram via ON CONFLICT na chave natural.
+    Com meses_particao (um set) as fatos vão para o staging mensal de partições.
+"""
+def load_tables(conn, tables, load_stats, upsert_dims=False, meses_particao=None):
+    for table_name in LOAD_ORDER:
+        df = tables[table_name]
+        if df.empty:
+            continue
+        inicio = time.perf_counter()
+        with etapa(f'load:{table_name}', linhas_entrada=len(df)) as medida:
+            if upsert_dims and table_name in DIM_NATURAL_KEYS:
+                medida['bytes'] = upsert_dimension(conn, df, table_name)
+            elif meses_particao is not None and table_name in TABELAS_FATO:
+                medida['bytes'] = stage_monthly_partitions(conn, df, table_name, meses_particao)
+            else:
+                medida['bytes'] = load_table(conn, df, table_name)
+            medida['linhas_saida'] = len(df)
+        stats = load_stats.setdefault(table_name, [0, 0.0])
+        stats[0] += len(df)
+        stats[1] += time.perf_counter() - inicio
+
+"""
+    Abre a transação única da carga. As FKs são declaradas DEFERRABLE no
+    create_tables.sql, então a verificação fica para o COMMIT.
+    A auditoria entra em modo lote só nesta transação: cada COPY/DELETE em
+    fato_notificacoes gera um registro-resumo em vez de um JSONB por linha.
+"""
+def begin_load(engine):
+    conn = engine.connect()
+    trans = conn.begin()
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql("SET CONSTRAINTS ALL DEFERRED")
+        conn.exec_driver_sql("SELECT set_config('auditoria.modo_lote', 'on', true)")
+    return conn, trans
+
+"""
+    Relatório de integridade da carga, montado com os acertos das regras de
+    imputação contados durante a transformação (sem nova leitura dos dados).
+    No modo incremental cobre só as notificações novas ou alteradas (e as
+    sem source_id, descartadas na seleção do delta).
+    Gravado num temporário e renomeado.
+"""
+def write_integrity_report(ctx, caminho, origem):
+    if caminho is None:
+        return
+    contagens = ctx['integridade']
+    total = contagens['linhas']
+    numero = lambda valor: f"{valor:,}".replace(',', '.')
+    linhas = [
+        "RELATÓRIO DE INTEGRIDADE DA CARGA",
+        f"Arquivo: {origem}",
+        f"Modo: {'incremental' if ctx['incremental'] else 'completa'}",
+        f"Gerado em: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+        f"Notificações transformadas: {numero(total)}",
+        "",
+        "REGRAS DE IMPUTAÇÃO E CORREÇÃO (registros afetados por regra)",
+    ]
+    regras = [(nome, coluna, descricao) for nome, coluna, _, _, descricao in REGRAS_IMPUTACAO]
+    if ctx['incremental']:
+        regras.append(DESCARTE_SEM_SOURCE_ID)
+    for nome, coluna, descricao in regras:
+        acertos = contagens['regras'].get(nome, 0)
+        percentual = 100 * acertos / total if total else 0.0
+        linhas += [f"- {descricao}: {numero(acertos)} ({percentual:.3f}%)", f"  Regra {nome}, coluna {coluna}."]
+
+    with etapa('relatorio_integridade', linhas_entrada=total) as medida:
+        medida['regras'] = contagens['regras']
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(linhas) + '\n')
+        os.replace(temporario, caminho)
+    print(f"Relatório de integridade gravado em {caminho}")
+
+def print_load_report(load_stats):
+    print("\nResumo da carga:")
+    for table_name in LOAD_ORDER:
+        if table_name not in load_stats:
+            continue
+        linhas, segundos = load_stats[table_name]
+        taxa = linhas / segundos if segundos > 0 else 0
+        print(f"  {table_name}: {linhas} linhas em {segundos:.2f}s ({taxa:,.0f} linhas/s)")
+
+
+"""
+    Assinatura de cada dimensão no banco: total de linhas e md5 dos pares
+    id=chave em ordem de id. Calculada no servidor, só trafega um hash por tabela.
+"""
+def dimension_signatures(conn):
+    consulta = " UNION ALL ".join(
+        f"SELECT '{table_name}', COUNT(*), "
+        f"md5(COALESCE(string_agg({id_col} || '=' || {key_col}, ',' ORDER BY {id_col}), '')) FROM {table_name}"
+        for table_name, (key_col, id_col) in DIM_NATURAL_KEYS.items()
+    )
+    return {table_name: [total, hash_] for table_name, total, hash_ in conn.exec_driver_sql(consulta)}
+
+"""
+    Mapa chave natural -> id de cada dimensão já carregada (modo incremental),
+    para que membros existentes mantenham seus ids e só os novos sejam inseridos.
+    Vem do snapshot local quando a assinatura gravada nele confere com a do
+    banco; senão as dimensões são lidas do banco.
+"""
+def load_dimension_state(conn, snapshot=None):
+    dim_state = new_dimension_state()
+    with etapa('carregar_dimensoes') as medida:
+        if snapshot is not None and os.path.exists(snapshot):
+            with open(snapshot, encoding='utf-8') as f:
+                salvo = json.load(f)
+            if salvo.get('assinaturas') == dimension_signatures(conn):
+                for table_name in DIM_NATURAL_KEYS:
+                    dim_state[table_name].update((chave, id_) for chave, id_ in salvo['dimensoes'][table_name])
+                medida['origem'] = 'snapshot'
+                medida['linhas_saida'] = sum(len(dim_state[t]) for t in DIM_NATURAL_KEYS)
+                return dim_state
+            print("Snapshot das dimensões desatualizado; lendo as dimensões do banco.")
+
+        for table_name, (key_col, id_col) in DIM_NATURAL_KEYS.items():
+            df = pd.read_sql(f"SELECT {key_col}, {id_col} FROM {table_name}", conn)
+            dim_state[table_name].update(zip(df[key_col], df[id_col]))
+        medida['origem'] = 'banco'
+        medida['linhas_saida'] = sum(len(dim_state[t]) for t in DIM_NATURAL_KEYS)
+    return dim_state
+
+"""
+    Grava o snapshot das dimensões depois do COMMIT, com a assinatura do banco
+    naquele momento. Se o estado da carga não tiver o mesmo número de membros
+    do banco, nada é gravado. O arquivo é escrito num temporário e renomeado.
+"""
+def save_dimension_snapshot(conn, ctx):
+    snapshot = ctx['snapshot_dimensoes']
+    if snapshot is None or conn.dialect.name != 'postgresql':
+        return
+    dim_state = ctx['dim_state']
+    assinaturas = dimension_signatures(conn)
+    if any(len(dim_state[table_name]) != total for table_name, (total, _) in assinaturas.items()):
+        return
+    conteudo = {
+        'assinaturas': assinaturas,
+        'dimensoes': {
+            table_name: [[chave.item() if isinstance(chave, np.generic) else chave, int(id_)]
+                         for chave, id_ in dim_state[table_name].items()]
+            for table_name in DIM_NATURAL_KEYS
+        },
+    }
+    os.makedirs(os.path.dirname(snapshot) or '.', exist_ok=True)
+    temporario = snapshot + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(conteudo, f, ensure_ascii=False)
+    os.replace(temporario, snapshot)
+
+def dimension_snapshot_path(staging_dir):
+    return os.path.join(staging_dir, ARQUIVO_SNAPSHOT_DIMENSOES) if staging_dir else None
+
+"""
+    Exporta o star schema recém-commitado para Parquet (backend duckdb do
+    dashboard, ver analitico.py). A carga já está no banco: uma falha aqui só é
+    informada, e o dashboard continua na geração exportada anterior.
+"""
+def export_analytics(engine, parquet_dir):
+    if parquet_dir is None or engine.dialect.name != 'postgresql':
+        return
+    try:
+        geracao = exportar_parquet(engine, parquet_dir)
+        print(f"Star schema exportado em Parquet: {parquet_dir} (geração {geracao}).")
+    except Exception as e:
+        print(f"\n ERRO na exportação para Parquet: {e}")
+
+"""
+    Contexto compartilhado pelos blocos de uma carga.
+    No PostgreSQL, ids e dimensões partem do que já está no banco (ou do
+    snapshot_dimensoes, se ainda confere com ele), nos dois modos: a carga
+    completa troca as partições dos meses do arquivo e mantém as dimensões,
+    então pode ser repetida sobre um banco já carregado. No modo incremental a
+    marca d'água (maior dataNotificacao das cargas anteriores) define o corte.
+    Em outros bancos a carga completa começa do zero (comportamento original).
+"""
+def prepare_load(conn, incremental=False, janela_dias=JANELA_INCREMENTAL_DIAS, snapshot_dimensoes=None):
+    ctx = {
+        'incremental': incremental,
+        'dim_state': new_dimension_state(),
+        'id_offset': 0,
+        'corte': None,
+        'data_maxima': None,
+        'novos': 0,
+        'alterados': 0,
+        'ignorados': 0,
+        'datas_afetadas': set(),
+        'meses_particao': None,
+        'snapshot_dimensoes': snapshot_dimensoes,
+        'integridade': new_integrity_counts(),
+    }
+    if conn.dialect.name != 'postgresql':
+        if incremental:
+            raise ValueError("O modo incremental requer PostgreSQL.")
+        return ctx
+
+    ctx['dim_state'] = load_dimension_state(conn, snapshot_dimensoes)
+    ctx['id_offset'] = conn.exec_driver_sql(
+        "SELECT COALESCE(MAX(id_notificacao), 0) FROM fato_notificacoes"
+    ).scalar()
+    if not incremental:
+        # Carga completa: as fatos entram mês a mês por troca de partição.
+        ctx['meses_particao'] = set()
+        return ctx
+    watermark = conn.exec_driver_sql(
+        "SELECT MAX(watermark_data_notificacao) FROM controle_carga"
+    ).scalar()
+    if watermark is not None:
+        ctx['corte'] = pd.Timestamp(watermark) - pd.Timedelta(days=janela_dias)
+        print(f"Marca d'água: {watermark} (comparando notificações a partir de {ctx['corte'].date()})")
+
+    conn.exec_driver_sql(
+        "CREATE TEMP TABLE stg_origem (id_origem VARCHAR(64), hash_origem BIGINT) ON COMMIT DROP"
+    )
+    return ctx
+
+"""
+    Atribui id_notificacao sequencial ao bloco (modo completo), a partir de
+    ctx['id_offset'].
+"""
+def assign_notification_ids(df_raw, ctx):
+    df_raw['id_notificacao'] = np.arange(ctx['id_offset'] + 1, ctx['id_offset'] + len(df_raw) + 1)
+    ctx['id_offset'] += len(df_raw)
+    ctx['novos'] += len(df_raw)
+    return df_raw
+
+"""
+    Seleciona o delta de um bloco no modo incremental.
+    Linhas anteriores ao corte são ignoradas sem consulta ao banco; as sem
+    id_origem (source_id) também, e entram no relatório de integridade. As demais têm
+    o hash_origem comparado com o já carregado para o mesmo id_origem:
+    - novas recebem ids a partir do maior id_notificacao;
+    - alteradas mantêm o id e a versão antiga é removida (o ON DELETE CASCADE
+      limpa sintomas, condições e testes), sendo reinserida em seguida;
+    - inalteradas são descartadas.
+"""
+def select_incremental_delta(conn, df_raw, ctx):
+    total_bloco = len(df_raw)
+    # Sem dataNotificacao a linha seria descartada na transformação de qualquer forma.
+    mascara = df_raw['dataNotificacao'].notna()
+    if ctx['corte'] is not None:
+        mascara &= df_raw['dataNotificacao'] >= ctx['corte']
+    # As sem id_origem não chegam à transformação: são contadas aqui no relatório de integridade.
+    sem_origem = int((mascara & df_raw['id_origem'].isna()).sum())
+    merge_integrity_counts(ctx['integridade'], {'linhas': sem_origem, 'regras': {DESCARTE_SEM_SOURCE_ID[0]: sem_origem}})
+    mascara &= df_raw['id_origem'].notna()
+    df_raw = df_raw[mascara].drop_duplicates(subset=['id_origem'], keep='last')
+
+    conn.exec_driver_sql("TRUNCATE stg_origem")
+    load_table(conn, df_raw[['id_origem', 'hash_origem']], 'stg_origem')
+    existentes = pd.read_sql(
+        "SELECT s.id_origem, f.id_notificacao, f.hash_origem "
+        "FROM stg_origem s JOIN fato_notificacoes f ON f.id_origem = s.id_origem",
+        conn, dtype={'id_notificacao': 'Int64', 'hash_origem': 'Int64'}
+    ).set_index('id_origem')
+
+    id_existente = df_raw['id_origem'].map(existentes['id_notificacao'])
+    hash_existente = df_raw['id_origem'].map(existentes['hash_origem'])
+    novo = id_existente.isna()
+    alterado = ~novo & hash_existente.ne(df_raw['hash_origem']).fillna(True)
+
+    if alterado.any():
+        # As datas da versão antiga também precisam ter os resumos recalculados.
+        removidas = conn.exec_driver_sql(
+            "DELETE FROM fato_notificacoes f USING stg_origem s "
+            "WHERE f.id_origem = s.id_origem AND f.hash_origem IS DISTINCT FROM s.hash_origem "
+            "RETURNING f.data_notificacao"
+        )
+        ctx['datas_afetadas'].update(data for (data,) in removidas)
+
+    selecionados = novo | alterado
+    df_delta = df_raw[selecionados].copy()
+    ids = id_existente[selecionados].to_numpy(dtype='int64', na_value=0)
+    novos_no_delta = novo[selecionados].to_numpy()
+    total_novos = int(novos_no_delta.sum())
+    ids[novos_no_delta] = np.arange(ctx['id_offset'] + 1, ctx['id_offset'] + total_novos + 1)
+    df_delta['id_notificacao'] = ids.astype('int64')
+
+    ctx['id_offset'] += total_novos
+    ctx['novos'] += total_novos
+    ctx['alterados'] += int(alterado.sum())
+    ctx['ignorados'] += total_bloco - len(df_delta)
+    return df_delta
+
+"""
+    Transforma um bloco dentro da transação (ou o arquivo inteiro, sem conn,
+    em transform_full_file) e devolve as tabelas para load_block (None se o
+    delta incremental vier vazio). O
+    chamador descarta df_raw antes da carga, que roda só com as tabelas.
+    Na carga completa as tabelas transformadas vão para o staging antes do LOAD,
+    de modo que uma falha no banco possa ser repetida sem transformar de novo.
+"""
+def transform_block(conn, df_raw, ctx, staging=None):
+    data_maxima = df_raw['dataNotificacao'].max()
+    if pd.notna(data_maxima) and (ctx['data_maxima'] is None or data_maxima > ctx['data_maxima']):
+        ctx['data_maxima'] = data_maxima
+
+    if ctx['incremental']:
+        with etapa('delta_incremental', linhas_entrada=len(df_raw)) as medida:
+            df_raw = select_incremental_delta(conn, df_raw, ctx)
+            medida['linhas_saida'] = len(df_raw)
+        if df_raw.empty:
+            return None
+    else:
+        df_raw = assign_notification_ids(df_raw, ctx)
+
+    with etapa('transform', linhas_entrada=len(df_raw)) as medida:
+        tables = transform_notificacoes(df_raw, ctx['dim_state'], ctx['integridade'])
+        medida['linhas_saida'] = len(tables['fato_notificacoes'])
+    del df_raw
+    if ctx['incremental']:
+        ctx['datas_afetadas'].update(tables['fato_notificacoes']['data_notificacao'].dt.date.unique())
+        ensure_month_partitions(conn, tables['fato_notificacoes'])
+    else:
+        write_staged_tables(staging, tables, ctx)
+    return tables
+
+def load_block(conn, tables, ctx, load_stats):
+    if tables is not None:
+        load_tables(conn, tables, load_stats, upsert_dims=conn.dialect.name == 'postgresql',
+                    meses_particao=ctx['meses_particao'])
+
+"""
+    Recalcula as tabelas de resumo que alimentam as views vw_* do dashboard.
+    A carga completa reconstrói tudo; a incremental só as datas de notificação
+    inseridas ou removidas nesta execução.
+"""
+def refresh_summaries(conn, ctx):
+    inicio = time.perf_counter()
+    if ctx['incremental']:
+        datas = sorted(ctx['datas_afetadas'])
+        if not datas:
+            return
+        with etapa('atualizar_resumos', linhas_entrada=len(datas)):
+            conn.exec_driver_sql("SELECT fn_atualizar_resumos(%s::date[])", (datas,))
+        descricao = f"{len(datas)} datas"
+    else:
+        with etapa('atualizar_resumos'):
+            conn.exec_driver_sql("SELECT fn_atualizar_resumos(NULL)")
+        descricao = "todas as datas"
+    print(f"\nResumos do dashboard atualizados ({descricao}) em {time.perf_counter() - inicio:.2f}s.")
+
+"""
+    Datas de referência dos indicadores afetadas pelas datas de notificação
+    tocadas na carga: cada data entra nas janelas móveis dos dias seguintes.
+    novas_datas (datas que passaram a caber no limite) entram direto na saída.
+    Retorna também as datas que essas janelas precisam ler.
+"""
+def indicator_dates(datas_afetadas, novas_datas=()):
+    maior_janela = max(JANELAS_POSITIVIDADE)
+    datas = np.unique(np.array(sorted(datas_afetadas), dtype='datetime64[D]'))
+    saida = np.union1d((datas[:, None] + np.arange(maior_janela)).ravel(),
+                       np.asarray(novas_datas, dtype='datetime64[D]'))
+    entrada = np.unique((saida[:, None] - np.arange(maior_janela)).ravel())
+    return saida, entrada
+
+"""
+    Positividade diária e móvel por município a partir das contagens diárias
+    (fk_localidade, data_referencia, total_testes, total_positivos).
+    Cada dia com teste gera uma linha para ele e para os dias seguintes dentro
+    da maior janela; as janelas são somas móveis por município (groupby +
+    rolling por tempo), então dias sem teste no meio contam como zero. Assim
+    existe linha sempre que a maior janela tem teste, e somar os totais de
+    vários municípios dá o indicador da UF. Taxas sem teste na janela ficam nulas.
+    datas_referencia (None = todas) e data_limite recortam a saída.
+"""
+def compute_positivity(df_diario, datas_referencia=None, data_limite=None):
+    maior_janela = max(JANELAS_POSITIVIDADE)
+    dias = df_diario['data_referencia'].to_numpy(dtype='datetime64[D]')
+    grade = pd.DataFrame({
+        'fk_localidade': np.repeat(df_diario['fk_localidade'].to_numpy(), maior_janela),
+        'data_referencia': (dias[:, None] + np.arange(maior_janela)).ravel().astype('datetime64[ns]'),
+    }).drop_duplicates()
+    diario = df_diario.assign(data_referencia=dias.astype('datetime64[ns]'))
+    grade = grade.merge(diario, on=['fk_localidade', 'data_referencia'], how='left')
+    grade = grade.fillna({'total_testes': 0, 'total_positivos': 0})
+    grade = grade.sort_values(['fk_localidade', 'data_referencia'], ignore_index=True)
+
+    totais = ['total_testes', 'total_positivos']
+    grupos = grade.groupby('fk_localidade', sort=True)
+    for janela in JANELAS_POSITIVIDADE:
+        # A grade está ordenada por município e data, a mesma ordem da saída do groupby.
+        moveis = grupos.rolling(f'{janela}D', on='data_referencia')[totais].sum()
+        grade[f'total_testes_{janela}d'] = moveis['total_testes'].to_numpy()
+        grade[f'total_positivos_{janela}d'] = moveis['total_positivos'].to_numpy()
+
+    if datas_referencia is not None:
+        grade = grade[grade['data_referencia'].isin(pd.DatetimeIndex(datas_referencia))]
+    if data_limite is not None:
+        grade = grade[grade['data_referencia'] <= pd.Timestamp(data_limite)]
+
+    colunas = {'fk_localidade': grade['fk_localidade'], 'data_referencia': grade['data_referencia'].dt.date}
+    for sufixo in ['', *(f'_{janela}d' for janela in JANELAS_POSITIVIDADE)]:
+        testes = grade[f'total_testes{sufixo}'].to_numpy(dtype=np.int64)
+        positivos = grade[f'total_positivos{sufixo}'].to_numpy(dtype=np.int64)
+        # O arredondamento fica com a coluna NUMERIC(5, 2) do banco.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            colunas[f'taxa_positividade{sufixo}'] = np.where(testes > 0, 100 * positivos / testes, np.nan)
+        colunas[f'total_testes{sufixo}'] = testes
+        colunas[f'total_positivos{sufixo}'] = positivos
+    return pd.DataFrame(colunas)
+
+"""
+    Atualiza indicadores_municipais. A carga completa recalcula tudo; a
+    incremental só as datas de referência cujas janelas contêm uma data de
+    notificação tocada. As contagens diárias vêm agregadas do banco (elas
+    incluem o que já estava carregado), o cálculo das janelas é feito em pandas
+    e o resultado entra por upsert em (fk_localidade, data_referencia). Linhas
+    dessas datas que deixaram de ter teste na janela são removidas.
+"""
+def refresh_indicators(conn, ctx):
+    inicio = time.perf_counter()
+    # Os indicadores não passam da última data de notificação carregada. Quando
+    # o limite avança, as datas entre o anterior e o novo também são calculadas.
+    data_anterior = conn.exec_driver_sql("SELECT MAX(watermark_data_notificacao) FROM controle_carga").scalar()
+    data_limite = data_anterior
+    if ctx['data_maxima'] is not None and (data_limite is None or ctx['data_maxima'].date() > data_limite):
+        data_limite = ctx['data_maxima'].date()
+
+    datas_saida = filtro_fato = filtro_indicador = None
+    params = {}
+    if ctx['incremental']:
+        if not ctx['datas_afetadas']:
+            return
+        novas_datas = ()
+        if data_anterior is not None and data_limite > data_anterior:
+            novas_datas = np.arange(np.datetime64(data_anterior, 'D') + 1, np.datetime64(data_limite, 'D') + 1)
+        datas_saida, datas_entrada = indicator_dates(ctx['datas_afetadas'], novas_datas)
+        params = {'entrada': [d.item() for d in datas_entrada], 'saida': [d.item() for d in datas_saida]}
+        filtro_fato = "AND ftr.data_notificacao = ANY(%(entrada)s::date[])"
+        filtro_indicador = "AND i.data_referencia = ANY(%(saida)s::date[])"
+
+    with etapa('atualizar_indicadores', linhas_entrada=len(datas_saida) if datas_saida is not None else None) as medida:
+        df_diario = pd.read_sql(
+            "SELECT fn.fk_localidade_residencia AS fk_localidade, fn.data_notificacao AS data_referencia, "
+            "COUNT(*) AS total_testes, "
+            f"COUNT(*) FILTER (WHERE ftr.fk_resultado_teste = {RESULTADO_POSITIVO}) AS total_positivos "
+            "FROM fato_testes_realizados ftr "
+            "JOIN fato_notificacoes fn ON fn.id_notificacao = ftr.fk_notificacao "
+            "AND fn.data_notificacao = ftr.data_notificacao "
+            "WHERE ftr.fk_resultado_teste IS NOT NULL AND fn.fk_localidade_residencia IS NOT NULL "
+            f"{filtro_fato or ''} GROUP BY 1, 2",
+            conn, params=params
+        )
+        df_indicadores = compute_positivity(df_diario, datas_saida, data_limite)
+
+        colunas = ', '.join(df_indicadores.columns)
+        conn.exec_driver_sql(
+            f"CREATE TEMP TABLE IF NOT EXISTS stg_indicadores_municipais ON COMMIT DROP AS "
+            f"SELECT {colunas} FROM indicadores_municipais WITH NO DATA"
+        )
+        conn.exec_driver_sql("TRUNCATE stg_indicadores_municipais")
+        medida['bytes'] = load_table(conn, df_indicadores, 'stg_indicadores_municipais')
+        conn.exec_driver_sql(
+            "DELETE FROM indicadores_municipais i WHERE NOT EXISTS ("
+            "SELECT 1 FROM stg_indicadores_municipais s "
+            "WHERE s.fk_localidade = i.fk_localidade AND s.data_referencia = i.data_referencia) "
+            f"{filtro_indicador or ''}",
+            params
+        )
+        atualizar = ', '.join(f"{c} = EXCLUDED.{c}" for c in df_indicadores.columns[2:])
+        conn.exec_driver_sql(
+            f"INSERT INTO indicadores_municipais ({colunas}) SELECT {colunas} FROM stg_indicadores_municipais "
+            f"ON CONFLICT (fk_localidade, data_referencia) DO UPDATE SET {atualizar}"
+        )
+        medida['linhas_saida'] = len(df_indicadores)
+    print(f"Indicadores municipais de positividade atualizados ({len(df_indicadores)} linhas) "
+          f"em {time.perf_counter() - inicio:.2f}s.")
+
+"""
+    Anexa as partições mensais preparadas na carga completa, atualiza os resumos
+    e os indicadores de positividade e registra a carga em controle_carga; a maior data_notificacao vira a marca
+    d'água usada pela próxima execução incremental. O novo id_carga é também a
+    geração da carga, que invalida o cache de consultas do dashboard no COMMIT.
+"""
+def finish_load(conn, ctx, file_path):
+    if conn.dialect.name != 'postgresql':
+        return
+    if ctx['meses_particao']:
+        inicio = time.perf_counter()
+        with etapa('trocar_particoes', linhas_entrada=len(ctx['meses_particao'])):
+            for mes in sorted(ctx['meses_particao']):
+                conn.exec_driver_sql("SELECT fn_trocar_particao_mes(%s)", (mes.date(),))
+        print(f"\n{len(ctx['meses_particao'])} partições mensais anexadas em {time.perf_counter() - inicio:.2f}s.")
+    refresh_summaries(conn, ctx)
+    refresh_indicators(conn, ctx)
+    data_maxima = ctx['data_maxima'].date() if ctx['data_maxima'] is not None else None
+    conn.exec_driver_sql(
+        "INSERT INTO controle_carga (arquivo, modo, watermark_data_notificacao, "
+        "total_novos, total_alterados, total_ignorados) VALUES (%s, %s, %s, %s, %s, %s)",
+        (os.path.basename(file_path), 'incremental' if ctx['incremental'] else 'completa',
+         data_maxima, ctx['novos'], ctx['alterados'], ctx['ignorados'])
+    )
+    if ctx['incremental']:
+        print(f"\nIncremental: {ctx['novos']} novas, {ctx['alterados']} alteradas, "
+              f"{ctx['ignorados']} inalteradas/fora da janela.")
+
+
+"""
+    STAGING EM PARQUET
+    Cada estágio grava sua saída sob uma chave derivada do conteúdo do CSV e do
+    código que a produziu. Uma nova execução reaproveita o estágio cuja chave não
+    mudou: alterar só a carga (ou repetir após um erro no banco) não relê o CSV
+    nem refaz a transformação.
+"""
+# Código e configuração que definem cada estágio; mudar qualquer um invalida o cache.
+# Cada lista cobre tudo o que os seus itens chamam (tests/test_staging.py confere).
+CODIGO_EXTRACAO = [
+    'build_read_options', 'parse_date_column', 'initial_transform', 'select_rows',
+    'COLUNAS_DESCARTADAS', 'ESUS_DTYPES', 'ESUS_COLUNAS_DATA', 'FORMATOS_DATA',
+]
+CODIGO_TRANSFORMACAO = [
+    'transform_block', 'transform_notificacoes', 'intelligent_null_imputation',
+    'new_integrity_counts', 'merge_integrity_counts', 'coerce_integer_columns',
+    'REGRAS_IMPUTACAO', 'compile_imputation_rules', 'apply_imputation_rules', 'column_values', 'null_mask',
+    'encode_multivalued_data', 'register_dimension_members', 'new_dimension_state',
+    'dimension_index', 'resolve_dimension_keys',
+    'process_localidades', 'process_testes_realizados', 'assign_notification_ids', 'transform_full_file',
+    'select_rows', 'compact_code_column', 'to_nullable_int', 'TEST_METRICS', 'COLUNAS_LOCALIDADES',
+]
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+def code_version(nomes):
+    digest = hashlib.sha256()
+    for nome in nomes:
+        objeto = globals()[nome]
+        digest.update((inspect.getsource(objeto) if callable(objeto) else repr(objeto)).encode())
+    return digest.hexdigest()
+
+"""
+    Calcula os caminhos do staging para um arquivo de entrada.
+    Retorna None (staging desativado) sem diretório, sem pyarrow ou se o arquivo
+    não existir; nesse último caso a extração reporta o erro normalmente.
+"""
+def open_staging(file_path, staging_dir):
+    if staging_dir is None:
+        return None
+    if pa is None:
+        print("pyarrow não instalado; staging em Parquet desativado.")
+        return None
+    try:
+        chave_arquivo = file_digest(file_path)
+    except FileNotFoundError:
+        return None
+
+    chave_extracao = hashlib.sha256((chave_arquivo + code_version(CODIGO_EXTRACAO)).encode()).hexdigest()[:16]
+    chave_transformacao = hashlib.sha256((chave_extracao + code_version(CODIGO_TRANSFORMACAO)).encode()).hexdigest()[:16]
+    os.makedirs(staging_dir, exist_ok=True)
+    return {
+        'extracao': os.path.join(staging_dir, f"extracao-{chave_extracao}.parquet"),
+        'transformacao': os.path.join(staging_dir, f"transformacao-{chave_transformacao}"),
+    }
+
+def read_staged_extraction(staging):
+    if staging is None or not os.path.exists(staging['extracao']):
+        return None
+    print(f"Extração reaproveitada do staging: {staging['extracao']}")
+    with etapa('staging:leitura_extracao') as medida:
+        df = pd.read_parquet(staging['extracao'])
+        medida['linhas_saida'] = len(df)
+        medida['bytes'] = os.path.getsize(staging['extracao'])
+    return df
+
+"""
+    Grava em arquivo temporário e renomeia, para que uma execução interrompida
+    nunca deixe um Parquet incompleto com a chave final.
+"""
+def write_staged_extraction(staging, df):
+    if staging is None:
+        return
+    temporario = staging['extracao'] + '.tmp'
+    with etapa('staging:gravacao_extracao', linhas_entrada=len(df)) as medida:
+        df.to_parquet(temporario, index=False)
+        medida['bytes'] = os.path.getsize(temporario)
+    os.replace(temporario, staging['extracao'])
+
+"""
+    Lê as tabelas transformadas e o resumo da carga (novos, maior data, acertos
+    das regras de imputação) gravados por write_staged_tables. Retorna None se o estágio ainda não existir.
+"""
+def read_staged_tables(staging):
+    if staging is None or not os.path.isdir(staging['transformacao']):
+        return None
+    print(f"Transformação reaproveitada do staging: {staging['transformacao']}")
+    with open(os.path.join(staging['transformacao'], 'manifesto.json')) as f:
+        manifesto = json.load(f)
+    with etapa('staging:leitura_transformacao') as medida:
+        tables = {
+            table_name: pd.read_parquet(os.path.join(staging['transformacao'], f"{table_name}.parquet"))
+            for table_name in LOAD_ORDER
+        }
+        medida['linhas_saida'] = sum(len(df) for df in tables.values())
+    resumo = {
+        'novos': manifesto['novos'],
+        'data_maxima': pd.Timestamp(manifesto['data_maxima']) if manifesto['data_maxima'] else None,
+        'integridade': manifesto['integridade'],
+    }
+    return tables, resumo
+
+def write_staged_tables(staging, tables, ctx):
+    if staging is None:
+        return
+    temporario = staging['transformacao'] + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    with etapa('staging:gravacao_transformacao',
+               linhas_entrada=sum(len(tables[t]) for t in LOAD_ORDER)):
+        for table_name in LOAD_ORDER:
+            tables[table_name].to_parquet(os.path.join(temporario, f"{table_name}.parquet"), index=False)
+    with open(os.path.join(temporario, 'manifesto.json'), 'w') as f:
+        json.dump({
+            'novos': ctx['novos'],
+            'data_maxima': ctx['data_maxima'].isoformat() if ctx['data_maxima'] is not None else None,
+            'integridade': ctx['integridade'],
+        }, f)
+    os.replace(temporario, staging['transformacao'])
+
+
+"""
+    PIPELINE PRINCIPAL
+    chunk_size=None processa o arquivo inteiro em memória (comportamento original);
+    com chunk_size o arquivo é lido e carregado bloco a bloco (modo streaming).
+    incremental=True carrega apenas notificações novas ou alteradas desde a
+    última carga, com upsert das dimensões. leitor escolhe o engine do read_csv
+    ('c' ou 'pyarrow') na leitura completa. staging_dir guarda extração e
+    transformação em Parquet e o snapshot das dimensões para as próximas
+    execuções (None desativa). Com parquet_dir, o star schema é exportado para
+    Parquet depois do COMMIT. integrity_report é o caminho do relatório de
+    integridade da carga (None não grava).
+"""
+def run_etl_pipeline(file_path, chunk_size=None, incremental=False, janela_dias=JANELA_INCREMENTAL_DIAS,
+                     leitor=LEITOR_CSV_PADRAO, staging_dir=STAGING_DIR_PADRAO, parquet_dir=None,
+                     integrity_report=None):
+    if chunk_size:
+        return run_etl_pipeline_streaming(file_path, chunk_size, incremental, janela_dias, staging_dir,
+                                          parquet_dir, integrity_report)
+
+    staging = open_staging(file_path, staging_dir)
+    # A transformação do modo incremental depende do banco e não é reaproveitada.
+    transformadas = None if incremental else read_staged_tables(staging)
+
+    df_raw = None
+    if transformadas is None:
+        df_raw = read_staged_extraction(staging)
+        if df_raw is None:
+            df_raw = extract_and_initial_transform(file_path, leitor)
+            if df_raw is None: return
+            write_staged_extraction(staging, df_raw)
+        if not incremental:
+            transformadas = transform_full_file(df_raw, staging)
+            df_raw = None
 
     try:
         engine = create_engine(DATABASE_URL)
         print("\nConexão com o banco de dados estabelecida.")
         print("Iniciando Carga...")
-        
-        dim_localidades.to_sql('dim_localidades', engine, if_exists='append', index=False)
-        dim_sintomas.to_sql('dim_sintomas', engine, if_exists='append', index=False)
-        dim_condicoes.to_sql('dim_condicoes', engine, if_exists='append', index=False)
-        dim_raca_cor.to_sql('dim_raca_cor', engine, if_exists='append', index=False)
-        dim_evolucao.to_sql('dim_evolucao_caso', engine, if_exists='append', index=False)
-        
-        df_fato_notificacoes.to_sql('fato_notificacoes', engine, if_exists='append', index=False)
-        df_fato_sintoma.to_sql('fato_notificacao_sintoma', engine, if_exists='append', index=False)
-        df_fato_condicao.to_sql('fato_notificacao_condicao', engine, if_exists='append', index=False)
-        
-        df_fato_testes_realizados.to_sql('fato_testes_realizados', engine, if_exists='append', index=False)
-        
+
+        load_stats = {}
+        conn, trans = begin_load(engine)
+        try:
+            ctx = prepare_load(conn, incremental, janela_dias, dimension_snapshot_path(staging_dir))
+            if transformadas is not None:
+                tables = reconcile_with_load(*transformadas, ctx)
+            else:
+                tables = transform_block(conn, df_raw, ctx)
+                del df_raw
+            del transformadas
+            load_block(conn, tables, ctx, load_stats)
+            del tables
+            finish_load(conn, ctx, file_path)
+            with etapa('commit'):
+                trans.commit()
+            save_dimension_snapshot(conn, ctx)
+            write_integrity_report(ctx, integrity_report, os.path.basename(file_path))
+        finally:
+            conn.close()
+
+        export_analytics(engine, parquet_dir)
         engine.dispose()
+        print_load_report(load_stats)
+        print("\n Pipeline ETL concluído com sucesso!")
+
+    except Exception as e:
+        print(f"\n ERRO na Carga de Dados (LOAD): {e}")
+
+"""
+    PIPELINE EM MODO STREAMING
+    Cada bloco passa por imputação, explosão de sintomas/condições, unpivot dos
+    testes e carga antes do próximo ser lido. As dimensões são acumuladas no
+    contexto da carga e o id_notificacao continua de um bloco para o outro.
+    Obs.: a mediana usada na imputação de idade é calculada por bloco.
+"""
+def run_etl_pipeline_streaming(file_path, chunk_size=CHUNK_SIZE_PADRAO, incremental=False,
+                               janela_dias=JANELA_INCREMENTAL_DIAS, staging_dir=STAGING_DIR_PADRAO, parquet_dir=None,
+                               integrity_report=None):
+    chunks = extract_in_chunks(file_path, chunk_size)
+    if chunks is None: return
+
+    total_registros = 0
+
+    try:
+        engine = create_engine(DATABASE_URL)
+        print("\nConexão com o banco de dados estabelecida.")
+        print("Iniciando Carga em blocos...")
+
+        load_stats = {}
+        conn, trans = begin_load(engine)
+        try:
+            ctx = prepare_load(conn, incremental, janela_dias, dimension_snapshot_path(staging_dir))
+            for numero_bloco, df_chunk in enumerate(chunks, start=1):
+                registros_bloco = len(df_chunk)
+                print(f"\nBloco {numero_bloco}: {registros_bloco} registros lidos.")
+                total_registros += registros_bloco
+
+                tables = transform_block(conn, df_chunk, ctx)
+                del df_chunk
+                load_block(conn, tables, ctx, load_stats)
+                del tables
+
+            finish_load(conn, ctx, file_path)
+            with etapa('commit'):
+                trans.commit()
+            save_dimension_snapshot(conn, ctx)
+            write_integrity_report(ctx, integrity_report, os.path.basename(file_path))
+        finally:
+            conn.close()
+
+        export_analytics(engine, parquet_dir)
+        engine.dispose()
+        print(f"\nRegistros lidos: {total_registros}")
+        print_load_report(load_stats)
+        print("\n Pipeline ETL concluído com sucesso!")
+
+    except Exception as e:
+        print(f"\n ERRO na Carga de Dados (LOAD): {e}")
+
+"""
+    Worker da carga multiarquivo: extrai e transforma um arquivo (uma UF) com
+    dimensões e ids locais, começando em 1. Roda em outro processo, sem banco.
+    Retorna as tabelas, o total de linhas lidas, a maior data de notificação e
+    os acertos das regras de imputação.
+"""
+def transform_file(file_path, leitor=LEITOR_CSV_PADRAO):
+    df_raw = extract_and_initial_transform(file_path, leitor)
+    if df_raw is None:
+        raise FileNotFoundError(file_path)
+    total_linhas = len(df_raw)
+    data_maxima = df_raw['dataNotificacao'].max()
+    df_raw['id_notificacao'] = np.arange(1, total_linhas + 1)
+    contagens = new_integrity_counts()
+    tables = transform_notificacoes(df_raw, new_dimension_state(), contagens)
+    return tables, total_linhas, data_maxima, contagens
+
+"""
+    Junta a mesma tabela dos vários workers. As partes vazias (um arquivo sem
+    membros novos da dimensão, por exemplo) ficam de fora, para que os dtypes
+    do resultado venham só das partes com linhas, e não de qual arquivo voltou
+    vazio. Se todas forem vazias, fica a primeira.
+"""
+def concat_worker_tables(partes):
+    com_linhas = [parte for parte in partes if len(parte)]
+    if not com_linhas:
+        return partes[0].reset_index(drop=True)
+    return pd.concat(com_linhas, ignore_index=True)
+
+"""
+    Converte as tabelas de um worker para as chaves globais.
+    Cada dimensão local entra no mapa global (chave natural -> id) com
+    register_dimension_members; um array indexado pelo id local dá o id global,
+    e as FKs das fatos são trocadas por indexação NumPy, sem merge.
+    id_notificacao é deslocado por id_offset.
+"""
+def reconcile_worker_tables(tables, dim_state, id_offset):
+    for dim_table, (key_col, id_col) in DIM_NATURAL_KEYS.items():
+        dim_local = tables[dim_table]
+        tables[dim_table] = register_dimension_members(
+            dim_state[dim_table], dim_local.drop(columns=[id_col]), key_col, id_col
+        )
+
+        ids_locais = dim_local[id_col].to_numpy(dtype=np.int64)
+        remap = np.zeros(ids_locais.max(initial=0) + 1, dtype=np.int64)
+        remap[ids_locais] = dim_local[key_col].map(dim_state[dim_table]).to_numpy(dtype=np.int64)
+
+        for fact_table, fk_col in DIM_FK_COLUMNS[dim_table]:
+            fk = tables[fact_table][fk_col]
+            nulo = fk.isna().to_numpy()
+            ids_globais = remap[fk.to_numpy(dtype=np.int64, na_value=0)]
+            if nulo.any():
+                tables[fact_table][fk_col] = pd.arrays.IntegerArray(ids_globais, nulo)
+            else:
+                tables[fact_table][fk_col] = ids_globais
+
+    tables['fato_notificacoes']['id_notificacao'] += id_offset
+    for fact_table in TABELAS_FATO[1:]:
+        tables[fact_table]['fk_notificacao'] += id_offset
+    return tables
+
+"""
+    Transformação completa de um arquivo sem depender do banco: ids e
+    dimensões locais, a partir de 1, como nos workers do multiarquivo. O
+    resultado vai para o staging e continua valendo depois de outras cargas,
+    já que as chaves do banco só entram em reconcile_with_load.
+    Retorna (tabelas, resumo), no formato de read_staged_tables.
+"""
+def transform_full_file(df_raw, staging=None):
+    ctx = {
+        'incremental': False,
+        'dim_state': new_dimension_state(),
+        'id_offset': 0,
+        'data_maxima': None,
+        'novos': 0,
+        'integridade': new_integrity_counts(),
+    }
+    tables = transform_block(None, df_raw, ctx, staging)
+    return tables, {'novos': ctx['novos'], 'data_maxima': ctx['data_maxima'], 'integridade': ctx['integridade']}
+
+"""
+    Leva tabelas com ids e dimensões locais (transform_full_file ou
+    multiarquivo) para as chaves da carga: as dimensões entram em
+    ctx['dim_state'], os ids continuam de ctx['id_offset'] e o resumo
+    (novos, maior data, acertos das regras) é somado ao contexto.
+"""
+def reconcile_with_load(tables, resumo, ctx):
+    reconcile_worker_tables(tables, ctx['dim_state'], ctx['id_offset'])
+    ctx['id_offset'] += resumo['novos']
+    ctx['novos'] += resumo['novos']
+    data_maxima = resumo['data_maxima']
+    if data_maxima is not None and (ctx['data_maxima'] is None or data_maxima > ctx['data_maxima']):
+        ctx['data_maxima'] = data_maxima
+    merge_integrity_counts(ctx['integridade'], resumo['integridade'])
+    return tables
+
+"""
+    PIPELINE MULTIARQUIVO (uma extração por UF)
+    Os arquivos são transformados em paralelo num pool de processos; o
+    coordenador reconcilia dimensões e ids na ordem dos arquivos (id_notificacao
+    continua de um arquivo para o outro), leva o resultado para as chaves do
+    banco com reconcile_with_load e faz uma única carga completa.
+    Obs.: a mediana usada na imputação de idade é calculada por arquivo.
+"""
+def run_etl_pipeline_multiarquivo(file_paths, workers=None, leitor=LEITOR_CSV_PADRAO, staging_dir=STAGING_DIR_PADRAO,
+                                  parquet_dir=None, integrity_report=None):
+    print(f"Transformando {len(file_paths)} arquivos em paralelo ({workers or os.cpu_count()} processos)...")
+    dim_state = new_dimension_state()
+    resumo = {'novos': 0, 'data_maxima': None, 'integridade': new_integrity_counts()}
+    partes = []
+    with etapa('transform_paralelo', arquivos=len(file_paths)) as medida, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [pool.submit(transform_file, file_path, leitor) for file_path in file_paths]
+        for file_path, futuro in zip(file_paths, futuros):
+            # Um arquivo com erro interrompe a carga: os que ainda não começaram são cancelados.
+            try:
+                tables, total_linhas, data_maxima, contagens = futuro.result()
+            except FileNotFoundError:
+                print(f"ERRO: Arquivo não encontrado em {file_path}")
+            except Exception as e:
+                print(f"\n ERRO na Transformação de {file_path}: {e}")
+            else:
+                partes.append(reconcile_worker_tables(tables, dim_state, resumo['novos']))
+                resumo['novos'] += total_linhas
+                merge_integrity_counts(resumo['integridade'], contagens)
+                if pd.notna(data_maxima) and (resumo['data_maxima'] is None or data_maxima > resumo['data_maxima']):
+                    resumo['data_maxima'] = data_maxima
+                print(f"  {os.path.basename(file_path)}: {total_linhas} registros transformados.")
+                continue
+            pool.shutdown(cancel_futures=True)
+            medida['registrar'] = False
+            return
+        medida['linhas_saida'] = resumo['novos']
+
+    tables = {table_name: concat_worker_tables([parte[table_name] for parte in partes]) for table_name in LOAD_ORDER}
+    del partes
+
+    try:
+        engine = create_engine(DATABASE_URL)
+        print("\nConexão com o banco de dados estabelecida.")
+        print("Iniciando Carga...")
+
+        load_stats = {}
+        conn, trans = begin_load(engine)
+        try:
+            ctx = prepare_load(conn, snapshot_dimensoes=dimension_snapshot_path(staging_dir))
+            load_block(conn, reconcile_with_load(tables, resumo, ctx), ctx, load_stats)
+            del tables
+            origem = ','.join(os.path.basename(f) for f in file_paths)[:255]
+            finish_load(conn, ctx, origem)
+            with etapa('commit'):
+                trans.commit()
+            save_dimension_snapshot(conn, ctx)
+            write_integrity_report(ctx, integrity_report, origem)
+        finally:
+            conn.close()
+
+        export_analytics(engine, parquet_dir)
+        engine.dispose()
+        print_load_report(load_stats)
         print("\n Pipeline ETL concluído com sucesso!")
 
     except Exception as e:
@@ -309,5 +1906,53 @@ def run_etl_pipeline(file_path):
 
 
 if __name__ == "__main__":
-    CSV_FILE_PATH = "dataset_notif_sus.csv"
-    run_etl_pipeline(CSV_FILE_PATH)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline ETL e-SUS Notifica -> Data Warehouse SRAG")
+    parser.add_argument("arquivo", nargs="*", default=["dataset_notif_sus.csv"],
+                        help="Caminho do CSV do e-SUS Notifica (vários arquivos, ex.: um por UF, "
+                             "são transformados em paralelo)")
+    parser.add_argument("--chunk-size", type=int, nargs="?", const=CHUNK_SIZE_PADRAO, default=None,
+                        help=f"Ativa o modo streaming, lendo o CSV em blocos (padrão: {CHUNK_SIZE_PADRAO} linhas)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Carrega apenas notificações novas ou alteradas desde a última carga")
+    parser.add_argument("--janela-dias", type=int, default=JANELA_INCREMENTAL_DIAS,
+                        help="Dias antes da marca d'água que ainda são comparados no modo incremental")
+    parser.add_argument("--leitor-csv", choices=['c', 'pyarrow'], default=LEITOR_CSV_PADRAO,
+                        help="Engine de leitura do CSV na carga completa")
+    parser.add_argument("--staging-dir", default=STAGING_DIR_PADRAO,
+                        help="Diretório do staging em Parquet da extração/transformação e do snapshot das dimensões")
+    parser.add_argument("--sem-staging", action="store_true",
+                        help="Não lê nem grava o staging em Parquet")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processos usados na carga de vários arquivos (padrão: número de CPUs)")
+    parser.add_argument("--log-dir", default=LOG_DIR_PADRAO,
+                        help="Diretório do log JSON-lines, das métricas do Prometheus e dos perfis")
+    parser.add_argument("--exportar-parquet", nargs="?", const=DIRETORIO_PARQUET_PADRAO, default=None, metavar="DIR",
+                        help="Exporta o star schema para Parquet depois da carga, para o backend duckdb do "
+                             f"dashboard (padrão: {DIRETORIO_PARQUET_PADRAO})")
+    parser.add_argument("--relatorio-integridade", default=None, metavar="ARQUIVO",
+                        help="Relatório de integridade da carga (padrão: relatorio_integridade.txt no --log-dir)")
+    parser.add_argument("--perfil-acima", type=float, default=LIMITE_PERFIL_PADRAO, metavar="SEGUNDOS",
+                        help="Grava o perfil de CPU (cProfile) das etapas mais lentas que SEGUNDOS")
+    args = parser.parse_args()
+
+    if len(args.arquivo) > 1 and (args.chunk_size or args.incremental):
+        parser.error("vários arquivos só são suportados na carga completa (sem --chunk-size/--incremental)")
+
+    modo = 'multiarquivo' if len(args.arquivo) > 1 else (
+        'incremental' if args.incremental else 'streaming' if args.chunk_size else 'completa')
+    iniciar_execucao('pipeline', log_dir=args.log_dir, limite_perfil=args.perfil_acima,
+                     modo=modo, arquivos=[os.path.basename(f) for f in args.arquivo])
+    relatorio = args.relatorio_integridade or os.path.join(args.log_dir, 'relatorio_integridade.txt')
+    try:
+        if len(args.arquivo) > 1:
+            run_etl_pipeline_multiarquivo(args.arquivo, workers=args.workers, leitor=args.leitor_csv,
+                                          staging_dir=None if args.sem_staging else args.staging_dir,
+                                          parquet_dir=args.exportar_parquet, integrity_report=relatorio)
+        else:
+            run_etl_pipeline(args.arquivo[0], chunk_size=args.chunk_size,
+                             incremental=args.incremental, janela_dias=args.janela_dias,
+                             leitor=args.leitor_csv,
+                             staging_dir=None if args.sem_staging else args.staging_dir,
+                             parquet_dir=args.exportar_parquet, integrity_report=relatorio)
+    finally:
+        finalizar_execucao()
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+"""
+    SÉRIES TEMPORAIS DO DASHBOARD
+    As curvas são agregadas no grão escolhido (dia, semana ISO, semana
+    epidemiológica ou mês) antes de chegar ao gráfico: cada data do cubo é
+    levada ao início do seu período (inicio_periodo) e o Plotly só recebe um
+    ponto por período. No modo automático o grão é o mais fino que cabe na
+    largura do gráfico. Séries que ainda passem de LIMITE_PONTOS são reduzidas
+    por LTTB, que preserva picos e vales.
+"""
+
+# Grão -> (rótulo, dias por período).
+# A semana ISO começa na segunda; a semana epidemiológica (SE) do Ministério da
+# Saúde vai de domingo a sábado.
+GRANULARIDADES = {
+    'dia': ("Dia", 1),
+    'semana': ("Semana (seg-dom)", 7),
+    'semana_epidemiologica': ("Semana epidemiológica", 7),
+    'mes': ("Mês", 30.44),
+}
+
+# Grãos considerados no modo automático, do mais fino para o mais grosso.
+GRANULARIDADES_AUTOMATICAS = ['dia', 'semana_epidemiologica', 'mes']
+
+# O Streamlit não informa a largura da tela ao servidor: a largura de cada
+# gráfico (meia página) e a densidade de pontos são configuradas aqui.
+LARGURA_GRAFICO_PX = 700
+PIXELS_POR_PONTO = 3
+
+# Teto de pontos enviados ao Plotly por série (acima dele entra o LTTB).
+LIMITE_PONTOS = 2000
+
+"""
+    Grão mais fino cujo número de períodos no intervalo cabe na largura do
+    gráfico (um ponto a cada PIXELS_POR_PONTO pixels).
+"""
+def escolher_granularidade(inicio, fim, largura_px=LARGURA_GRAFICO_PX):
+    dias = (pd.Timestamp(fim) - pd.Timestamp(inicio)).days + 1
+    pontos = max(largura_px // PIXELS_POR_PONTO, 1)
+    for granularidade in GRANULARIDADES_AUTOMATICAS:
+        if dias / GRANULARIDADES[granularidade][1] <= pontos:
+            return granularidade
+    return GRANULARIDADES_AUTOMATICAS[-1]
+
+"""
+    Início do período de cada data (datetime64[D]) no grão. O dia 0 do numpy
+    (1970-01-01) é uma quinta-feira.
+"""
+def inicio_periodo(datas, granularidade):
+    datas = np.asarray(datas, dtype='datetime64[D]')
+    dias = datas.astype(np.int64)
+    if granularidade == 'semana':
+        return datas - (dias + 3) % 7
+    if granularidade == 'semana_epidemiologica':
+        return datas - (dias + 4) % 7
+    if granularidade == 'mes':
+        return datas.astype('datetime64[M]').astype('datetime64[D]')
+    return datas
+
+"""
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013). Mantém o primeiro e o
+    último ponto e, de cada um dos n_pontos - 2 baldes intermediários, o ponto
+    que forma o maior triângulo com o escolhido no balde anterior e a média do
+    balde seguinte. Retorna as posições escolhidas, em ordem.
+"""
+def lttb(x, y, n_pontos):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    total = len(x)
+    if n_pontos >= total or n_pontos < 3:
+        return np.arange(total)
+
+    limites = np.linspace(1, total - 1, n_pontos - 1).astype(np.int64)
+    escolhidos = np.empty(n_pontos, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, total - 1
+    anterior = 0
+    for balde in range(n_pontos - 2):
+        inicio, fim = limites[balde], limites[balde + 1]
+        if balde + 2 < len(limites):
+            proximo_fim = limites[balde + 2]
+            media_x, media_y = x[fim:proximo_fim].mean(), y[fim:proximo_fim].mean()
+        else:
+            media_x, media_y = x[-1], y[-1]
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(areas.argmax())
+        escolhidos[balde + 1] = anterior
+    return escolhidos
+
+"""
+    Aplica o LTTB à série (coluna_x datetime, coluna_y numérica) quando ela
+    passa do limite de pontos; senão devolve o próprio df.
+"""
+def reduzir_serie(df, coluna_x, coluna_y, limite=LIMITE_PONTOS):
+    if len(df) <= limite:
+        return df
+    x = df[coluna_x].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return df.iloc[lttb(x, df[coluna_y].fillna(0).to_numpy(), limite)]
@@ -0,0 +1,179 @@
+"""
+    Cargas completas repetidas sobre o mesmo banco. Rodam num schema próprio
+    do PostgreSQL de ESUS_TEST_DATABASE_URL (padrão: o DATABASE_URL do
+    pipeline), recriado a partir de create_tables.sql; sem banco, são puladas.
+"""
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+import pipeline
+from conftest import RAIZ
+from gerar_esus import gerar_csv
+
+URL_TESTES = os.environ.get('ESUS_TEST_DATABASE_URL', pipeline.DATABASE_URL)
+SCHEMA_TESTES = 'testes_pipeline'
+
+CONSULTA_FATOS = (
+    "SELECT f.id_origem, f.hash_origem, l.codigo_ibge_municipio, f.data_notificacao, "
+    "(SELECT COUNT(*) FROM fato_notificacao_sintoma s "
+    " WHERE s.fk_notificacao = f.id_notificacao AND s.data_notificacao = f.data_notificacao), "
+    "(SELECT COUNT(*) FROM fato_testes_realizados t "
+    " WHERE t.fk_notificacao = f.id_notificacao AND t.data_notificacao = f.data_notificacao) "
+    "FROM fato_notificacoes f JOIN dim_localidades l ON l.id_localidade = f.fk_localidade_residencia "
+    "ORDER BY f.id_origem"
+)
+
+@pytest.fixture
+def banco(monkeypatch, tmp_path):
+    engine = create_engine(URL_TESTES, connect_args={'options': f'-csearch_path={SCHEMA_TESTES}'})
+    with open(os.path.join(RAIZ, 'create_tables.sql'), encoding='utf-8') as f:
+        ddl = f.read()
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA_TESTES} CASCADE")
+            conn.exec_driver_sql(f"CREATE SCHEMA {SCHEMA_TESTES}")
+            conn.connection.cursor().execute(ddl)
+    except OperationalError:
+        engine.dispose()
+        pytest.skip("PostgreSQL indisponível")
+
+    separador = '&' if '?' in URL_TESTES else '?'
+    monkeypatch.setattr(pipeline, 'DATABASE_URL', f"{URL_TESTES}{separador}options=-csearch_path%3D{SCHEMA_TESTES}")
+    # Logs da instrumentação e staging ficam no diretório temporário.
+    monkeypatch.chdir(tmp_path)
+    yield engine
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA_TESTES} CASCADE")
+    engine.dispose()
+
+def estado_banco(engine):
+    with engine.connect() as conn:
+        fatos = conn.exec_driver_sql(CONSULTA_FATOS).fetchall()
+        ids = conn.exec_driver_sql("SELECT MIN(id_notificacao), MAX(id_notificacao) FROM fato_notificacoes").one()
+        cargas = [modo for (modo,) in conn.exec_driver_sql("SELECT modo FROM controle_carga ORDER BY id_carga")]
+        dimensoes = {
+            table_name: conn.exec_driver_sql(f"SELECT COUNT(*), COUNT(DISTINCT {key_col}) FROM {table_name}").one()
+            for table_name, (key_col, _) in pipeline.DIM_NATURAL_KEYS.items()
+        }
+    return fatos, ids, cargas, dimensoes
+
+@pytest.mark.parametrize('modo', ['completo', 'staging', 'streaming'])
+def test_duas_cargas_completas_seguidas(banco, tmp_path, modo):
+    arquivo = str(tmp_path / 'esus.csv')
+    gerar_csv(arquivo, 3000, seed=7)
+    opcoes = {
+        'completo': {'staging_dir': None},
+        'staging': {'staging_dir': str(tmp_path / 'staging')},
+        'streaming': {'staging_dir': None, 'chunk_size': 1000},
+    }[modo]
+
+    pipeline.run_etl_pipeline(arquivo, **opcoes)
+    fatos, (_, maior_id), cargas, dimensoes = estado_banco(banco)
+    assert cargas == ['completa']
+    assert len(fatos) > 0
+
+    pipeline.run_etl_pipeline(arquivo, **opcoes)
+    fatos_2, (menor_id_2, _), cargas_2, dimensoes_2 = estado_banco(banco)
+    assert cargas_2 == ['completa', 'completa']
+    # Os meses do arquivo foram trocados: mesmo conteúdo, com ids novos.
+    assert fatos_2 == fatos
+    assert menor_id_2 > maior_id
+    # As dimensões foram reaproveitadas, sem membros duplicados.
+    assert dimensoes_2 == dimensoes
+    assert all(total == distintos for total, distintos in dimensoes_2.values())
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+def test_carga_multiarquivo_depois_de_carga_completa(banco, tmp_path):
+    arquivo = str(tmp_path / 'esus.csv')
+    gerar_csv(arquivo, 3000, seed=7)
+    gerar_csv(None, 3000, seed=7, por_uf=str(tmp_path / 'ufs'))
+    arquivos_uf = sorted(str(p) for p in (tmp_path / 'ufs').iterdir())
+
+    pipeline.run_etl_pipeline(arquivo, staging_dir=None)
+    fatos, (_, maior_id), _, dimensoes = estado_banco(banco)
+
+    pipeline.run_etl_pipeline_multiarquivo(arquivos_uf, workers=2, staging_dir=None)
+    fatos_2, (menor_id_2, _), cargas_2, dimensoes_2 = estado_banco(banco)
+    assert cargas_2 == ['completa', 'completa']
+    assert fatos_2 == fatos
+    assert menor_id_2 > maior_id
+    assert dimensoes_2 == dimensoes
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+def test_concat_worker_tables_ignora_partes_vazias():
+    vazia = pd.DataFrame({'id_raca_cor': pd.Series(dtype=object), 'descricao_raca_cor': pd.Series(dtype=object)})
+    parte = pd.DataFrame({'id_raca_cor': [1, 2], 'descricao_raca_cor': ['Parda', 'Branca']})
+    for partes in ([vazia, parte, vazia], [parte, vazia]):
+        tabela = pipeline.concat_worker_tables(partes)
+        assert tabela['id_raca_cor'].dtype == 'int64'
+        assert tabela['id_raca_cor'].tolist() == [1, 2]
+    assert list(pipeline.concat_worker_tables([vazia, vazia]).columns) == ['id_raca_cor', 'descricao_raca_cor']
+
+"""
+    CSV gerado com source_id em branco em uma de cada dez linhas. Retorna o
+    DataFrame (como texto) e a máscara das linhas sem source_id.
+"""
+def gerar_csv_sem_source_id(arquivo):
+    gerar_csv(arquivo, 3000, seed=7)
+    df = pd.read_csv(arquivo, dtype=str, keep_default_na=False)
+    sem_id = pd.Series(df.index % 10 == 0, index=df.index)
+    df.loc[sem_id, 'source_id'] = ''
+    df.to_csv(arquivo, index=False)
+    return df, sem_id
+
+def acertos_no_relatorio(caminho, regra):
+    with open(caminho, encoding='utf-8') as f:
+        linhas = f.read().splitlines()
+    posicao = next((i for i, linha in enumerate(linhas) if linha.strip().startswith(f"Regra {regra},")), None)
+    if posicao is None:
+        return None
+    return int(linhas[posicao - 1].rsplit(': ', 1)[1].split(' ')[0].replace('.', ''))
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+@pytest.mark.parametrize('modo', ['completo', 'streaming', 'multiarquivo'])
+def test_carga_completa_mantem_notificacoes_sem_source_id(banco, tmp_path, modo):
+    arquivo = str(tmp_path / 'esus.csv')
+    df, sem_id = gerar_csv_sem_source_id(arquivo)
+    com_data = df['dataNotificacao'] != ''
+    relatorio = str(tmp_path / 'relatorio.txt')
+
+    if modo == 'multiarquivo':
+        (tmp_path / 'ufs').mkdir()
+        arquivos_uf = []
+        for uf, parte in df.groupby('estadoIBGE'):
+            arquivos_uf.append(str(tmp_path / 'ufs' / f'esus_{uf}.csv'))
+            parte.to_csv(arquivos_uf[-1], index=False)
+        pipeline.run_etl_pipeline_multiarquivo(arquivos_uf, workers=2, staging_dir=None, integrity_report=relatorio)
+    else:
+        pipeline.run_etl_pipeline(arquivo, staging_dir=None, chunk_size=1000 if modo == 'streaming' else None,
+                                  integrity_report=relatorio)
+
+    with banco.connect() as conn:
+        total, com_origem = conn.exec_driver_sql("SELECT COUNT(*), COUNT(id_origem) FROM fato_notificacoes").one()
+    assert total == int(com_data.sum())
+    assert com_origem == int((com_data & ~sem_id).sum())
+    assert acertos_no_relatorio(relatorio, 'notificacao_sem_source_id') is None
+
+def test_carga_incremental_descarta_notificacoes_sem_source_id(banco, tmp_path):
+    arquivo = str(tmp_path / 'esus.csv')
+    df, sem_id = gerar_csv_sem_source_id(arquivo)
+    relatorio = str(tmp_path / 'relatorio.txt')
+    pipeline.run_etl_pipeline(arquivo, staging_dir=None)
+    with banco.connect() as conn:
+        total = conn.exec_driver_sql("SELECT COUNT(*) FROM fato_notificacoes").scalar()
+
+    # O mesmo arquivo de novo: as linhas com source_id já estão carregadas e as
+    # sem source_id da janela são descartadas e contadas, sem duplicar as da carga completa.
+    pipeline.run_etl_pipeline(arquivo, staging_dir=None, incremental=True, integrity_report=relatorio)
+    with banco.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM fato_notificacoes").scalar() == total
+
+    datas = pd.to_datetime(df['dataNotificacao'].replace('', None))
+    corte = datas.max() - pd.Timedelta(days=pipeline.JANELA_INCREMENTAL_DIAS)
+    esperados = int((sem_id & (datas >= corte)).sum())
+    assert esperados > 0
+    assert acertos_no_relatorio(relatorio, 'notificacao_sem_source_id') == esperados
@@ -0,0 +1,135 @@
+"""
+    Cubo do dashboard contra um groupby direto sobre os mesmos resumos: para
+    cada bloco, totais nos níveis brasil, uf e municipio (com filtros, recorte
+    de datas, agrupamento por período e categorias nulas) e as listas da
+    sidebar.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import cubo as cb
+from series_temporais import inicio_periodo
+
+# (id_localidade, UF, município, código IBGE). "Bom Jesus" existe no PI e no RS,
+# então o filtro só pelo nome pega municípios fora de ordem no cubo.
+LOCALIDADES = [
+    (7, 'SP', 'São Paulo', 3550308),
+    (3, 'PI', 'Bom Jesus', 2201903),
+    (12, 'SP', 'Campinas', 3509502),
+    (5, 'RJ', 'Rio de Janeiro', 3304557),
+    (9, 'RS', 'Bom Jesus', 4302303),
+    (1, 'RJ', 'Niterói', 3303302),
+]
+
+# Localidade fora de dim_localidades: o cubo descarta, como o JOIN das views.
+LOCALIDADE_DESCONHECIDA = 999
+
+CATEGORIAS = {
+    'sexo': ['Feminino', 'Masculino', None],
+    'faixa_etaria': ['0-19', '20-59', '60+'],
+    'classificacao_final': ['Confirmado', 'Descartado', 'Suspeito', None],
+    'status_vacinal': ['Vacinado', 'Não vacinado'],
+    'nome_sintoma': ['Febre', 'Tosse', 'Dispneia'],
+    'source_id': [1],
+}
+
+"""
+    Resumos sintéticos de cada bloco, com datas dos dois lados da virada do ano.
+"""
+def gerar_resumos(linhas=400, seed=11):
+    rng = np.random.default_rng(seed)
+    localidades = pd.DataFrame(LOCALIDADES, columns=['id_localidade', 'estado_uf', 'municipio_nome',
+                                                     'codigo_ibge_municipio'])
+    consultas = {cb.CONSULTA_LOCALIDADES: localidades.sort_values(['estado_uf', 'municipio_nome', 'id_localidade'],
+                                                                 ignore_index=True)}
+    ids = [*localidades['id_localidade'], LOCALIDADE_DESCONHECIDA]
+    datas = pd.date_range('2020-12-20', '2021-02-10', freq='D')
+    for consulta, coluna_data, categorias, medidas in cb.BLOCOS.values():
+        consultas[consulta] = pd.DataFrame({
+            'fk_localidade': rng.choice(ids, linhas),
+            coluna_data: rng.choice(datas, linhas),
+            **{c: rng.choice(np.array(CATEGORIAS[c], dtype=object), linhas) for c in categorias},
+            **{m: rng.integers(0, 10, linhas) for m in medidas},
+        })
+    return consultas
+
+@pytest.fixture(scope='module')
+def resumos():
+    return gerar_resumos()
+
+@pytest.fixture(scope='module')
+def cubo(resumos):
+    return cb.construir_cubo(resumos.__getitem__)
+
+"""
+    O que a consulta SQL das views devolveria: JOIN com as localidades, filtros
+    e GROUP BY direto no pandas.
+"""
+def agrupar_direto(resumos, nome_bloco, estado, municipio, por, periodo_datas, granularidade):
+    consulta, coluna_data, _, medidas = cb.BLOCOS[nome_bloco]
+    df = resumos[consulta].merge(resumos[cb.CONSULTA_LOCALIDADES], left_on='fk_localidade',
+                                 right_on='id_localidade')
+    if estado != 'Todos':
+        df = df[df['estado_uf'] == estado]
+    if municipio != 'Todos':
+        df = df[df['municipio_nome'] == municipio]
+    if periodo_datas is not None:
+        df = df[df[coluna_data].between(pd.Timestamp(periodo_datas[0]), pd.Timestamp(periodo_datas[1]))]
+    df = df.assign(periodo=pd.to_datetime(inicio_periodo(df[coluna_data].to_numpy(), granularidade)))
+
+    chaves = []
+    for dimensao in por:
+        chaves += ['estado_uf', 'municipio_nome', 'codigo_ibge_municipio'] if dimensao == 'localidade' else [dimensao]
+    if not chaves:
+        return pd.DataFrame({m: [df[m].sum()] for m in medidas})
+    return df.groupby(chaves, dropna=False)[medidas].sum().reset_index()
+
+def ordenar(df):
+    return df.sort_values(list(df.columns), ignore_index=True)
+
+# (estado, município, agrupamento, recorte de datas, grão, nível esperado).
+# Em `por`, 'data' é a coluna de data do bloco e 'categoria' a primeira categoria dele.
+CONSULTAS = [
+    ('Todos', 'Todos', (), None, 'dia', 'brasil'),
+    ('Todos', 'Todos', ('data',), None, 'dia', 'brasil'),
+    ('Todos', 'Todos', ('periodo', 'categoria'), ('2020-12-27', '2021-01-16'), 'semana_epidemiologica', 'brasil'),
+    ('Todos', 'Todos', ('estado_uf',), None, 'dia', 'uf'),
+    ('SP', 'Todos', (), None, 'dia', 'uf'),
+    ('RJ', 'Todos', ('data', 'categoria'), ('2021-01-01', '2021-01-31'), 'dia', 'uf'),
+    ('Todos', 'Todos', ('localidade',), None, 'dia', 'municipio'),
+    ('SP', 'Todos', ('localidade', 'periodo'), None, 'mes', 'municipio'),
+    ('SP', 'Campinas', ('periodo',), None, 'semana', 'municipio'),
+    ('Todos', 'Bom Jesus', ('estado_uf', 'categoria'), None, 'dia', 'municipio'),
+]
+
+@pytest.mark.parametrize('nome_bloco', list(cb.BLOCOS))
+@pytest.mark.parametrize('estado, municipio, por, periodo_datas, granularidade, nivel', CONSULTAS)
+def test_agregar_igual_ao_groupby(resumos, cubo, nome_bloco, estado, municipio, por, periodo_datas,
+                                  granularidade, nivel):
+    _, coluna_data, categorias, _ = cb.BLOCOS[nome_bloco]
+    if 'categoria' in por and not categorias:
+        pytest.skip("bloco sem categorias")
+    por = [coluna_data if d == 'data' else categorias[0] if d == 'categoria' else d for d in por]
+    assert cb.selecao(cubo, estado, municipio, por)[0] == nivel
+
+    obtido = cb.agregar(cubo, nome_bloco, estado, municipio, por, periodo_datas=periodo_datas,
+                        granularidade=granularidade)
+    esperado = agrupar_direto(resumos, nome_bloco, estado, municipio, por, periodo_datas, granularidade)
+    assert len(esperado) > 0
+    pd.testing.assert_frame_equal(ordenar(obtido), ordenar(esperado), check_dtype=False)
+
+def test_agregar_sem_linhas_devolve_vazio(cubo):
+    # RJ não tem "Bom Jesus"; a consulta SQL também voltaria vazia.
+    vazio = cb.agregar(cubo, 'perfil', 'RJ', 'Bom Jesus', ['localidade'])
+    assert vazio.empty
+    assert list(vazio.columns) == ['estado_uf', 'municipio_nome', 'codigo_ibge_municipio',
+                                   'total_casos', 'casos_confirmados', 'obitos']
+
+def test_listas_da_sidebar(cubo):
+    assert cb.estados(cubo) == ['PI', 'RJ', 'RS', 'SP']
+    assert cb.municipios(cubo, 'SP') == ['Campinas', 'São Paulo']
+    assert cb.municipios(cubo, 'Todos') == ['Bom Jesus', 'Campinas', 'Niterói', 'Rio de Janeiro', 'São Paulo']
+    assert cb.codigos_municipio(cubo, 'SP', 'São Paulo') == ['3550308']
+    assert cb.codigos_municipio(cubo, 'RS', 'Bom Jesus') == ['4302303']
+    assert cb.codigos_municipio(cubo, 'RJ', 'Bom Jesus') == []
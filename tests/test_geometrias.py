@@ -0,0 +1,89 @@
+"""
+    Malhas dos municípios: a partir do codarea de 7 dígitos do IBGE, as feições
+    casam com os códigos do cubo usados pelo dashboard (chave do choropleth e
+    foco do enquadramento), com 7 ou 6 dígitos.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cubo as cb
+import geometrias
+from geometrias import chave_municipio, geometria_mapa
+
+# (código IBGE, UF, nome, lon, lat) de um quadrado de 0,1 grau por município.
+MUNICIPIOS = [
+    ('3304557', 'RJ', 'Rio de Janeiro', -43.5, -23.0),
+    ('3509502', 'SP', 'Campinas', -47.2, -23.0),
+    ('3550308', 'SP', 'São Paulo', -46.8, -23.8),
+]
+
+def quadrado(lon, lat, lado=0.1):
+    return {'type': 'Polygon', 'coordinates': [[
+        [lon, lat], [lon + lado, lat], [lon + lado, lat + lado], [lon, lat + lado], [lon, lat],
+    ]]}
+
+@pytest.fixture
+def malhas(monkeypatch, tmp_path):
+    monkeypatch.setattr(geometrias, 'DIRETORIO_MALHAS', str(tmp_path / 'malhas'))
+    geometrias.carregar_camada.cache_clear()
+    origem = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'codarea': codigo, 'nome': nome}, 'geometry': quadrado(lon, lat)}
+        for codigo, _, nome, lon, lat in MUNICIPIOS
+    ]}
+    arquivo = tmp_path / 'municipios.geojson'
+    arquivo.write_text(json.dumps(origem), encoding='utf-8')
+    geometrias.construir_camada('municipios', str(arquivo), 'codarea', 'nome')
+    yield
+    geometrias.carregar_camada.cache_clear()
+
+"""
+    Cubo com uma linha por município em cada bloco, com os códigos IBGE como
+    inteiros de 7 ou 6 dígitos, como vêm de dim_localidades.
+"""
+def cubo_municipios(digitos=7):
+    localidades = pd.DataFrame({
+        'id_localidade': np.arange(1, len(MUNICIPIOS) + 1),
+        'estado_uf': [uf for _, uf, _, _, _ in MUNICIPIOS],
+        'municipio_nome': [nome for _, _, nome, _, _ in MUNICIPIOS],
+        'codigo_ibge_municipio': np.array([int(codigo[:digitos]) for codigo, _, _, _, _ in MUNICIPIOS], dtype=np.int64),
+    })
+    consultas = {cb.CONSULTA_LOCALIDADES: localidades}
+    for consulta, coluna_data, categorias, medidas in cb.BLOCOS.values():
+        consultas[consulta] = pd.DataFrame({
+            'fk_localidade': localidades['id_localidade'],
+            coluna_data: pd.Timestamp('2021-01-04'),
+            **{categoria: 'x' for categoria in categorias},
+            **{medida: 1 for medida in medidas},
+        })
+    return cb.construir_cubo(consultas.__getitem__)
+
+def test_chave_municipio():
+    for codigo in (3550308, 3550308.0, '3550308', '3550308.0', np.int32(3550308), 355030, '355030'):
+        assert chave_municipio(codigo) == '355030'
+    for codigo in ('35', '35503080'):
+        with pytest.raises(ValueError):
+            chave_municipio(codigo)
+
+def test_feicoes_a_partir_do_codarea_de_7_digitos(malhas):
+    geojson, _, _, _ = geometria_mapa('municipios', 'SP')
+    assert {f['id'] for f in geojson['features']} == {chave_municipio(3509502), chave_municipio(3550308)}
+
+@pytest.mark.parametrize('digitos', [7, 6])
+def test_chaves_do_dashboard_casam_com_as_feicoes(malhas, digitos):
+    cubo = cubo_municipios(digitos)
+    geojson, _, zoom_uf, _ = geometria_mapa('municipios', 'SP')
+
+    # Chave do choropleth: os municípios da UF agregados pelo cubo.
+    df_mapa = cb.agregar(cubo, 'perfil', 'SP', 'Todos', ['localidade'], ['casos_confirmados'])
+    assert set(df_mapa['codigo_ibge_municipio'].map(chave_municipio)) == {f['id'] for f in geojson['features']}
+
+    # Foco do município selecionado: enquadra só a caixa dele.
+    foco = [chave_municipio(c) for c in cb.codigos_municipio(cubo, 'SP', 'São Paulo')]
+    assert foco == ['355030']
+    _, centro, zoom, _ = geometria_mapa('municipios', 'SP', foco)
+    caixa = next(f['bbox'] for f in geojson['features'] if f['id'] == '355030')
+    assert (centro, zoom) == geometrias.enquadramento([caixa])
+    assert zoom > zoom_uf
@@ -0,0 +1,120 @@
+"""
+    Regras de imputação (REGRAS_IMPUTACAO) contra o tratamento de nulos escrito
+    à mão da versão original do pipeline: um CSV pequeno, com nulos e valores
+    inválidos em todas as colunas cobertas, lido pela extração real. Confere os
+    valores imputados, linha a linha, e os acertos de cada regra.
+"""
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+CSV = """source_id,dataNotificacao,dataInicioSintomas,dataEncerramento,classificacaoFinal,codigoResultadoTeste1,idade,sexo,racaCor,evolucaoCaso
+a1,2021-03-10,2021-03-08,2021-03-20,Descartado,2,30,Feminino,Parda,Cura
+a2,2021-03-10,,,,1,,Masculino,Branca,Cura
+a3,2021-03-10,2021-03-15,2021-03-12,,2,40,,Preta,Óbito
+a4,2021-03-10,2021-03-09,2021-03-01,,,50,Feminino,,
+a5,2021-03-11,2021-03-11,,,3,130,Masculino,Parda,Cura
+a6,,,,Suspeito,,20,Feminino,Parda,Cura
+a7,2021-03-12,2021-03-12,,Confirmado Laboratorial,1,45.7,Masculino,Branca,Cura
+a8,2021-03-12,2021-03-10,2021-03-12,Descartado,2,-1,Feminino,Amarela,Cura
+"""
+
+# Idade mediana das lidas (-1, 20, 30, 40, 45.7, 50, 130): 40.
+ESPERADO = {
+    'classificacaoFinal': ['Descartado', 'Confirmado Laboratorial', 'Descartado', 'Suspeito', 'Suspeito',
+                           'Suspeito', 'Confirmado Laboratorial', 'Descartado'],
+    'dataInicioSintomas': ['2021-03-08', '2021-03-09', '2021-03-10', '2021-03-09', '2021-03-11',
+                           None, '2021-03-12', '2021-03-10'],
+    'dataEncerramento': ['2021-03-20', None, '2021-03-12', None, None, None, None, '2021-03-12'],
+    'idade': [30, 40, 40, 50, 130, 20, 45, -1],
+    'sexo': ['Feminino', 'Masculino', 'IGNORADO', 'Feminino', 'Masculino', 'Feminino', 'Masculino', 'Feminino'],
+    'racaCor': ['Parda', 'Branca', 'Preta', 'NAO INFORMADO', 'Parda', 'Parda', 'Branca', 'Amarela'],
+    'evolucaoCaso': ['Cura', 'Cura', 'Óbito', 'EM ABERTO', 'Cura', 'Cura', 'Cura', 'Cura'],
+}
+
+ACERTOS_ESPERADOS = {
+    'notificacao_sem_data': 1,
+    'classificacao_por_resultado': 4,
+    'inicio_sintomas_ausente': 2,
+    'inicio_sintomas_apos_notificacao': 1,
+    'encerramento_antes_notificacao': 1,
+    'idade_ausente': 1,
+    'idade_fora_da_faixa': 2,
+    'sexo_ausente': 1,
+    'raca_cor_ausente': 1,
+    'evolucao_ausente': 1,
+}
+
+"""
+    intelligent_null_imputation da versão original do pipeline (antes das
+    regras declaradas), sobre colunas de texto.
+"""
+def imputacao_original(df):
+    if 'codigoResultadoTeste1' in df.columns:
+        df['classificacaoFinal'] = np.where(
+            (df['classificacaoFinal'].isnull()) & (df['codigoResultadoTeste1'] == 1),
+            'Confirmado Laboratorial',
+            df['classificacaoFinal']
+        )
+        df['classificacaoFinal'] = np.where(
+            (df['classificacaoFinal'].isnull()) & (df['codigoResultadoTeste1'] == 2),
+            'Descartado',
+            df['classificacaoFinal']
+        )
+    df['classificacaoFinal'] = df['classificacaoFinal'].fillna('Suspeito')
+
+    df['dataInicioSintomas'] = np.where(
+        df['dataInicioSintomas'].isnull(),
+        df['dataNotificacao'] - pd.Timedelta(days=1),
+        df['dataInicioSintomas']
+    )
+    mask_erro_data = df['dataInicioSintomas'] > df['dataNotificacao']
+    df.loc[mask_erro_data, 'dataInicioSintomas'] = df.loc[mask_erro_data, 'dataNotificacao']
+    mask_erro_fim = (df['dataEncerramento'] < df['dataNotificacao']) & (df['dataEncerramento'].notnull())
+    df.loc[mask_erro_fim, 'dataEncerramento'] = pd.NaT
+
+    median_age = df['idade'].median()
+    df['idade'] = df['idade'].fillna(median_age).astype(int)
+    df['sexo'] = df['sexo'].fillna('IGNORADO')
+    df['racaCor'] = df['racaCor'].fillna('NAO INFORMADO')
+    df['evolucaoCaso'] = df['evolucaoCaso'].fillna('EM ABERTO')
+    return df
+
+def valores(serie):
+    return [None if pd.isna(v) else v for v in serie.astype(object)]
+
+def extrair(tmp_path):
+    arquivo = tmp_path / 'imputacao.csv'
+    arquivo.write_text(CSV, encoding='utf-8')
+    return pipeline.extract_and_initial_transform(str(arquivo))
+
+def test_regras_reproduzem_o_tratamento_original(tmp_path):
+    df = extrair(tmp_path)
+    original = imputacao_original(df.astype({
+        col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }))
+    contagens = pipeline.new_integrity_counts()
+    imputado = pipeline.intelligent_null_imputation(df, contagens)
+
+    for coluna, esperado in ESPERADO.items():
+        if coluna.startswith('data'):
+            esperado = [None if v is None else pd.Timestamp(v) for v in esperado]
+        assert valores(imputado[coluna]) == esperado, coluna
+        assert valores(original[coluna]) == esperado, coluna
+    # A classificação continua category e a idade vira o menor inteiro que cabe.
+    assert isinstance(imputado['classificacaoFinal'].dtype, pd.CategoricalDtype)
+    assert imputado['idade'].dtype == np.int16
+
+    assert contagens['linhas'] == 8
+    assert contagens['regras'] == ACERTOS_ESPERADOS
+
+def test_regras_contam_por_bloco(tmp_path):
+    # No modo streaming as contagens de cada bloco são somadas.
+    df = extrair(tmp_path)
+    contagens = pipeline.new_integrity_counts()
+    for inicio in (0, 4):
+        bloco = df.iloc[inicio:inicio + 4].copy()
+        pipeline.intelligent_null_imputation(bloco, contagens)
+    assert contagens['linhas'] == 8
+    assert sum(contagens['regras'].values()) == sum(ACERTOS_ESPERADOS.values())
@@ -0,0 +1,39 @@
+"""
+    Regressão de memória da extração e da transformação completa sobre um CSV
+    gerado: o pico de RSS acima do RSS inicial não pode passar de
+    LIMITE_MEMORIA_PADRAO vezes o tamanho do arquivo. Roda num processo
+    separado, para que o RSS dos outros testes não entre na medida.
+"""
+import os
+import sys
+import json
+import subprocess
+
+from conftest import RAIZ
+from bench_pipeline import LIMITE_MEMORIA_PADRAO
+from gerar_esus import gerar_csv
+
+MEDICAO = """
+import os, sys, json
+sys.path[:0] = [{raiz!r}, {benchmarks!r}]
+import pipeline
+from bench_pipeline import MedidorMemoria
+
+inicial = MedidorMemoria.rss()
+with MedidorMemoria() as memoria:
+    df_raw = pipeline.extract_and_initial_transform({arquivo!r})
+    tables, resumo = pipeline.transform_full_file(df_raw)
+print(json.dumps({{'pico': memoria.pico - inicial, 'notificacoes': len(tables['fato_notificacoes'])}}))
+"""
+
+def test_pico_de_memoria_da_transformacao(tmp_path):
+    arquivo = str(tmp_path / 'esus.csv')
+    gerar_csv(arquivo, 100_000, seed=7)
+    script = MEDICAO.format(raiz=RAIZ, benchmarks=os.path.join(RAIZ, 'benchmarks'), arquivo=arquivo)
+
+    saida = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True, cwd=tmp_path)
+    medida = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    assert medida['notificacoes'] > 0
+    razao = medida['pico'] / os.path.getsize(arquivo)
+    assert razao <= LIMITE_MEMORIA_PADRAO, f"pico de {razao:.2f}x o CSV (limite {LIMITE_MEMORIA_PADRAO}x)"
@@ -0,0 +1,87 @@
+"""
+    Positividade diária e móvel (7 e 14 dias) de compute_positivity sobre uma
+    série calculada à mão: buracos entre as datas, janelas sem teste e as bordas
+    das janelas. Confere também que o recorte da carga incremental
+    (indicator_dates, usado por refresh_indicators) dá o mesmo resultado do
+    cálculo completo.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+
+NAN = float('nan')
+
+# Contagens diárias como vêm do banco: só dias com teste.
+DIARIO = pd.DataFrame([
+    (1, date(2021, 1, 1), 4, 2),
+    (1, date(2021, 1, 2), 2, 0),
+    (1, date(2021, 1, 8), 5, 5),
+    (1, date(2021, 1, 20), 1, 1),
+    (2, date(2021, 1, 1), 10, 1),
+], columns=['fk_localidade', 'data_referencia', 'total_testes', 'total_positivos'])
+
+# (município, dia de jan/2021): (testes, positivos, taxa) do dia, de 7 e de 14 dias.
+ESPERADO = {
+    (1, 1): ((4, 2, 50.0), (4, 2, 50.0), (4, 2, 50.0)),
+    (1, 2): ((2, 0, 0.0), (6, 2, 100 * 2 / 6), (6, 2, 100 * 2 / 6)),
+    # Sem teste no dia; a janela de 7 dias ainda alcança o dia 1.
+    (1, 7): ((0, 0, NAN), (6, 2, 100 * 2 / 6), (6, 2, 100 * 2 / 6)),
+    (1, 8): ((5, 5, 100.0), (7, 5, 100 * 5 / 7), (11, 7, 100 * 7 / 11)),
+    (1, 9): ((0, 0, NAN), (5, 5, 100.0), (11, 7, 100 * 7 / 11)),
+    (1, 14): ((0, 0, NAN), (5, 5, 100.0), (11, 7, 100 * 7 / 11)),
+    # Dia 1 sai da janela de 14 dias; a de 7 dias fica sem teste.
+    (1, 15): ((0, 0, NAN), (0, 0, NAN), (7, 5, 100 * 5 / 7)),
+    (1, 16): ((0, 0, NAN), (0, 0, NAN), (5, 5, 100.0)),
+    (1, 19): ((0, 0, NAN), (0, 0, NAN), (5, 5, 100.0)),
+    (1, 20): ((1, 1, 100.0), (1, 1, 100.0), (6, 6, 100.0)),
+    (1, 21): ((0, 0, NAN), (1, 1, 100.0), (6, 6, 100.0)),
+    (1, 22): ((0, 0, NAN), (1, 1, 100.0), (1, 1, 100.0)),
+    (1, 27): ((0, 0, NAN), (0, 0, NAN), (1, 1, 100.0)),
+    (2, 1): ((10, 1, 10.0), (10, 1, 10.0), (10, 1, 10.0)),
+    (2, 14): ((0, 0, NAN), (0, 0, NAN), (10, 1, 10.0)),
+}
+
+def por_chave(indicadores):
+    return indicadores.set_index(['fk_localidade', 'data_referencia'])
+
+def test_janelas_moveis_calculadas_a_mao():
+    indicadores = pipeline.compute_positivity(DIARIO)
+    linhas = por_chave(indicadores)
+    assert linhas.index.is_unique
+
+    for (municipio, dia), esperado in ESPERADO.items():
+        linha = linhas.loc[(municipio, date(2021, 1, dia))]
+        for sufixo, (testes, positivos, taxa) in zip(['', '_7d', '_14d'], esperado):
+            assert linha[f'total_testes{sufixo}'] == testes, (municipio, dia, sufixo)
+            assert linha[f'total_positivos{sufixo}'] == positivos, (municipio, dia, sufixo)
+            assert linha[f'taxa_positividade{sufixo}'] == pytest.approx(taxa, nan_ok=True), (municipio, dia, sufixo)
+
+    # Há linha enquanto a janela de 14 dias tiver teste, e só então.
+    datas = {m: set(linhas.loc[m].index) for m in (1, 2)}
+    assert datas[1] == {date(2021, 1, 1) + pd.Timedelta(days=d) for d in range(33)}
+    assert datas[2] == {date(2021, 1, d) for d in range(1, 15)}
+    assert (indicadores['total_testes_14d'] > 0).all()
+
+def test_recortes_da_saida():
+    completo = por_chave(pipeline.compute_positivity(DIARIO))
+    datas = [date(2021, 1, 8), date(2021, 1, 15), date(2021, 1, 30)]
+    recorte = por_chave(pipeline.compute_positivity(DIARIO, datas, data_limite=date(2021, 1, 20)))
+    # 2021-01-30 passa do limite; o município 2 não tem teste na janela de 2021-01-15.
+    assert list(recorte.index) == [(1, date(2021, 1, 8)), (1, date(2021, 1, 15)), (2, date(2021, 1, 8))]
+    pd.testing.assert_frame_equal(recorte, completo.loc[recorte.index])
+
+def test_recorte_incremental_igual_ao_calculo_completo():
+    completo = por_chave(pipeline.compute_positivity(DIARIO))
+    saida, entrada = pipeline.indicator_dates([date(2021, 1, 8)])
+    assert saida[0] == np.datetime64('2021-01-08') and saida[-1] == np.datetime64('2021-01-21')
+    assert entrada[0] == np.datetime64('2020-12-26') and entrada[-1] == saida[-1]
+
+    dias_entrada = set(entrada.astype(object))
+    diario = DIARIO[DIARIO['data_referencia'].isin(dias_entrada)]
+    incremental = por_chave(pipeline.compute_positivity(diario, saida))
+    esperado = completo[completo.index.get_level_values('data_referencia').isin(set(saida.astype(object)))]
+    pd.testing.assert_frame_equal(incremental, esperado)
@@ -0,0 +1,84 @@
+"""
+    Séries temporais do dashboard: início de período nos grãos (com a virada de
+    ano da semana epidemiológica), escolha automática do grão pela largura do
+    gráfico e a redução por LTTB.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from series_temporais import (
+    LARGURA_GRAFICO_PX, PIXELS_POR_PONTO, escolher_granularidade, inicio_periodo, lttb, reduzir_serie,
+)
+
+# Data -> início do período em cada grão, em volta da virada de 2020 para 2021.
+# 2020-12-31 é quinta; a SE 53/2020 vai de 2020-12-27 a 2021-01-02 e a SE 1/2021
+# começa no domingo 2021-01-03, que ainda é da semana ISO iniciada em 2020-12-28.
+INICIOS = {
+    '2020-12-26': {'semana': '2020-12-21', 'semana_epidemiologica': '2020-12-20', 'mes': '2020-12-01'},
+    '2020-12-27': {'semana': '2020-12-21', 'semana_epidemiologica': '2020-12-27', 'mes': '2020-12-01'},
+    '2020-12-31': {'semana': '2020-12-28', 'semana_epidemiologica': '2020-12-27', 'mes': '2020-12-01'},
+    '2021-01-01': {'semana': '2020-12-28', 'semana_epidemiologica': '2020-12-27', 'mes': '2021-01-01'},
+    '2021-01-02': {'semana': '2020-12-28', 'semana_epidemiologica': '2020-12-27', 'mes': '2021-01-01'},
+    '2021-01-03': {'semana': '2020-12-28', 'semana_epidemiologica': '2021-01-03', 'mes': '2021-01-01'},
+    '2021-01-04': {'semana': '2021-01-04', 'semana_epidemiologica': '2021-01-03', 'mes': '2021-01-01'},
+}
+
+@pytest.mark.parametrize('granularidade', ['semana', 'semana_epidemiologica', 'mes'])
+def test_inicio_periodo_na_virada_do_ano(granularidade):
+    datas = np.array(list(INICIOS), dtype='datetime64[D]')
+    esperado = np.array([inicios[granularidade] for inicios in INICIOS.values()], dtype='datetime64[D]')
+    np.testing.assert_array_equal(inicio_periodo(datas, granularidade), esperado)
+
+def test_inicio_periodo_por_dia_da_semana():
+    datas = np.arange(np.datetime64('2019-12-01'), np.datetime64('2022-02-01'))
+    # Semana ISO começa na segunda (weekday 0); SE, no domingo (weekday 6).
+    for granularidade, dia_inicial in (('semana', 0), ('semana_epidemiologica', 6)):
+        inicios = pd.DatetimeIndex(inicio_periodo(datas, granularidade))
+        assert (inicios.weekday == dia_inicial).all()
+        atraso = (datas - inicios.to_numpy().astype('datetime64[D]')).astype(np.int64)
+        assert atraso.min() == 0 and atraso.max() == 6
+    np.testing.assert_array_equal(inicio_periodo(datas, 'dia'), datas)
+
+def test_escolher_granularidade_pela_largura():
+    pontos = LARGURA_GRAFICO_PX // PIXELS_POR_PONTO
+    inicio = pd.Timestamp('2020-03-01')
+    assert escolher_granularidade(inicio, inicio + pd.Timedelta(days=pontos - 1)) == 'dia'
+    assert escolher_granularidade(inicio, inicio + pd.Timedelta(days=pontos)) == 'semana_epidemiologica'
+    assert escolher_granularidade(inicio, inicio + pd.Timedelta(days=7 * pontos - 1)) == 'semana_epidemiologica'
+    assert escolher_granularidade(inicio, inicio + pd.Timedelta(days=7 * pontos)) == 'mes'
+    assert escolher_granularidade(inicio, inicio + pd.Timedelta(days=40_000)) == 'mes'
+    # Gráfico estreito: mesmo um mês de dados vira semanas.
+    assert escolher_granularidade(inicio, inicio + pd.Timedelta(days=29), largura_px=60) == 'semana_epidemiologica'
+
+@pytest.mark.parametrize('n_pontos', [3, 10, 250, 999])
+def test_lttb_mantem_extremos_e_tamanho(n_pontos):
+    rng = np.random.default_rng(3)
+    x = np.arange(1000, dtype=np.float64)
+    y = rng.normal(size=1000).cumsum()
+    escolhidos = lttb(x, y, n_pontos)
+    assert len(escolhidos) == n_pontos
+    assert escolhidos[0] == 0 and escolhidos[-1] == len(x) - 1
+    assert (np.diff(escolhidos) > 0).all()
+
+def test_lttb_preserva_pico():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[237] = 50.0
+    assert 237 in lttb(x, y, 20)
+
+def test_lttb_sem_reducao():
+    np.testing.assert_array_equal(lttb(np.arange(5), np.arange(5), 10), np.arange(5))
+    np.testing.assert_array_equal(lttb(np.arange(5), np.arange(5), 2), np.arange(5))
+
+def test_reduzir_serie():
+    df = pd.DataFrame({
+        'data': pd.date_range('2020-03-01', periods=3000, freq='D'),
+        'casos': np.arange(3000, dtype=np.float64),
+    })
+    df.loc[10, 'casos'] = np.nan
+    reduzida = reduzir_serie(df, 'data', 'casos', limite=100)
+    assert len(reduzida) == 100
+    assert reduzida['data'].iloc[0] == df['data'].iloc[0] and reduzida['data'].iloc[-1] == df['data'].iloc[-1]
+    curta = df.head(100)
+    assert reduzir_serie(curta, 'data', 'casos', limite=100) is curta
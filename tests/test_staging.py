@@ -0,0 +1,49 @@
+"""
+    Chaves do staging: cada lista de código de estágio (CODIGO_EXTRACAO,
+    CODIGO_TRANSFORMACAO) cobre todas as funções e constantes do pipeline que
+    os seus itens chamam. Uma função de fora da lista poderia ser alterada sem
+    invalidar o Parquet gravado pelo estágio.
+"""
+import re
+import inspect
+
+import pipeline
+
+# Alcançáveis a partir de transform_block, mas só nos caminhos que não gravam
+# staging (seleção do delta incremental e carga) ou derivados de itens da lista.
+FORA_DA_TRANSFORMACAO = {
+    'select_incremental_delta', 'ensure_month_partitions', 'load_table', 'copy_dataframe', 'COPY_BATCH_ROWS',
+    'DESCARTE_SEM_SOURCE_ID', 'PLANO_IMPUTACAO', 'write_staged_tables', 'LOAD_ORDER',
+}
+
+def alcancaveis(nomes):
+    globais = vars(pipeline)
+    do_pipeline = {
+        nome for nome, objeto in globais.items()
+        if (inspect.isfunction(objeto) and objeto.__module__ == 'pipeline') or nome.isupper()
+    }
+    vistos, pendentes = set(), list(nomes)
+    while pendentes:
+        nome = pendentes.pop()
+        if nome in vistos:
+            continue
+        vistos.add(nome)
+        if inspect.isfunction(globais[nome]):
+            citados = set(re.findall(r'\b\w+\b', inspect.getsource(globais[nome])))
+            pendentes += sorted((citados & do_pipeline) - {nome})
+    return vistos
+
+def test_codigo_extracao_cobre_as_funcoes_chamadas():
+    assert alcancaveis(pipeline.CODIGO_EXTRACAO) - set(pipeline.CODIGO_EXTRACAO) == set()
+
+def test_codigo_transformacao_cobre_as_funcoes_chamadas():
+    faltando = alcancaveis(pipeline.CODIGO_TRANSFORMACAO) - set(pipeline.CODIGO_TRANSFORMACAO) - FORA_DA_TRANSFORMACAO
+    assert faltando == set()
+
+def test_mudanca_numa_funcao_chamada_troca_a_chave(monkeypatch):
+    antes = pipeline.code_version(pipeline.CODIGO_EXTRACAO), pipeline.code_version(pipeline.CODIGO_TRANSFORMACAO)
+    monkeypatch.setattr(pipeline, 'select_rows', lambda df, colunas, linhas: df)
+    monkeypatch.setattr(pipeline, 'merge_integrity_counts', lambda destino, origem: destino)
+    depois = pipeline.code_version(pipeline.CODIGO_EXTRACAO), pipeline.code_version(pipeline.CODIGO_TRANSFORMACAO)
+    assert depois[0] != antes[0]
+    assert depois[1] != antes[1]